@@ -0,0 +1,349 @@
+"""
+Multi-worker mode for the launcher.
+
+Runs several Streamlit servers on consecutive ports behind a small local
+reverse proxy. The proxy pins each browser to one worker with a cookie, so a
+session (including its websocket and reconnects) always reaches the process
+that holds its state. New browsers go to the healthy worker with the fewest
+open connections. Workers are health-checked and restarted when they die or
+stop answering, and a per-worker load report is printed periodically and
+served as JSON at /_balancer/status.
+"""
+import asyncio
+import json
+import subprocess
+import time
+
+from run import (APP_DIR, DEFAULT_PROFILE, STOP_TIMEOUT, metrics_environment, probe_health, profile_environment,
+                 stop_process, streamlit_args, wait_until_ready)
+
+# Cookie that pins a browser to a worker
+STICKY_COOKIE = "prompt_generator_worker"
+
+# Path answered by the proxy itself with the load report
+STATUS_PATH = "/_balancer/status"
+
+HEALTH_INTERVAL = 2.0
+# Consecutive failed health checks before a running worker is restarted
+MAX_HEALTH_FAILURES = 3
+
+_PIPE_CHUNK = 64 * 1024
+
+class Worker:
+    """
+    One Streamlit server process and its load counters.
+    """
+
+    def __init__(self, index, port, public_port, profile=DEFAULT_PROFILE, metrics=None):
+        self.index = index
+        self.port = port
+        self.public_port = public_port
+        self.profile = profile
+        # (metrics port, sample_reruns, sample_dir) of this worker, or None
+        self.metrics = metrics
+        self.process = None
+        self.healthy = False
+        self.failures = 0
+        self.restarts = 0
+        self.active = 0
+        self.connections = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def url(self):
+        return f"http://localhost:{self.port}"
+
+    def start(self):
+        env = profile_environment(self.profile)
+        if self.metrics:
+            metrics_environment(env, *self.metrics)
+        self.process = subprocess.Popen(
+            streamlit_args(self.port, public_port=self.public_port),
+            cwd=APP_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        self.healthy = False
+        self.failures = 0
+
+    def stop(self):
+        if self.process is not None:
+            stop_process(self.process)
+
+    async def restart(self):
+        """
+        Replace the process without blocking the event loop while the old one exits.
+        """
+        self.healthy = False
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            deadline = time.monotonic() + STOP_TIMEOUT
+            while process.poll() is None:
+                if time.monotonic() >= deadline:
+                    process.kill()
+                    deadline = float("inf")
+                await asyncio.sleep(0.05)
+        self.restarts += 1
+        self.start()
+
+    def status(self):
+        return {
+            "worker": self.index,
+            "port": self.port,
+            "pid": self.process.pid if self.process else None,
+            "healthy": self.healthy,
+            "active_connections": self.active,
+            "total_connections": self.connections,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "restarts": self.restarts,
+            "metrics_port": self.metrics[0] if self.metrics else None,
+        }
+
+class Balancer:
+    """
+    Sticky-session reverse proxy in front of a pool of workers.
+
+    Parameters:
+    - workers: Number of Streamlit workers
+    - public_port: Port the proxy listens on; workers use the ports after it
+    - profile: Launch profile the workers run with
+    - metrics: (port, sample_reruns, sample_dir) to serve worker metrics on
+      port, port + 1, ...; None to leave them off
+    """
+
+    def __init__(self, workers, public_port, profile=DEFAULT_PROFILE, metrics=None):
+        self.public_port = public_port
+        # Event loop and stop event of serve(), while it runs
+        self._loop = None
+        self._stopped = None
+        self.workers = [
+            Worker(i, public_port + 1 + i, public_port, profile,
+                   (metrics[0] + i, *metrics[1:]) if metrics else None)
+            for i in range(workers)
+        ]
+
+    def start_workers(self, timeout=60):
+        """
+        Start every worker and wait until all of them are ready.
+
+        Returns:
+        - Seconds until the last worker was ready
+        """
+        start = time.monotonic()
+        for worker in self.workers:
+            worker.start()
+        for worker in self.workers:
+            wait_until_ready(worker.process, worker.url, timeout)
+            worker.healthy = True
+        return time.monotonic() - start
+
+    def stop_workers(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def choose(self, cookie_header):
+        """
+        Pick the worker for a request from its Cookie header.
+
+        Returns:
+        - A tuple (worker, whether the sticky cookie must be (re)set)
+        """
+        pinned = _cookie_value(cookie_header, STICKY_COOKIE)
+        if pinned is not None and pinned.isdigit() and int(pinned) < len(self.workers):
+            worker = self.workers[int(pinned)]
+            if worker.healthy:
+                return worker, False
+        healthy = [worker for worker in self.workers if worker.healthy]
+        if not healthy:
+            return None, False
+        return min(healthy, key=lambda worker: worker.active), True
+
+    async def handle_client(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        request_line, headers = _parse_head(head)
+        path = request_line.split(" ")[1] if request_line.count(" ") >= 2 else ""
+        if path.split("?", 1)[0] == STATUS_PATH:
+            body = json.dumps(self.status(), indent=2).encode("utf-8")
+            writer.write(_simple_response(200, "OK", body, "application/json"))
+            await _close(writer)
+            return
+
+        worker, set_cookie = self.choose(headers.get("cookie", ""))
+        upstream = None
+        while worker is not None:
+            try:
+                upstream = await asyncio.open_connection("127.0.0.1", worker.port)
+                break
+            except OSError:
+                # The health loop will restart it; route this browser elsewhere
+                worker.healthy = False
+                worker, set_cookie = self.choose("")
+        if upstream is None:
+            writer.write(_simple_response(503, "Service Unavailable", b"No healthy worker\n", "text/plain"))
+            await _close(writer)
+            return
+
+        up_reader, up_writer = upstream
+        worker.active += 1
+        worker.connections += 1
+        try:
+            up_writer.write(head)
+            worker.bytes_in += len(head)
+            cookie = f"{STICKY_COOKIE}={worker.index}" if set_cookie else None
+            await asyncio.gather(
+                self._pipe(reader, up_writer, worker, "bytes_in"),
+                self._pipe_response(up_reader, writer, worker, cookie),
+            )
+        finally:
+            worker.active -= 1
+            up_writer.close()
+            writer.close()
+
+    async def _pipe(self, source, target, worker, counter):
+        try:
+            while True:
+                data = await source.read(_PIPE_CHUNK)
+                if not data:
+                    break
+                target.write(data)
+                setattr(worker, counter, getattr(worker, counter) + len(data))
+                await target.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Propagate the close so the other direction finishes too
+            if target.can_write_eof():
+                try:
+                    target.write_eof()
+                except OSError:
+                    pass
+
+    async def _pipe_response(self, source, target, worker, cookie):
+        if cookie is not None:
+            # Insert the sticky cookie into the first response head
+            try:
+                head = await source.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                target.close()
+                return
+            head = head[:-2] + f"Set-Cookie: {cookie}; Path=/; SameSite=Lax\r\n\r\n".encode("ascii")
+            target.write(head)
+            worker.bytes_out += len(head)
+        await self._pipe(source, target, worker, "bytes_out")
+
+    async def health_loop(self, interval=HEALTH_INTERVAL):
+        """
+        Check every worker periodically and restart dead or hung ones.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            for worker in self.workers:
+                if worker.process.poll() is not None:
+                    print(f"Worker {worker.index} (port {worker.port}) exited with code "
+                          f"{worker.process.returncode}; restarting.")
+                    await worker.restart()
+                    continue
+                if await asyncio.to_thread(probe_health, worker.url):
+                    worker.healthy = True
+                    worker.failures = 0
+                    continue
+                worker.failures += 1
+                worker.healthy = False
+                if worker.failures >= MAX_HEALTH_FAILURES:
+                    print(f"Worker {worker.index} (port {worker.port}) failed {worker.failures} "
+                          "health checks; restarting.")
+                    await worker.restart()
+
+    async def report_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.report())
+
+    def status(self):
+        return {"port": self.public_port, "workers": [worker.status() for worker in self.workers]}
+
+    def report(self):
+        """
+        Return a human readable per-worker load report.
+        """
+        lines = ["Worker load:"]
+        for worker in self.workers:
+            lines.append(
+                f"  worker {worker.index} port {worker.port}: "
+                f"{'healthy' if worker.healthy else 'DOWN'}, {worker.active} active / "
+                f"{worker.connections} total connections, "
+                f"{worker.bytes_in / 1e6:.1f} MB in, {worker.bytes_out / 1e6:.1f} MB out, "
+                f"{worker.restarts} restarts"
+            )
+        return "\n".join(lines)
+
+    async def serve(self, host="localhost", report_interval=60):
+        """
+        Run the proxy, health checks and load reports until cancelled or stop() is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self.handle_client, host, self.public_port)
+        async with server:
+            tasks = [asyncio.ensure_future(coroutine) for coroutine in (
+                server.serve_forever(),
+                self.health_loop(),
+                self.report_loop(report_interval),
+                self._stopped.wait(),
+            )]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self._loop = None
+
+    def stop(self):
+        """
+        Make serve() return; safe to call from any thread.
+        """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopped.set)
+
+def _parse_head(head):
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+def _cookie_value(cookie_header, name):
+    for part in cookie_header.split(";"):
+        key, _, value = part.strip().partition("=")
+        if key == name:
+            return value
+    return None
+
+def _simple_response(status, reason, body, content_type):
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("ascii") + body
+
+async def _close(writer):
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
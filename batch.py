@@ -0,0 +1,295 @@
+"""
+Headless batch prompt generation.
+
+Reads option sets from JSONL or CSV (a file or stdin) and writes one JSONL
+record per input row with the generated prompt. Rows are processed in chunks
+by a process pool; only a bounded number of chunks is in flight at any time,
+so arbitrarily large inputs are streamed instead of loaded into memory.
+Output keeps the input order.
+
+Usage:
+    python batch.py options.jsonl -o prompts.jsonl --workers 4
+    cat options.csv | python batch.py --format csv > prompts.jsonl
+"""
+import argparse
+import csv
+import inspect
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from prompt_core import generate_prompt
+from prompt_cache import CACHE_PATH_ENV, cached_generate_prompt
+
+# Option names accepted by generate_prompt, in signature order
+PROMPT_OPTIONS = tuple(inspect.signature(generate_prompt).parameters)
+
+# Options that are flags; CSV cells for these are parsed as booleans
+BOOLEAN_OPTIONS = frozenset(
+    name for name, param in inspect.signature(generate_prompt).parameters.items()
+    if isinstance(param.default, bool)
+)
+
+_TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+_FALSE_VALUES = {"0", "false", "no", "n", "off", ""}
+
+def parse_bool(value):
+    """
+    Parse a flag value coming from a CSV cell or a loosely typed JSON field.
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean value: {value!r}")
+
+def normalize_row(row):
+    """
+    Convert an input row into keyword arguments for generate_prompt.
+
+    Columns that are not options of generate_prompt (for example an "id"
+    column) are ignored. Empty cells and null values are treated as not
+    specified, so generate_prompt's defaults apply.
+
+    Parameters:
+    - row: Mapping read from a JSONL line or a CSV record
+
+    Returns:
+    - A dict of generate_prompt keyword arguments
+    """
+    options = {}
+    for name in PROMPT_OPTIONS:
+        if name not in row:
+            continue
+        value = row[name]
+        if value is None or value == "":
+            continue
+        if name in BOOLEAN_OPTIONS:
+            value = parse_bool(value)
+        options[name] = value
+    return options
+
+def read_rows(stream, fmt):
+    """
+    Lazily yield input rows as dicts.
+
+    Parameters:
+    - stream: Text stream to read from
+    - fmt: Either "jsonl" or "csv"
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {line_number} is not a JSON object")
+        yield row
+
+def chunked(rows, chunk_size):
+    """
+    Group an iterable of rows into lists of at most chunk_size rows.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def generate_chunk(rows, first_row=1):
+    """
+    Generate the output records for a chunk of rows.
+
+    This is the unit of work sent to the process pool.
+
+    Parameters:
+    - rows: Input rows of the chunk
+    - first_row: Number of the chunk's first row in the input, for error messages
+
+    Returns:
+    - A tuple (serialized JSONL text, worker pid, seconds spent)
+
+    Raises:
+    - ValueError naming the row if a row has invalid options
+    """
+    start = time.perf_counter()
+    lines = []
+    for number, row in enumerate(rows, first_row):
+        record = {"id": row["id"]} if "id" in row else {}
+        try:
+            record["prompt"] = cached_generate_prompt(**normalize_row(row))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Row {number}: {e}") from e
+        lines.append(json.dumps(record, ensure_ascii=False))
+    lines.append("")
+    return "\n".join(lines), os.getpid(), time.perf_counter() - start
+
+class BatchStats:
+    """
+    Throughput counters for a batch run, aggregated per worker process.
+
+    Parameters:
+    - unit: What a row is called in the report
+    """
+
+    def __init__(self, unit="rows"):
+        self.unit = unit
+        self.rows = 0
+        self.chunks = 0
+        self.workers = {}
+        self.start = time.perf_counter()
+        self.end = None
+
+    def record(self, pid, rows, busy):
+        self.rows += rows
+        self.chunks += 1
+        worker = self.workers.setdefault(pid, {"rows": 0, "chunks": 0, "busy": 0.0})
+        worker["rows"] += rows
+        worker["chunks"] += 1
+        worker["busy"] += busy
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def report(self):
+        """
+        Return a human readable throughput report.
+        """
+        elapsed = self.elapsed
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        lines = [f"Generated {self.rows} prompts in {self.chunks} chunks "
+                 f"in {elapsed:.3f}s ({rate:,.0f} {self.unit}/s)"]
+        for pid, worker in sorted(self.workers.items()):
+            busy = worker["busy"]
+            worker_rate = worker["rows"] / busy if busy > 0 else 0.0
+            lines.append(f"  worker {pid}: {worker['rows']} {self.unit}, {worker['chunks']} chunks, "
+                         f"busy {busy:.3f}s ({worker_rate:,.0f} {self.unit}/s)")
+        return "\n".join(lines)
+
+def run_batch(rows, output, workers=None, chunk_size=1000, max_pending=None):
+    """
+    Generate prompts for every row and write them to output in input order.
+
+    At most max_pending chunks are submitted to the pool but not yet written,
+    which bounds memory use regardless of the input size.
+
+    Parameters:
+    - rows: Iterable of input rows (dicts)
+    - output: Text stream the JSONL records are written to
+    - workers: Number of worker processes (1 runs in the current process)
+    - chunk_size: Number of rows per unit of work
+    - max_pending: Maximum number of chunks in flight (default: 2 per worker)
+
+    Returns:
+    - The BatchStats of the run
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    stats = BatchStats()
+    chunks = chunked(rows, chunk_size)
+    first_row = 1
+
+    if workers == 1:
+        for chunk in chunks:
+            text, pid, busy = generate_chunk(chunk, first_row)
+            output.write(text)
+            stats.record(pid, len(chunk), busy)
+            first_row += len(chunk)
+        stats.finish()
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            # Backpressure: wait for the oldest chunk before reading more input
+            if len(pending) >= max_pending:
+                _write_result(pending.popleft(), output, stats)
+            pending.append((pool.submit(generate_chunk, chunk, first_row), len(chunk)))
+            first_row += len(chunk)
+        while pending:
+            _write_result(pending.popleft(), output, stats)
+
+    stats.finish()
+    return stats
+
+def _write_result(item, output, stats):
+    future, rows = item
+    text, pid, busy = future.result()
+    output.write(text)
+    stats.record(pid, rows, busy)
+
+def _detect_format(path, fmt):
+    if fmt:
+        return fmt
+    if path and path.lower().endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate AI prompts in bulk from JSONL or CSV option sets.")
+    parser.add_argument("input", nargs="?", help="Input file (default: stdin)")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="Input format (default: from file extension, jsonl for stdin)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="Rows per unit of work")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="Maximum chunks in flight (default: 2 per worker)")
+    parser.add_argument("--cache", help=f"Shared prompt cache database (default: ${CACHE_PATH_ENV})")
+    parser.add_argument("--quiet", action="store_true", help="Do not print the throughput report")
+    args = parser.parse_args()
+
+    if args.cache:
+        # Set through the environment so pool workers inherit it
+        os.environ[CACHE_PATH_ENV] = args.cache
+
+    fmt = _detect_format(args.input, args.format)
+    if args.input:
+        source = open(args.input, "r", encoding="utf-8", newline="")
+    else:
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    if args.output:
+        target = open(args.output, "w", encoding="utf-8", newline="\n")
+    else:
+        target = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="\n")
+
+    try:
+        stats = run_batch(read_rows(source, fmt), target, workers=args.workers,
+                          chunk_size=args.chunk_size, max_pending=args.max_pending)
+    except (TypeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        target.flush()
+        source.close()
+        if args.output:
+            target.close()
+
+    if not args.quiet:
+        print(stats.report(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
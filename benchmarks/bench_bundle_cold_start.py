@@ -0,0 +1,122 @@
+"""
+Cold start of the built bundle compared with `python run.py`.
+
+Launches the bundle's launcher and `python run.py` from the source tree in
+turn, several rounds each, and reports the time until the app page is served
+(see run_benchmarks.bench_cold_start). Before that it starts the bundle once and
+drives a UI session over the websocket (type a task, click Generate) to
+check the app actually runs from the bundle, not just its server.
+
+Fails if the smoke session fails, if the bundle's mean time to the first page
+exceeds --budget seconds, or if it is more than --tolerance slower than the
+source tree. Called by build_bundle.py after every build; port 8501 must be
+free.
+
+Usage:
+    python benchmarks/bench_bundle_cold_start.py [--bundle dist/ai_prompt_generator] [--rounds 3]
+        [--budget 5.0] [--tolerance 0.1]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_ui_websocket import GENERATE_EVENT, UISession
+from run_benchmarks import _stop_launcher, _wait_for_page, bench_cold_start
+from single_instance import INSTANCE_DIR_ENV
+
+DEFAULT_BUNDLE = os.path.join(ROOT, "dist", "ai_prompt_generator")
+
+class SmokeSession(UISession):
+    """
+    UI session that also records the exceptions the script rendered.
+    """
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.exceptions = []
+
+    def _record_widget(self, delta):
+        if delta.WhichOneof("type") == "new_element" and delta.new_element.WhichOneof("type") == "exception":
+            self.exceptions.append(delta.new_element.exception.message)
+        super()._record_widget(delta)
+
+async def _drive_session(url):
+    session = SmokeSession(url)
+    await session.connect()
+    try:
+        await session.run()
+        await session.interact("Enter your task for the AI:", "Add a health check endpoint")
+        await session.interact("prompt_preview", GENERATE_EVENT)
+    finally:
+        await session.close()
+    return session.exceptions
+
+def smoke_test(launcher, timeout=60):
+    """
+    Start the bundle and drive one UI session against it.
+
+    Raises:
+    - RuntimeError if the page is not served or the script raised
+    """
+    directory = tempfile.mkdtemp(prefix="prompt_instance_")
+    env = dict(os.environ, BROWSER="true", PROMPT_HISTORY_PATH="off")
+    env[INSTANCE_DIR_ENV] = directory
+    process = subprocess.Popen([launcher], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    try:
+        _wait_for_page("http://localhost:8501/", process, timeout)
+        exceptions = asyncio.run(_drive_session("ws://localhost:8501/_stcore/stream"))
+    finally:
+        _stop_launcher(process)
+        shutil.rmtree(directory, ignore_errors=True)
+    if exceptions:
+        raise RuntimeError("The app raised when run from the bundle:\n" + "\n".join(exceptions))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cold start of the bundle with the source tree.")
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE, help="Bundle directory built by build_bundle.py")
+    parser.add_argument("--rounds", type=int, default=3, help="Cold starts per variant")
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="Fail if the bundle's mean time to the first page exceeds this many seconds")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fail if the bundle is slower than the source tree by more than this (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    launcher = os.path.join(args.bundle, os.path.basename(os.path.normpath(args.bundle)))
+    if not os.access(launcher, os.X_OK):
+        parser.error(f"no bundle launcher at {launcher}; run build_bundle.py first")
+
+    print("Smoke-testing the bundle...", file=sys.stderr)
+    smoke_test(launcher)
+    results = {}
+    for name, command in (("bundle", [launcher]), ("source", None)):
+        print(f"Measuring {name} cold starts...", file=sys.stderr)
+        results[name] = bench_cold_start(rounds=args.rounds, command=command)
+
+    for name, result in results.items():
+        print(f"{name:<8} first page: best {result['first_page_best'] * 1e3:8.1f} ms, "
+              f"mean {result['first_page_mean'] * 1e3:8.1f} ms")
+    bundle = results["bundle"]["first_page_mean"]
+    source = results["source"]["first_page_mean"]
+    print(f"bundle / source: {bundle / source:.2f}x")
+
+    failures = []
+    if bundle > args.budget:
+        failures.append(f"the bundle's mean cold start exceeds the {args.budget:g} s budget")
+    if bundle > source * (1 + args.tolerance):
+        failures.append(f"the bundle starts more than {args.tolerance:.0%} slower than `python run.py`")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
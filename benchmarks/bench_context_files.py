@@ -0,0 +1,84 @@
+"""
+Selection time and peak memory of the Context Files section.
+
+Builds a directory with many small source files (a share of them duplicated)
+and one large file, then reports:
+    - select:   collect_context on every file under the default 256 KB budget
+    - tokens:   collect_context on the large file with a token budget too,
+                which only tokenizes the head that fits in 256 KB
+    - text:     the section for the large file as one string (no budget)
+    - write:    the same section streamed into a temporary file in 1 MB chunks
+
+Peaks are tracemalloc peaks of each call. Mapped file pages are not Python
+allocations, so the write peak only counts the decoded chunks in flight.
+
+Usage:
+    python benchmarks/bench_context_files.py [--files 2000] [--size 100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_prompt_memory import MB, measure
+from context_files import collect_context
+from prompt_core import WRITE_CHUNK_SIZE
+
+# Token budget of the tokens measurement
+TOKEN_BUDGET = 20000
+
+SOURCE = "def handler(event, context):\n    return {{'status': {index}, 'body': event}}\n\n" * 20
+
+def build_files(root, files, size_mb):
+    for index in range(files):
+        directory = os.path.join(root, "src", f"pkg{index // 100}")
+        os.makedirs(directory, exist_ok=True)
+        # Every tenth file repeats the contents of the previous one
+        with open(os.path.join(directory, f"module{index}.py"), "w", encoding="utf-8") as f:
+            f.write(SOURCE.format(index=index - index % 10 // 9))
+    line = "2026-01-01 12:00:00 INFO request handled in 12 ms\n"
+    with open(os.path.join(root, "large.log"), "w", encoding="utf-8") as f:
+        for _ in range(size_mb):
+            f.write(line * (MB // len(line)))
+
+def _text(root):
+    return collect_context(["large.log"], base_dir=root, max_bytes=float("inf")).text()
+
+def _tokens(root):
+    return collect_context(["large.log"], base_dir=root, max_tokens=TOKEN_BUDGET)
+
+def _write(root, path):
+    section = collect_context(["large.log"], base_dir=root, max_bytes=float("inf"))
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in section.chunks(WRITE_CHUNK_SIZE):
+            f.write(chunk)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="Number of small source files")
+    parser.add_argument("--size", type=int, default=100, help="Size of the large file in MB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Building {args.files} source files and a {args.size} MB file...", file=sys.stderr)
+        build_files(root, args.files, args.size)
+
+        peak, seconds = measure(collect_context, ["src/**/*.py"], root)
+        section = collect_context(["src/**/*.py"], base_dir=root)
+        counts = ", ".join(f"{count} {status}" for status, count in sorted(section.summary().items()))
+        print(f"select: {seconds:.3f}s, peak {peak / MB:.1f} MB ({counts}; {section.bytes} bytes included)")
+
+        peak, seconds = measure(_tokens, root)
+        section = _tokens(root)
+        print(f"tokens: {seconds:.3f}s, peak {peak / MB:.1f} MB ({section.bytes} bytes, "
+              f"~{section.tokens} tokens of a {args.size} MB file within {TOKEN_BUDGET} tokens)")
+
+        for name, func, func_args in (("text", _text, (root,)),
+                                      ("write", _write, (root, os.path.join(root, "out.md")))):
+            peak, seconds = measure(func, *func_args)
+            print(f"{name:>6}: {seconds:.3f}s, peak {peak / MB:.1f} MB for a {args.size} MB file")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Micro-benchmark for generate_prompt.
+
+Checks that the compiled template engine produces byte-identical output to the
+original string-concatenation implementation for every option combination,
+then times both implementations over a large number of calls.
+
+Usage:
+    python benchmarks/bench_generate_prompt.py [--calls N]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_core import generate_prompt
+
+def legacy_generate_prompt(task="", language="english", edit_file=False, generate_file=False, 
+                          ban_request=False, unittest=False, run=False, dir=None,
+                          code_style=None, documentation_level=None, error_handling=False,
+                          performance_optimization=False, security_check=False, 
+                          framework=None, compatibility=None, explanation_detail="medium"):
+    """
+    Reference implementation of generate_prompt before the compiled engine,
+    kept verbatim to check that the engine output is byte-identical.
+
+    Parameters:
+    - task: The specific task for the AI
+    - language: Language for the response (english, chinese, spanish, french)
+    - edit_file: Whether to allow AI to edit files
+    - generate_file: Whether to allow AI to generate files
+    - ban_request: Whether to ban certain requests
+    - unittest: Whether to create a unittest
+    - run: Whether to run tests after generation without modifying existing tests
+    - dir: Directory to be checked
+    - code_style: Preferred code style (PEP8, Google, etc.)
+    - documentation_level: Level of documentation required
+    - error_handling: Whether to include error handling
+    - performance_optimization: Whether to optimize for performance
+    - security_check: Whether to include security considerations
+    - framework: Preferred framework to use
+    - compatibility: Compatibility requirements
+    - explanation_detail: Level of detail in explanations
+
+    Returns:
+    - A formatted prompt string
+    """
+    prompt = ""
+
+    # Add the task if provided
+    if task:
+        prompt += f"Task: {task}\n\n"
+
+    # Language & Communication settings
+    if language != "english":
+        if language == "chinese":
+            prompt += "请使用中文回答。\n\n"
+        elif language == "spanish":
+            prompt += "Por favor, responde en español.\n\n"
+        elif language == "french":
+            prompt += "Veuillez répondre en français.\n\n"
+
+    # Explanation detail
+    if explanation_detail != "medium":
+        prompt += f"Please provide {explanation_detail} level of detail in your explanations.\n"
+
+    # File operations permissions section
+    has_file_ops = edit_file or (not generate_file) or ban_request
+    if has_file_ops:
+        prompt += "## File Operations\n"
+        if edit_file:
+            prompt += "You are allowed to edit existing files.\n"
+
+        if not generate_file:  # Default is True, so only include if False
+            prompt += "You are NOT allowed to generate new files.\n"
+
+        if ban_request:
+            prompt += "Please do not make any external API calls or access external resources.\n"
+
+    # Code Quality & Style section
+    has_code_quality = code_style or documentation_level or error_handling
+    if has_code_quality:
+        prompt += "\n## Code Quality & Style\n"
+        if code_style:
+            prompt += f"Please follow {code_style} style guidelines.\n"
+
+        if documentation_level:
+            prompt += f"Include {documentation_level} level of documentation in the code.\n"
+
+        if error_handling:
+            prompt += "Implement proper error handling and validation.\n"
+
+    # Performance & Security section
+    if performance_optimization or security_check:
+        prompt += "\n## Performance & Security\n"
+        if performance_optimization:
+            prompt += "Optimize the code for performance.\n"
+        if security_check:
+            prompt += "Include security best practices and considerations.\n"
+
+    # Framework & Compatibility section
+    if framework or compatibility:
+        prompt += "\n## Framework & Compatibility\n"
+        if framework:
+            prompt += f"Use {framework} framework.\n"
+        if compatibility:
+            prompt += f"Ensure compatibility with {compatibility}.\n"
+
+    # Testing & Execution section
+    has_testing = unittest or run
+    if has_testing:
+        prompt += "\n## Testing & Execution\n"
+        if unittest:
+            prompt += "Please create unit tests for the code.\n"
+        if run:
+            prompt += "Please run the tests after generation without modifying existing tests.\n"
+
+    # Project Specifics section
+    if dir:
+        prompt += f"\n## Project Specifics\nPlease check the following directory: {dir}\n"
+
+    return prompt
+
+def option_combinations():
+    """
+    Yield keyword arguments covering every option value offered by the UI.
+    """
+    languages = ["english", "chinese", "spanish", "french", "german"]
+    details = ["minimal", "low", "medium", "high", "comprehensive"]
+    styles = [None, "", "PEP8", "Google"]
+    doc_levels = [None, "minimal", "comprehensive"]
+    frameworks = [None, "Django", "React"]
+    compatibilities = [None, "Python 3.8+"]
+    dirs = [None, "", "src/app"]
+    tasks = ["", "Refactor the parser"]
+    flags = itertools.product([False, True], repeat=8)
+    for values in itertools.product(languages, details, styles, doc_levels,
+                                    frameworks, compatibilities, dirs, tasks, flags):
+        (language, detail, style, doc_level, framework, compatibility,
+         dir, task, flag_values) = values
+        (edit_file, generate_file, ban_request, unittest, run, error_handling,
+         performance_optimization, security_check) = flag_values
+        yield dict(
+            task=task, language=language, edit_file=edit_file,
+            generate_file=generate_file, ban_request=ban_request,
+            unittest=unittest, run=run, dir=dir, code_style=style,
+            documentation_level=doc_level, error_handling=error_handling,
+            performance_optimization=performance_optimization,
+            security_check=security_check, framework=framework,
+            compatibility=compatibility, explanation_detail=detail,
+        )
+
+# Values callers may pass that the UI never does; they are formatted like any other
+EDGE_OPTIONS = [
+    dict(task=5),
+    dict(task=1.5, dir="src/app"),
+    dict(task=["a", "b"], explanation_detail=None),
+    dict(task=0, dir=0),
+]
+
+def check_parity(limit=None):
+    """
+    Compare both implementations and return the number of checked combinations.
+    """
+    checked = 0
+    for options in itertools.chain(EDGE_OPTIONS, itertools.islice(option_combinations(), limit)):
+        expected = legacy_generate_prompt(**options)
+        actual = generate_prompt(**options)
+        if actual != expected:
+            raise AssertionError(f"Output mismatch for options {options!r}")
+        checked += 1
+    return checked
+
+def time_calls(func, option_sets, calls):
+    """
+    Call func with the given option sets in rotation and return elapsed seconds.
+    """
+    rounds, remainder = divmod(calls, len(option_sets))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for options in option_sets:
+            func(**options)
+    for options in option_sets[:remainder]:
+        func(**options)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=1_000_000,
+                        help="Number of calls timed per implementation")
+    parser.add_argument("--parity-limit", type=int, default=None,
+                        help="Only check the first N option combinations")
+    args = parser.parse_args()
+
+    checked = check_parity(args.parity_limit)
+    print(f"Parity: {checked} option combinations are byte-identical")
+
+    # A realistic working set: a few dozen distinct option sets reused
+    option_sets = list(itertools.islice(option_combinations(), 0, None, 9973))[:64]
+
+    legacy_time = time_calls(legacy_generate_prompt, option_sets, args.calls)
+    engine_time = time_calls(generate_prompt, option_sets, args.calls)
+
+    for name, elapsed in (("legacy", legacy_time), ("compiled", engine_time)):
+        print(f"{name:>8}: {elapsed:.3f}s for {args.calls} calls "
+              f"({args.calls / elapsed:,.0f} calls/s, {elapsed / args.calls * 1e9:.0f} ns/call)")
+    print(f" speedup: {legacy_time / engine_time:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Search latency of the prompt history at a large number of stored prompts.
+
+Fills a history database with generated prompts for random tasks and option
+sets (1M by default; an existing database given with --db is reused), then
+runs typical searches and reports p50/p95/max latency. Also reports how long
+record() blocks the caller. Exits with an error when a search's p95 exceeds
+the budget.
+
+Usage:
+    python benchmarks/bench_history_search.py [--rows 1000000] [--db PATH] [--budget-ms 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_core import generate_prompt
+from prompt_history import PromptHistory
+
+WORDS = ("fix add refactor remove update login parser cache button layout query index "
+         "export import report user account payment invoice search filter sort upload "
+         "download email token session config logging retry timeout database migration "
+         "endpoint handler widget chart table form validation test coverage docs").split()
+# Appears in about one task in ten thousand
+RARE_WORD = "quasar"
+
+LANGUAGES = ("english", "chinese", "spanish", "french")
+FRAMEWORKS = (None, "Django", "Flask", "FastAPI", "React", "Vue")
+STYLES = (None, "PEP8", "Google", "NumPy")
+
+SEARCHES = (
+    ("rare term", RARE_WORD, {}),
+    ("common term", "login", {}),
+    ("two terms", "payment timeout", {}),
+    ("prefix while typing", "migr", {}),
+    ("prompt text", "unit tests", {}),
+    ("option filter", "", {"language": "chinese"}),
+    ("text and filters", "session", {"framework": "Django", "unittest": True}),
+    ("recent entries", "", {}),
+)
+
+def random_record(rng, index):
+    words = rng.choices(WORDS, k=rng.randint(5, 25))
+    if rng.random() < 1e-4:
+        words.append(RARE_WORD)
+    options = {
+        "task": f"{' '.join(words)} #{index}",
+        "language": rng.choice(LANGUAGES),
+        "framework": rng.choice(FRAMEWORKS),
+        "code_style": rng.choice(STYLES),
+        "unittest": rng.random() < 0.5,
+        "run": rng.random() < 0.5,
+        "error_handling": rng.random() < 0.3,
+    }
+    return options, generate_prompt(**options)
+
+def fill(history, rows, batch=10000):
+    existing = history.stats()["entries"]
+    rng = random.Random(existing)
+    start = time.perf_counter()
+    now = time.time()
+    for offset in range(existing, rows, batch):
+        history.write([(now, *random_record(rng, index))
+                       for index in range(offset, min(offset + batch, rows))])
+        print(f"  {min(offset + batch, rows)} rows", end="\r", file=sys.stderr)
+    if rows > existing:
+        print(f"Stored {rows - existing} prompts in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Stored prompts")
+    parser.add_argument("--db", help="History database to fill and reuse (default: temporary)")
+    parser.add_argument("--repeats", type=int, default=50, help="Runs of each search")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Allowed p95 search latency")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.db or os.path.join(directory, "history.sqlite3")
+        history = PromptHistory(path, max_entries=None, max_age_days=None, max_bytes=None)
+        fill(history, args.rows)
+        stats = history.stats()
+        print(f"{stats['entries']} entries, {stats['bytes'] / 1e6:.0f} MB of prompts, "
+              f"database {os.path.getsize(path) / 1e6:.0f} MB")
+
+        failed = False
+        print(f"{'search':<22}{'results':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}")
+        for name, query, filters in SEARCHES:
+            timings = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                results = history.search(query, limit=20, **filters)
+                timings.append((time.perf_counter() - start) * 1e3)
+            p95 = percentile(timings, 0.95)
+            failed |= p95 > args.budget_ms
+            print(f"{name:<22}{len(results):>8}{statistics.median(timings):>10.2f}{p95:>10.2f}"
+                  f"{max(timings):>10.2f}{'  over budget' if p95 > args.budget_ms else ''}")
+
+        # record() only queues; the background thread does the writing
+        rng = random.Random(1)
+        records = [random_record(rng, args.rows + index) for index in range(1000)]
+        start = time.perf_counter()
+        for options, prompt in records:
+            history.record(options, prompt)
+        queued = time.perf_counter() - start
+        history.flush()
+        print(f"record(): {queued / len(records) * 1e6:.1f} us per call "
+              f"({history.stats()['dropped']} dropped)")
+        history.close()
+
+    if failed:
+        print(f"FAIL: a search exceeded the {args.budget_ms:.0f} ms p95 budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
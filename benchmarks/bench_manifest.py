@@ -0,0 +1,114 @@
+"""
+Cold and warm scans for the directory manifest.
+
+Builds a synthetic repository (nested packages, an ignored node_modules tree
+and ignored build logs), then scans it three times with a fresh index:
+    - cold:     empty index, every listed file is read
+    - warm:     unchanged tree, line counts come from the index
+    - touched:  after modifying a fraction of the files, only those are read
+
+Each scan runs on a thread of its own, as every rerun of the UI does, so
+the index's shared connection is used from several threads.
+
+Usage:
+    python benchmarks/bench_manifest.py [--files 20000] [--workers 8] [--touched 0.01]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manifest import ManifestIndex, format_manifest, scan_directory
+
+FILES_PER_DIR = 40
+
+SOURCE = "import os\n\n\ndef handler(event):\n    return os.path.join('a', event)\n" * 8
+
+def build_tree(root, files):
+    """
+    Create a repository with about the given number of listed files.
+
+    Returns:
+    - The paths of the files that are not ignored
+    """
+    with open(os.path.join(root, ".gitignore"), "w", encoding="utf-8") as f:
+        f.write("node_modules/\n*.log\n")
+    os.mkdir(os.path.join(root, ".git"))
+    listed = []
+    for index in range(files):
+        directory = os.path.join(root, "src", f"pkg{index // (FILES_PER_DIR * 25)}",
+                                 f"mod{index // FILES_PER_DIR % 25}")
+        if index % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+            # Ignored noise next to the sources
+            with open(os.path.join(directory, "build.log"), "w", encoding="utf-8") as f:
+                f.write("log line\n" * 100)
+        path = os.path.join(directory, f"file{index % FILES_PER_DIR}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(SOURCE)
+        listed.append(path)
+    # An ignored dependency tree a fifth of the size of the sources
+    for index in range(files // 5):
+        directory = os.path.join(root, "node_modules", f"dep{index // FILES_PER_DIR}")
+        if index % FILES_PER_DIR == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f"index{index % FILES_PER_DIR}.js"), "w", encoding="utf-8") as f:
+            f.write("module.exports = {};\n")
+    return listed
+
+def scan_on_new_thread(root, **kwargs):
+    """
+    Run scan_directory on a thread of its own and return its result.
+    """
+    results = []
+    thread = threading.Thread(target=lambda: results.append(scan_directory(root, **kwargs)))
+    thread.start()
+    thread.join()
+    if not results:
+        raise RuntimeError("the scan raised; see the traceback above")
+    return results[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="Listed files in the synthetic tree")
+    parser.add_argument("--workers", type=int, default=8, help="Scanning threads")
+    parser.add_argument("--touched", type=float, default=0.01, help="Fraction of files modified before the last scan")
+    parser.add_argument("--max-seconds", type=float, default=120.0, help="Scan time limit")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, "repo")
+        os.mkdir(root)
+        print(f"Building a tree with {args.files} listed files...", file=sys.stderr)
+        listed = build_tree(root, args.files)
+        index = ManifestIndex(os.path.join(directory, "index.sqlite3"))
+
+        runs = []
+        for name in ("cold", "warm", "touched"):
+            if name == "touched":
+                later = time.time() + 10
+                for path in random.Random(0).sample(listed, max(1, int(len(listed) * args.touched))):
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("# changed\n")
+                    os.utime(path, (later, later))
+            result = scan_on_new_thread(root, workers=args.workers, max_seconds=args.max_seconds, index=index)
+            start = time.perf_counter()
+            text = format_manifest(result)
+            render = time.perf_counter() - start
+            runs.append((name, result, render, len(text.encode("utf-8"))))
+
+    print(f"{'scan':>8}{'time (s)':>10}{'files':>8}{'read':>8}{'reused':>8}{'render (ms)':>13}{'manifest':>10}")
+    for name, result, render, size in runs:
+        note = f"  ({result.truncated})" if result.truncated else ""
+        print(f"{name:>8}{result.seconds:>10.3f}{len(result.files):>8}{result.read:>8}{result.reused:>8}"
+              f"{render * 1e3:>13.1f}{size:>10}{note}")
+    cold, warm = runs[0][1].seconds, runs[1][1].seconds
+    print(f"warm speedup: {cold / warm:.1f}x")
+
+if __name__ == "__main__":
+    main()
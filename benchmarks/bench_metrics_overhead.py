@@ -0,0 +1,111 @@
+"""
+Overhead of the instrumentation, disabled and enabled.
+
+Measures:
+    - generate_prompt with instrumentation off, against an uninstrumented
+      reference built from the same template engine, and with it on
+    - the cost of the no-op phase() and timed_rerun() hooks, scaled to the
+      hooks passed in one UI rerun, against the measured rerun time of main.py
+
+Exits with an error when the disabled overhead exceeds the budget: 3% of a
+generate_prompt call, or 1% of a UI rerun.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py [--calls 200000] [--repeats 7]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+import prompt_core
+from prompt_core import generate_prompt
+
+OPTIONS = dict(task="Refactor the parser module", language="chinese", unittest=True, run=True,
+               dir="src/app", code_style="PEP8", error_handling=True, framework="Django")
+
+# Hooks in a full run of main.py: 2 rerun scopes, 9 phases
+RERUN_HOOKS = 2
+PHASE_HOOKS = 9
+
+def reference_prompt(task="", language="english", edit_file=False, generate_file=False,
+                     ban_request=False, unittest=False, run=False, dir=None,
+                     code_style=None, documentation_level=None, error_handling=False,
+                     performance_optimization=False, security_check=False,
+                     framework=None, compatibility=None, explanation_detail="medium",
+                     dir_manifest=None, context_files=None, context_budget=None):
+    """
+    generate_prompt without the observer check.
+    """
+    parts = prompt_core._prompt_parts(task, dir, prompt_core._prompt_body(
+        language, edit_file, generate_file, ban_request, unittest, run,
+        code_style, documentation_level, error_handling, performance_optimization,
+        security_check, framework, compatibility, explanation_detail,
+    ), dir_manifest)
+    if context_files:
+        parts += tuple(prompt_core._context_section(context_files, context_budget, dir).chunks())
+    return "".join(parts)
+
+def best_ns(func, calls, repeats):
+    return min(timeit.repeat(func, number=calls, repeat=repeats)) / calls * 1e9
+
+def rerun_seconds(rounds=5):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=30)
+    app.run()
+    timings = []
+    for index in range(rounds * 2):
+        app.number_input(key="opt_context_budget").set_value(index % 2 * 1000)
+        timings.append(timeit.timeit(app.run, number=1))
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000, help="Calls per timing")
+    parser.add_argument("--repeats", type=int, default=7, help="Timings per measurement; the best is kept")
+    args = parser.parse_args()
+    assert generate_prompt(**OPTIONS) == reference_prompt(**OPTIONS)
+
+    call = lambda: generate_prompt(**OPTIONS)
+    # Alternate the two so that drifting machine load affects both alike
+    reference = disabled = float("inf")
+    for _ in range(args.repeats):
+        reference = min(reference, best_ns(lambda: reference_prompt(**OPTIONS), args.calls, 1))
+        disabled = min(disabled, best_ns(call, args.calls, 1))
+    metrics.enable()
+    enabled = best_ns(call, args.calls, args.repeats)
+    metrics.disable()
+    generate_overhead = (disabled - reference) / reference
+    print(f"generate_prompt: reference {reference:.0f} ns, disabled {disabled:.0f} ns "
+          f"({generate_overhead:+.1%}), enabled {enabled:.0f} ns ({(enabled - reference) / reference:+.1%})")
+
+    def hooks():
+        with metrics.phase("css"):
+            pass
+    wrapped = metrics.timed_rerun("app")(lambda: None)
+    phase_ns = best_ns(hooks, args.calls, args.repeats)
+    rerun_ns = best_ns(wrapped, args.calls, args.repeats) - best_ns(lambda: None, args.calls, args.repeats)
+    per_rerun = PHASE_HOOKS * phase_ns + RERUN_HOOKS * rerun_ns
+    rerun = rerun_seconds()
+    rerun_overhead = per_rerun / (rerun * 1e9)
+    print(f"UI hooks (disabled): phase {phase_ns:.0f} ns, rerun wrapper {rerun_ns:.0f} ns, "
+          f"{per_rerun / 1e3:.1f} us per run = {rerun_overhead:.3%} of a {rerun * 1e3:.1f} ms rerun")
+
+    failed = []
+    if generate_overhead > 0.03:
+        failed.append(f"generate_prompt overhead {generate_overhead:.1%} exceeds 3%")
+    if rerun_overhead > 0.01:
+        failed.append(f"UI rerun overhead {rerun_overhead:.2%} exceeds 1%")
+    for message in failed:
+        print(f"FAIL: {message}")
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark for the shared prompt cache.
+
+Generates the same workload of option sets four ways and reports the time
+per call and the cache counters:
+    - uncached: plain generate_prompt
+    - cold:     empty cache, every call misses and stores its prompt
+    - warm:     same process, every call hits
+    - warm-mt:  several threads sharing one cache, like Streamlit reruns
+    - warm-mp:  several processes reading the cache filled by the cold run
+
+Fails if a warm run misses, e.g. because the connection cannot be used
+from another thread, or if the options the UI sends cannot be cached.
+
+Usage:
+    python benchmarks/bench_prompt_cache.py [--calls N] [--threads T] [--processes P] [--task-size BYTES]
+"""
+import argparse
+import itertools
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import current_options
+from prompt_core import generate_prompt
+from prompt_cache import PromptCache
+
+def build_workload(calls, task_size):
+    """
+    Return a list of distinct option sets of the requested size.
+    """
+    styles = [None, "PEP8", "Google", "NumPy"]
+    languages = ["english", "chinese", "spanish", "french"]
+    workload = []
+    for index, (style, language, unittest, edit_file) in enumerate(itertools.cycle(
+            itertools.product(styles, languages, [False, True], [False, True]))):
+        if index >= calls:
+            break
+        task = f"Task #{index} " + "x" * max(0, task_size - 12)
+        workload.append(dict(task=task, language=language, code_style=style,
+                             unittest=unittest, edit_file=edit_file))
+    return workload
+
+def _timed(func, workload):
+    start = time.perf_counter()
+    for options in workload:
+        func(**options)
+    return time.perf_counter() - start
+
+def _warm_worker(path, workload):
+    cache = PromptCache(path)
+    elapsed = _timed(cache.generate, workload)
+    return elapsed, cache.hits, cache.misses
+
+def check_ui_options(cache):
+    """
+    Check that the options of the UI, with every widget at its default, are cached.
+    """
+    options = dict(current_options({}), task="Fix the login bug")
+    cache.hits = cache.misses = 0
+    for _ in range(2):
+        cache.generate(**options)
+    if (cache.misses, cache.hits) != (1, 1):
+        raise AssertionError(f"UI options were not cached: {cache.misses} misses, {cache.hits} hits, "
+                             f"{cache.bypassed} bypassed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared prompt cache.")
+    parser.add_argument("--calls", type=int, default=20000, help="Option sets in the workload")
+    parser.add_argument("--threads", type=int, default=4, help="Threads for the warm multi-thread run")
+    parser.add_argument("--processes", type=int, default=4, help="Processes for the warm multi-process run")
+    parser.add_argument("--task-size", type=int, default=2000, help="Task length in characters")
+    args = parser.parse_args()
+
+    workload = build_workload(args.calls, args.task_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "prompt_cache.sqlite3")
+        cache = PromptCache(path)
+
+        check_ui_options(cache)
+        cache.clear()
+        cache.hits = cache.misses = 0
+        results = [("uncached", _timed(generate_prompt, workload), args.calls, "")]
+
+        cold = _timed(cache.generate, workload)
+        results.append(("cold", cold, args.calls, f"{cache.misses} misses"))
+
+        cache.hits = cache.misses = 0
+        warm = _timed(cache.generate, workload)
+        results.append(("warm", warm, args.calls, f"{cache.hits} hits"))
+
+        cache.hits = cache.misses = 0
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            start = time.perf_counter()
+            list(pool.map(lambda options: cache.generate(**options), workload * args.threads))
+            wall = time.perf_counter() - start
+        results.append(("warm-mt", wall, args.calls * args.threads,
+                        f"{cache.hits} hits across {args.threads} threads"))
+        if cache.hits != args.calls * args.threads:
+            raise AssertionError(f"{cache.misses} misses in the multi-thread run")
+
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            start = time.perf_counter()
+            runs = list(pool.map(_warm_worker, [path] * args.processes, [workload] * args.processes))
+            wall = time.perf_counter() - start
+        hits = sum(run[1] for run in runs)
+        if hits != args.calls * args.processes:
+            raise AssertionError(f"{args.calls * args.processes - hits} misses in the multi-process run")
+        results.append(("warm-mp", wall, args.calls * args.processes,
+                        f"{hits} hits across {args.processes} processes"))
+
+        stats = cache.stats()
+        cache.close()
+
+    print(f"Workload: {args.calls} option sets, task size {args.task_size} characters")
+    for name, elapsed, calls, note in results:
+        print(f"{name:>9}: {elapsed:.3f}s, {elapsed / calls * 1e6:.2f} us/call, "
+              f"{calls / elapsed:,.0f} calls/s {note}")
+    print(f"Store: {stats['entries']} entries, {stats['bytes']:,} bytes, "
+          f"{stats['evictions']} evictions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for combinatorial prompt generation.
+
+Builds the matrix of every option value the UI offers (10.7M combinations
+per task) and generates a prefix of it three ways, reporting combinations
+per second:
+    - per-call:  generate_prompt once per combination
+    - matrix:    PromptMatrix.iter_range, reusing shared prompt prefixes
+    - sharded:   run_matrix over index ranges in a process pool
+
+A sample of the combinations is checked against generate_prompt first.
+
+Usage:
+    python benchmarks/bench_prompt_matrix.py [--combinations N] [--workers W]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_core import generate_prompt
+from prompt_matrix import PromptMatrix, run_matrix
+
+FLAGS = ("edit_file", "generate_file", "ban_request", "error_handling",
+         "performance_optimization", "security_check", "unittest", "run")
+
+# Every value offered by the UI widgets
+UI_MATRIX = dict(
+    task="Refactor the parser so that it streams tokens instead of loading the whole file",
+    language=["english", "chinese", "spanish", "french"],
+    explanation_detail=["minimal", "low", "medium", "high", "comprehensive"],
+    framework=[None, "Django", "Flask", "FastAPI", "React", "Vue", "Angular", "TensorFlow", "PyTorch", "Other"],
+    compatibility=[None, "Python 3.6+", "Python 3.8+", "Python 3.10+", "Cross-browser", "Mobile-friendly", "Other"],
+    code_style=[None, "PEP8", "Google", "NumPy", "Microsoft", "Custom"],
+    documentation_level=[None, "minimal", "standard", "detailed", "comprehensive"],
+    **{flag: [False, True] for flag in FLAGS},
+)
+
+def check_parity(matrix, samples):
+    """
+    Compare random index ranges of the matrix with generate_prompt.
+    """
+    rng = random.Random(0)
+    checked = 0
+    for _ in range(samples):
+        start = rng.randrange(len(matrix))
+        for index, prompt in matrix.iter_range(start, start + 100):
+            if prompt != generate_prompt(**matrix.options_at(index)):
+                raise AssertionError(f"Output mismatch for combination {index}")
+            checked += 1
+    return checked
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--combinations", type=int, default=500_000,
+                        help="Number of combinations generated per method")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes of the sharded run")
+    args = parser.parse_args()
+
+    matrix = PromptMatrix(**UI_MATRIX)
+    count = min(args.combinations, len(matrix))
+    print(f"Matrix: {len(matrix):,} combinations, timing the first {count:,}")
+    print(f"Parity: {check_parity(matrix, 100)} combinations are byte-identical")
+
+    option_sets = [matrix.options_at(index) for index in range(count)]
+    start = time.perf_counter()
+    for options in option_sets:
+        generate_prompt(**options)
+    per_call = time.perf_counter() - start
+    del option_sets
+
+    # A fresh matrix, so building its sections is part of the timing
+    start = time.perf_counter()
+    for _ in PromptMatrix(**UI_MATRIX).iter_range(0, count):
+        pass
+    walk = time.perf_counter() - start
+
+    stats = run_matrix(UI_MATRIX, io.StringIO(), 0, count, workers=args.workers,
+                       chunk_size=max(1, count // (args.workers * 4)), count_only=True)
+
+    for name, elapsed in (("per-call", per_call), ("matrix", walk), ("sharded", stats.elapsed)):
+        print(f"{name:>8}: {elapsed:.3f}s ({count / elapsed:,.0f} combinations/s)")
+    print(f" speedup: {per_call / walk:.2f}x single process, "
+          f"{per_call / stats.elapsed:.2f}x with {args.workers} workers")
+
+if __name__ == "__main__":
+    main()
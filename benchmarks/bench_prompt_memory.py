@@ -0,0 +1,80 @@
+"""
+Peak memory of prompt generation for very large tasks.
+
+Builds prompts for tasks of 1, 10 and 100 MB four ways and reports the
+tracemalloc peak of each call, not counting the task itself:
+    - legacy:       the original string-concatenation implementation
+    - generate:     generate_prompt, returning the prompt as one string
+    - iter:         iter_prompt, consuming the chunks without keeping them
+    - write:        write_prompt into a temporary file
+
+Usage:
+    python benchmarks/bench_prompt_memory.py [--sizes 1,10,100]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_generate_prompt import legacy_generate_prompt
+from prompt_core import generate_prompt, iter_prompt, write_prompt
+
+MB = 1024 * 1024
+
+OPTIONS = dict(language="english", unittest=True, run=True, dir="src/app",
+               code_style="PEP8", error_handling=True)
+
+def _consume(task):
+    for _ in iter_prompt(task=task, **OPTIONS):
+        pass
+
+def _write(task, path):
+    with open(path, "w", encoding="utf-8") as f:
+        write_prompt(f, task=task, **OPTIONS)
+
+def measure(func, *args):
+    """
+    Call func and return (peak traced bytes, seconds).
+
+    The arguments are allocated before tracing starts, so the peak only
+    counts memory the call itself allocates, including its result.
+    """
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,10,100", help="Comma separated task sizes in MB")
+    args = parser.parse_args()
+
+    print(f"{'task':>8}{'method':>10}{'peak (MB)':>12}{'x task':>8}{'time (ms)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "prompt.txt")
+        for size in (int(value) for value in args.sizes.split(",")):
+            task = "x" * (size * MB)
+            methods = (
+                ("legacy", lambda: legacy_generate_prompt(task=task, **OPTIONS)),
+                ("generate", lambda: generate_prompt(task=task, **OPTIONS)),
+                ("iter", lambda: _consume(task)),
+                ("write", lambda: _write(task, path)),
+            )
+            for name, func in methods:
+                peak, elapsed = measure(func)
+                print(f"{size:>6}MB{name:>10}{peak / MB:>12.2f}{peak / len(task):>8.2f}"
+                      f"{elapsed * 1e3:>12.1f}")
+            del task
+
+if __name__ == "__main__":
+    main()
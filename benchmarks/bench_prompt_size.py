@@ -0,0 +1,97 @@
+"""
+Update latency of the live prompt size estimate.
+
+Fills the estimator with a 1 MB task, then replays edits the way the UI sees
+them (a full new task value per edit) and times each update. Every 25th
+update and the last one are checked against a full recount of the task.
+Fails if the mean update time exceeds the budget.
+
+Usage:
+    python benchmarks/bench_prompt_size.py [--task-size BYTES] [--edits N] [--budget-ms 1.0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_size import PromptSizer, count_tokens
+
+OPTIONS = dict(language="english", unittest=True, run=True, code_style="PEP8")
+
+SAMPLE = (
+    "def parse(line):\n"
+    "    # Split the record into its fields\n"
+    "    fields = line.rstrip().split(',')\n"
+    "    return {name: value for name, value in zip(HEADER, fields)}\n\n"
+    "The parser above is called 12000 times per batch and should stay fast.\n"
+)
+
+def build_task(size):
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+def edits(task, count, rng):
+    """
+    Yield successive versions of the task, one small edit at a time.
+    """
+    for index in range(count):
+        position = rng.randrange(len(task))
+        kind = index % 4
+        if kind == 0:    # type a character
+            task = task[:position] + "x" + task[position:]
+        elif kind == 1:  # delete a word
+            task = task[:position] + task[position + 6:]
+        elif kind == 2:  # paste a snippet
+            task = task[:position] + SAMPLE + task[position:]
+        else:            # append at the end
+            task = task + " more"
+        yield task
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--task-size", type=int, default=1024 * 1024, help="Task length in characters")
+    parser.add_argument("--edits", type=int, default=200, help="Edits to replay")
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="Maximum mean update time")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    task = build_task(args.task_size)
+    sizer = PromptSizer()
+
+    start = time.perf_counter()
+    sizer.measure(task=task, **OPTIONS)
+    initial = time.perf_counter() - start
+
+    timings = []
+    for version in edits(task, args.edits, rng):
+        start = time.perf_counter()
+        size = sizer.measure(task=version, **OPTIONS)
+        timings.append(time.perf_counter() - start)
+        if len(timings) % 25 and len(timings) < args.edits:
+            continue
+        if sizer.task.tokens != count_tokens(version) or sizer.task.chars != len(version):
+            sys.exit(f"Incremental count diverged from a full recount after {len(timings)} edits")
+
+    # Option changes only touch the memoized option sections
+    option_timings = []
+    for unittest in (False, True) * 50:
+        start = time.perf_counter()
+        sizer.measure(task=version, **dict(OPTIONS, unittest=unittest))
+        option_timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    print(f"Task: {len(task):,} characters, ~{size['tokens']:,} tokens in the prompt")
+    print(f"initial count:  {initial * 1e3:9.2f} ms")
+    print(f"task edit:      {mean * 1e3:9.3f} ms mean, {timings[len(timings) // 2] * 1e3:.3f} ms p50, "
+          f"{timings[-1] * 1e3:.3f} ms max ({len(timings)} edits)")
+    print(f"option change:  {sum(option_timings) / len(option_timings) * 1e3:9.3f} ms mean")
+    if mean * 1e3 > args.budget_ms:
+        print(f"FAIL: mean update above the {args.budget_ms} ms budget")
+        sys.exit(1)
+    print(f"OK: mean update within the {args.budget_ms} ms budget")
+
+if __name__ == "__main__":
+    main()
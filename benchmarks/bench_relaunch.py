@@ -0,0 +1,147 @@
+"""
+Time of a second launch while the app is already running.
+
+Starts run.py, waits until it reports itself ready, then launches run.py
+again several times. Each relaunch hands its browser-open request to the
+running instance over the instance socket and exits. Reports the wall time
+of the relaunch processes (including interpreter start-up) and of the
+socket round trip alone, then stops the instance with `run.py stop`.
+
+Before that it checks that probing the lock, as `run.py status` does, never
+makes a launch that takes the lock at the same moment fail.
+
+The browser is suppressed through the BROWSER environment variable, and the
+lock and state files go to a temporary directory, so an instance started
+by the user is not involved; port 8501 must be free.
+
+Usage:
+    python benchmarks/bench_relaunch.py [--rounds 20] [--budget-ms 50]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from single_instance import INSTANCE_DIR_ENV, LOCK_FILE, InstanceLock, send_command
+
+RUN_PY = os.path.join(ROOT, "run.py")
+
+def wait_until_running(env, process, timeout=60):
+    """
+    Wait until the instance answers status as ready.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"run.py exited with code {process.returncode}")
+        response = send_command("status", directory=env[INSTANCE_DIR_ENV])
+        if response is not None and response["ready"]:
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f"run.py did not become ready within {timeout}s")
+
+# Probes the lock in a loop until killed, like repeated `run.py status` calls
+PROBE_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from single_instance import InstanceLock
+lock = InstanceLock(sys.argv[2])
+print("probing", flush=True)
+while True:
+    lock.is_held_elsewhere()
+"""
+
+def check_probe_race(directory, seconds=2.0):
+    """
+    Take and release the lock for a while another process probes it.
+
+    Raises:
+    - RuntimeError if taking the lock failed while nobody held it
+    """
+    path = os.path.join(directory, LOCK_FILE)
+    lock = InstanceLock(path)
+    lock.acquire()
+    lock.release()
+    prober = subprocess.Popen([sys.executable, "-c", PROBE_SCRIPT, ROOT, path], stdout=subprocess.PIPE, text=True)
+    try:
+        prober.stdout.readline()
+        attempts = failed = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            attempts += 1
+            if lock.acquire():
+                lock.release()
+            else:
+                failed += 1
+    finally:
+        prober.kill()
+        prober.wait()
+    if failed:
+        raise RuntimeError(f"{failed} of {attempts} launches could not take a free lock while it was probed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure a relaunch handed to the running instance.")
+    parser.add_argument("--rounds", type=int, default=20, help="Number of relaunches")
+    parser.add_argument("--budget-ms", type=float, default=50,
+                        help="Fail if the median socket round trip of a relaunch exceeds this")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="prompt_instance_")
+    env = dict(os.environ, BROWSER="true" if os.name != "nt" else "echo")
+    env[INSTANCE_DIR_ENV] = directory
+
+    if os.name != "nt":
+        # Windows can only probe the lock by taking it
+        check_probe_race(directory)
+    daemon = subprocess.Popen([sys.executable, RUN_PY], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_running(env, daemon)
+        relaunches = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, RUN_PY], cwd=ROOT, env=env, capture_output=True, text=True)
+            relaunches.append(time.perf_counter() - start)
+            if result.returncode != 0 or "already running" not in result.stdout:
+                raise RuntimeError(f"Relaunch did not hand off to the instance:\n{result.stdout}{result.stderr}")
+        round_trips = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            send_command("open", directory=directory)
+            round_trips.append(time.perf_counter() - start)
+        interpreter = []
+        for _ in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", "pass"], env=env)
+            interpreter.append(time.perf_counter() - start)
+
+        stop = subprocess.run([sys.executable, RUN_PY, "stop"], cwd=ROOT, env=env, capture_output=True, text=True)
+        if stop.returncode != 0:
+            raise RuntimeError(f"run.py stop failed:\n{stop.stdout}{stop.stderr}")
+        daemon.wait(timeout=15)
+    finally:
+        if daemon.poll() is None:
+            daemon.terminate()
+            daemon.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    median = statistics.median(round_trips)
+    print(f"relaunch process:   median {statistics.median(relaunches) * 1e3:8.1f} ms, "
+          f"best {min(relaunches) * 1e3:8.1f} ms")
+    print(f"python -c pass:     median {statistics.median(interpreter) * 1e3:8.1f} ms (interpreter start-up)")
+    print(f"socket round trip:  median {median * 1e3:8.1f} ms, best {min(round_trips) * 1e3:8.1f} ms")
+    print(f"run.py stop exited the instance with code {daemon.returncode}")
+    if median * 1e3 > args.budget_ms:
+        print(f"FAIL: the median round trip exceeds the {args.budget_ms:g} ms budget")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Rerun latency and websocket traffic per UI interaction.
+
+Starts main.py on a headless Streamlit server, connects to its websocket the
+way the browser does and replays a sequence of widget interactions. For each
+interaction it reports the time until the run finished, the number of script
+runs it triggered and the bytes the server sent. Widgets that live inside a
+fragment are rerun with their fragment id, exactly like the frontend does.
+Prompt options are edited in the browser preview component without any
+traffic; its Generate click is replayed by sending the component value.
+
+The server is started with the launcher's command line and launch profile;
+--compare-profiles measures every profile in turn and reports the difference.
+Generated prompts go to a fresh history database in a temporary directory,
+not to the user's history.
+
+Usage:
+    python benchmarks/bench_ui_websocket.py [--port 8521] [--rounds 5] [--profile production] [--json out.json]
+    python benchmarks/bench_ui_websocket.py --compare-profiles
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from prompt_history import HISTORY_PATH_ENV
+from run import DEFAULT_PROFILE, PROFILES, profile_environment, streamlit_args
+
+# Script end states after which no further run follows for an interaction
+_FINAL_STATES = {
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+}
+
+# Element types that are widgets, and the WidgetState field holding their value
+_WIDGET_VALUE_FIELDS = {
+    "checkbox": "bool_value",
+    "button": "trigger_value",
+    "text_area": "string_value",
+    "text_input": "string_value",
+    "selectbox": "string_value",
+    "radio": "string_value",
+    "slider": "double_array_value",
+    "component_instance": "json_value",
+}
+
+# Component value sent by a Generate click in the preview
+GENERATE_EVENT = json.dumps({"id": "bench-1", "options": {
+    "edit_file": True, "error_handling": True, "framework": "Django",
+}})
+
+# Interactions in replay order: (name, widget label, value)
+INTERACTIONS = (
+    ("type_task", "Enter your task for the AI:", "Refactor the parser module"),
+    ("type_context_files", "Context files (one path or glob per line)", "README.md"),
+    ("generate", "prompt_preview", GENERATE_EVENT),
+    ("switch_ui_language", "UI Language", "chinese"),
+)
+
+class UISession:
+    """
+    Minimal websocket client speaking the Streamlit browser protocol.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.connection = None
+        self.widgets = {}
+        self.widget_states = {}
+
+    async def connect(self):
+        self.connection = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def run(self, fragment_id=""):
+        """
+        Request a script run and wait for it (and any rerun it causes) to end.
+
+        Returns:
+        - A tuple (seconds, bytes received, number of script runs)
+        """
+        message = BackMsg()
+        state = message.rerun_script
+        state.fragment_id = fragment_id
+        for widget_id, (field, value) in self.widget_states.items():
+            widget = state.widget_states.widgets.add()
+            widget.id = widget_id
+            if field == "double_array_value":
+                widget.double_array_value.data.extend(value)
+            else:
+                setattr(widget, field, value)
+
+        start = time.perf_counter()
+        await self.connection.send(message.SerializeToString())
+        received = runs = 0
+        while True:
+            raw = await self.connection.recv()
+            received += len(raw)
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                self._record_widget(forward.delta)
+            elif kind == "script_finished":
+                runs += 1
+                if forward.script_finished in _FINAL_STATES:
+                    break
+        # Trigger values only last for the run that consumed them
+        for widget_id, (field, _) in list(self.widget_states.items()):
+            if field == "trigger_value":
+                del self.widget_states[widget_id]
+        return time.perf_counter() - start, received, runs
+
+    def _record_widget(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind not in _WIDGET_VALUE_FIELDS:
+            return
+        proto = getattr(element, kind)
+        # Components have no label; they are found by name ("module.name")
+        label = proto.component_name.rsplit(".", 1)[-1] if kind == "component_instance" else proto.label
+        self.widgets[label] = (proto.id, kind, delta.fragment_id)
+
+    async def interact(self, label, value):
+        """
+        Set a widget value and rerun the script or the widget's fragment.
+        """
+        if label not in self.widgets:
+            raise KeyError(f"No widget labelled {label!r} was rendered")
+        widget_id, kind, fragment_id = self.widgets[label]
+        self.widget_states[widget_id] = (_WIDGET_VALUE_FIELDS[kind], value)
+        return await self.run(fragment_id)
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
+
+async def measure_session(url):
+    """
+    Replay the initial load and every interaction on a fresh session.
+
+    Returns:
+    - A dict mapping interaction name to (seconds, bytes, runs)
+    """
+    session = UISession(url)
+    await session.connect()
+    try:
+        results = {"initial_render": await session.run()}
+        for name, label, value in INTERACTIONS:
+            results[name] = await session.interact(label, value)
+        return results
+    finally:
+        await session.close()
+
+def _wait_until_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Streamlit exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    raise RuntimeError(f"Streamlit did not become ready within {timeout}s")
+
+def measure_profile(port, rounds, profile):
+    """
+    Start a server with a launch profile and replay the sessions against it.
+
+    Returns:
+    - A dict mapping interaction name to its best seconds, bytes and runs
+    """
+    base_url = f"http://localhost:{port}"
+    history_dir = tempfile.TemporaryDirectory(prefix="prompt_history_")
+    env = profile_environment(profile)
+    env[HISTORY_PATH_ENV] = os.path.join(history_dir.name, "history.sqlite3")
+    process = subprocess.Popen(
+        streamlit_args(port), cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_ready(base_url, process)
+        ws_url = f"ws://localhost:{port}/_stcore/stream"
+        sessions = [asyncio.run(asyncio.wait_for(measure_session(ws_url), 120))
+                    for _ in range(rounds)]
+    finally:
+        process.terminate()
+        process.wait()
+        history_dir.cleanup()
+
+    summary = {}
+    for name in sessions[0]:
+        samples = [session[name] for session in sessions]
+        summary[name] = {
+            "seconds": min(sample[0] for sample in samples),
+            "bytes": samples[-1][1],
+            "runs": samples[-1][2],
+        }
+    return summary
+
+def _print_comparison(results):
+    profiles = list(results)
+    reference, other = profiles[0], profiles[-1]
+    header = "".join(f"{name + ' (ms)':>18}" for name in profiles)
+    print(f"{'interaction':<24}{header}{'difference':>14}")
+    totals = dict.fromkeys(profiles, 0.0)
+    for interaction in results[reference]:
+        cells = ""
+        for name in profiles:
+            seconds = results[name][interaction]["seconds"]
+            totals[name] += seconds
+            cells += f"{seconds * 1e3:>18.2f}"
+        before = results[reference][interaction]["seconds"]
+        after = results[other][interaction]["seconds"]
+        print(f"{interaction:<24}{cells}{(after - before) / before:>+14.1%}")
+    cells = "".join(f"{totals[name] * 1e3:>18.2f}" for name in profiles)
+    change = (totals[other] - totals[reference]) / totals[reference]
+    print(f"{'total':<24}{cells}{change:>+14.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rerun latency and websocket bytes per UI interaction.")
+    parser.add_argument("--port", type=int, default=8521, help="Port for the Streamlit server")
+    parser.add_argument("--rounds", type=int, default=5, help="Sessions to replay (best time is kept)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Launch profile the server runs with")
+    parser.add_argument("--compare-profiles", action="store_true",
+                        help="Measure every launch profile and report the difference")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.compare_profiles:
+        # dev first, so the difference reads as the gain of the later profiles
+        profiles = sorted(PROFILES, key=lambda name: name != "dev")
+        results = {}
+        for profile in profiles:
+            print(f"Measuring the {profile} profile...", file=sys.stderr)
+            results[profile] = measure_profile(args.port, args.rounds, profile)
+        _print_comparison(results)
+    else:
+        summary = measure_profile(args.port, args.rounds, args.profile)
+        results = summary
+        print(f"{'interaction':<24}{'time (ms)':>12}{'bytes':>10}{'runs':>6}")
+        for name, result in summary.items():
+            print(f"{name:<24}{result['seconds'] * 1e3:>12.2f}{result['bytes']:>10}{result['runs']:>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
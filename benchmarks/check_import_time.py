@@ -0,0 +1,79 @@
+"""
+Import-time budget check for the Streamlit-free core.
+
+Imports a module in a fresh interpreter with `python -X importtime`, reports
+its cumulative import time and fails when it exceeds the budget or pulls in
+a forbidden heavy dependency.
+
+Usage:
+    python benchmarks/check_import_time.py [--module prompt_core] [--budget-ms 30]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must never be imported by the core
+FORBIDDEN = ("streamlit", "pandas", "numpy", "pyarrow", "tornado")
+
+def measure_import(module, rounds=5):
+    """
+    Import module in fresh interpreters and parse the -X importtime report.
+
+    Returns:
+    - A tuple (best cumulative import time of module in ms, set of imported
+      top-level package names)
+    """
+    best = None
+    imported = set()
+    for _ in range(rounds):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+        cumulative = None
+        for line in result.stderr.splitlines():
+            # Format: "import time: self [us] | cumulative | imported package"
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            fields = line[len("import time:"):].split("|")
+            if not fields[1].strip().isdigit():
+                continue  # Header line
+            name = fields[2].strip()
+            imported.add(name.split(".")[0])
+            if name == module:
+                cumulative = int(fields[1]) / 1000
+        if cumulative is None:
+            raise RuntimeError(f"{module} not found in the -X importtime report")
+        best = cumulative if best is None else min(best, cumulative)
+    return best, imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time budget of the core module.")
+    parser.add_argument("--module", default="prompt_core", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=30.0,
+                        help="Maximum cumulative import time in milliseconds")
+    args = parser.parse_args()
+
+    elapsed, imported = measure_import(args.module)
+    heavy = sorted(set(FORBIDDEN) & imported)
+    print(f"{args.module}: {elapsed:.2f} ms cumulative import time (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: {args.module} imports heavy dependencies: {', '.join(heavy)}")
+        failed = True
+    if elapsed > args.budget_ms:
+        print(f"FAIL: import time exceeds the budget by {elapsed - args.budget_ms:.2f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
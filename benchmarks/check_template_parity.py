@@ -0,0 +1,100 @@
+"""
+Parity check of the browser prompt preview against generate_prompt.
+
+Renders option sets with components/prompt_preview/prompt_template.js under
+Node and with prompt_core.generate_prompt, and fails on the first prompt
+that differs. The option sets are a random sample of every combination of
+the values offered by the UI, plus every combination of a set of edge cases
+(empty and missing values, unknown languages, text with "{}" or "$&").
+
+Usage:
+    python benchmarks/check_template_parity.py [--samples 20000] [--node node]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import OPTION_CHOICES
+from prompt_core import generate_prompt, template_spec
+from prompt_matrix import PromptMatrix
+
+TEMPLATE_JS = os.path.join(ROOT, "components", "prompt_preview", "prompt_template.js")
+
+FLAGS = ("edit_file", "generate_file", "ban_request", "error_handling",
+         "performance_optimization", "security_check", "unittest", "run")
+
+EDGE_CASES = dict(
+    task=["", "Fix the {} bug", "修复 $& ${x} $1\n\nand more", "  "],
+    language=["english", "chinese", "klingon", None],
+    explanation_detail=["medium", "high", "", None],
+    code_style=[None, "", "Custom {0}"],
+    documentation_level=[None, "detailed"],
+    framework=[None, "", "Vue"],
+    compatibility=[None, "Python 3.8+"],
+    edit_file=[False, True, 0, 1],
+    generate_file=[False, True],
+    dir=[None, "", "C:\\src\\app", "src/$&"],
+)
+
+def ui_cases(samples, seed=0):
+    """
+    Return a random sample of the combinations of UI option values.
+    """
+    matrix = PromptMatrix(task=["", "Refactor the parser"], dir=["", "src/app"], **OPTION_CHOICES,
+                          **{flag: [False, True] for flag in FLAGS})
+    rng = random.Random(seed)
+    return [matrix.options_at(rng.randrange(len(matrix))) for _ in range(samples)]
+
+def edge_cases():
+    """
+    Return every combination of the edge case values, leaving out None
+    values so that defaults are exercised too.
+    """
+    matrix = PromptMatrix(**EDGE_CASES)
+    cases = []
+    for index in range(len(matrix)):
+        options = matrix.options_at(index, varied_only=True)
+        cases.append({name: value for name, value in options.items()
+                      if value is not None or index % 2})
+    return cases
+
+def render_js(node, cases):
+    """
+    Render option sets with the browser template under Node.
+    """
+    result = subprocess.run(
+        [node, TEMPLATE_JS], input=json.dumps({"spec": template_spec(), "cases": cases}),
+        capture_output=True, text=True, encoding="utf-8",
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Rendering with Node failed:\n{result.stderr}")
+    return json.loads(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the browser preview renders prompts like generate_prompt.")
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="Number of sampled combinations of UI values")
+    parser.add_argument("--node", default=shutil.which("node") or "node", help="Node.js executable")
+    args = parser.parse_args()
+
+    cases = ui_cases(args.samples) + edge_cases()
+    rendered = render_js(args.node, cases)
+    for options, actual in zip(cases, rendered):
+        expected = generate_prompt(**options)
+        if actual != expected:
+            print(f"FAIL: the browser preview differs for options {options!r}")
+            print(f"  generate_prompt: {expected!r}")
+            print(f"  prompt_template.js: {actual!r}")
+            sys.exit(1)
+    print(f"{len(cases)} option sets render identically")
+    print("OK")
+
+if __name__ == "__main__":
+    main()
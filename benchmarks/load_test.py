@@ -0,0 +1,162 @@
+"""
+Load test for the HTTP prompt service.
+
+Starts server.py on localhost (or targets an already running instance),
+opens several keep-alive connections that pipeline requests, and reports
+throughput and latency percentiles.
+
+Usage:
+    python benchmarks/load_test.py --workers 4 --connections 64 --requests 100000
+    python benchmarks/load_test.py --url http://127.0.0.1:8600 --batch 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_OPTIONS = {
+    "task": "Add pagination to the user list endpoint",
+    "language": "english",
+    "edit_file": True,
+    "unittest": True,
+    "code_style": "PEP8",
+    "framework": "FastAPI",
+    "explanation_detail": "low",
+}
+
+def build_request(host, port, batch):
+    """
+    Build the raw bytes of the request sent repeatedly during the test.
+    """
+    if batch > 1:
+        path, payload = "/generate/batch", [SAMPLE_OPTIONS] * batch
+    else:
+        path, payload = "/generate", SAMPLE_OPTIONS
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"POST {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n"
+    )
+    return head.encode("ascii") + body
+
+async def _read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+async def _client(host, port, request, count, pipeline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = []
+    sent = received = 0
+    try:
+        while received < count:
+            # Keep up to `pipeline` requests outstanding on the connection
+            while sent < count and sent - received < pipeline:
+                writer.write(request)
+                sent_at.append(time.perf_counter())
+                sent += 1
+            await writer.drain()
+            status = await _read_response(reader)
+            latencies.append(time.perf_counter() - sent_at[received])
+            if status != 200:
+                errors.append(status)
+            received += 1
+    finally:
+        writer.close()
+
+async def run_load(host, port, total, connections, pipeline, batch):
+    """
+    Send `total` requests over `connections` connections.
+
+    Returns:
+    - A tuple (latencies in seconds, list of error statuses, elapsed seconds)
+    """
+    request = build_request(host, port, batch)
+    latencies, errors = [], []
+    per_client, remainder = divmod(total, connections)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, request, per_client + (1 if i < remainder else 0),
+                pipeline, latencies, errors)
+        for i in range(connections)
+    ))
+    return latencies, errors, time.perf_counter() - start
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def wait_until_ready(url, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP prompt service.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8601, help="Port for the server started by the test")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes to start")
+    parser.add_argument("--requests", type=int, default=20000, help="Total number of requests")
+    parser.add_argument("--connections", type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument("--pipeline", type=int, default=4, help="Outstanding requests per connection")
+    parser.add_argument("--batch", type=int, default=1, help="Prompts per request (uses the batch endpoint when > 1)")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "server.py"),
+             "--port", str(args.port), "--workers", str(args.workers)],
+            cwd=ROOT,
+        )
+    parts = urlsplit(url)
+
+    try:
+        wait_until_ready(url)
+        latencies, errors, elapsed = asyncio.run(run_load(
+            parts.hostname, parts.port, args.requests, args.connections,
+            args.pipeline, args.batch))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"Requests:   {len(latencies)} ({len(errors)} errors) over {args.connections} connections, "
+          f"pipeline depth {args.pipeline}, {args.batch} prompt(s) per request")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} requests/s, "
+          f"{len(latencies) * args.batch / elapsed:,.0f} prompts/s")
+    print(f"Latency:    p50 {percentile(latencies, 0.50) * 1000:.3f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms, "
+          f"max {latencies[-1] * 1000 if latencies else 0:.3f} ms")
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Server memory under hundreds of UI sessions.
+
+Starts main.py on a headless Streamlit server and opens sessions in waves
+over the websocket, the way browser tabs do. Every session types the same
+large task and clicks Generate, then stays connected but idle, like a tab
+left open. After each wave the resident memory of the server is sampled.
+
+The test runs twice: with the session manager's defaults scaled down (a
+short TTL, so idle sessions of earlier waves are evicted) and with eviction
+off (PROMPT_SESSION_TTL=0), where every idle session keeps its state. After
+the last wave every session is closed, and both servers must stop tracking
+them within one eviction interval. It fails if the managed server grows by
+more than --max-growth MB between the first and the last wave, or if a
+server still tracks closed sessions.
+
+Usage:
+    python benchmarks/load_test_sessions.py [--sessions 300] [--waves 6] [--task-kb 256] [--ttl 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_ui_websocket import UISession, _wait_until_ready
+from metrics import METRICS_PATH
+from run import metrics_environment, profile_environment, streamlit_args
+from session_store import EVICTION_INTERVAL, SESSION_MAX_BYTES_ENV, SESSION_TTL_ENV
+
+MB = 1024 * 1024
+
+GENERATE_EVENT = json.dumps({"id": "load-1", "options": {"edit_file": True, "unittest": True}})
+
+def rss_bytes(pid):
+    """
+    Return the resident set size of a process (Linux).
+    """
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError(f"No VmRSS for process {pid}")
+
+def tracked_sessions(metrics_port):
+    """
+    Read the number of sessions tracked by the server's session manager.
+    """
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}{METRICS_PATH}", timeout=5) as response:
+        for line in response.read().decode("utf-8").splitlines():
+            if line.startswith("prompt_generator_sessions "):
+                return int(line.split()[1])
+    return None
+
+async def open_session(url, task):
+    """
+    Open a session, type the task and click Generate; the session stays open.
+    """
+    session = UISession(url)
+    await session.connect()
+    await session.run()
+    await session.interact("Enter your task for the AI:", task)
+    await session.interact("prompt_preview", GENERATE_EVENT)
+    return session
+
+async def wait_until_forgotten(metrics_port, timeout):
+    """
+    Wait until the server tracks no sessions.
+
+    Returns:
+    - The seconds it took, or None if sessions were still tracked after timeout
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if tracked_sessions(metrics_port) == 0:
+            return time.monotonic() - start
+        await asyncio.sleep(0.5)
+    return None
+
+async def run_waves(url, pid, metrics_port, sessions, waves, task, pause):
+    """
+    Open the sessions wave by wave and sample the server after each wave,
+    then close them all.
+
+    Returns:
+    - A list of (open sessions, tracked sessions, RSS bytes) per wave
+    - The seconds until the server stopped tracking the closed sessions, or None
+    """
+    per_wave = sessions // waves
+    opened = []
+    samples = []
+    try:
+        for _ in range(waves):
+            for _ in range(per_wave):
+                opened.append(await open_session(url, task))
+            # Idle time, during which the evictor may close earlier sessions
+            await asyncio.sleep(pause)
+            samples.append((len(opened), tracked_sessions(metrics_port), rss_bytes(pid)))
+    finally:
+        for session in opened:
+            try:
+                await session.close()
+            except Exception:
+                pass
+    return samples, await wait_until_forgotten(metrics_port, EVICTION_INTERVAL + 10)
+
+def measure(args, ttl, max_bytes):
+    """
+    Start a server with the given session settings and run the waves against it.
+    """
+    env = profile_environment(args.profile)
+    metrics_environment(env, args.metrics_port)
+    env[SESSION_TTL_ENV] = str(ttl)
+    env[SESSION_MAX_BYTES_ENV] = str(max_bytes)
+    env.setdefault("PROMPT_HISTORY_PATH", "off")
+    process = subprocess.Popen(streamlit_args(args.port), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(f"http://localhost:{args.port}", process)
+        task = "x" * (args.task_kb * 1024)
+        return asyncio.run(run_waves(f"ws://localhost:{args.port}/_stcore/stream", process.pid,
+                                     args.metrics_port, args.sessions, args.waves, task, args.pause))
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure server memory while hundreds of UI sessions pile up.")
+    parser.add_argument("--sessions", type=int, default=300, help="Sessions opened in total")
+    parser.add_argument("--waves", type=int, default=6, help="Number of waves the sessions are opened in")
+    parser.add_argument("--task-kb", type=int, default=256, help="Size of the task each session types, in KB")
+    parser.add_argument("--ttl", type=float, default=5, help="Session TTL of the managed run, in seconds")
+    parser.add_argument("--max-session-bytes", type=int, default=64 * 1024,
+                        help="Per-session budget of the managed run")
+    parser.add_argument("--pause", type=float, default=8, help="Idle seconds after each wave")
+    parser.add_argument("--max-growth", type=float, default=32,
+                        help="Fail if the managed server grows by more MB than this from the first wave")
+    parser.add_argument("--port", type=int, default=8531, help="Port for the Streamlit server")
+    parser.add_argument("--metrics-port", type=int, default=9531, help="Metrics port of the server")
+    parser.add_argument("--profile", default="production", help="Launch profile of the server")
+    args = parser.parse_args()
+
+    runs = {}
+    for name, ttl, max_bytes in (("managed", args.ttl, args.max_session_bytes), ("unmanaged", 0, 1 << 40)):
+        print(f"Measuring {name} sessions...", file=sys.stderr)
+        runs[name] = measure(args, ttl, max_bytes)
+
+    forgotten = {name: after for name, (_, after) in runs.items()}
+    runs = {name: samples for name, (samples, _) in runs.items()}
+    print(f"{'wave':>4}{'opened':>8}" + "".join(f"{name + ' sessions':>20}{name + ' RSS (MB)':>20}" for name in runs))
+    for wave in range(args.waves):
+        cells = ""
+        for samples in runs.values():
+            opened, tracked, rss = samples[wave]
+            cells += f"{tracked if tracked is not None else '-':>20}{rss / MB:>20.1f}"
+        print(f"{wave + 1:>4}{runs['managed'][wave][0]:>8}{cells}")
+
+    growth = (runs["managed"][-1][2] - runs["managed"][0][2]) / MB
+    unmanaged = (runs["unmanaged"][-1][2] - runs["unmanaged"][0][2]) / MB
+    print(f"Growth from the first to the last wave: managed {growth:+.1f} MB, unmanaged {unmanaged:+.1f} MB")
+    print("Closed sessions forgotten after: " + ", ".join(
+        f"{name} {'-' if after is None else f'{after:.1f} s'}" for name, after in forgotten.items()))
+    failures = []
+    if growth > args.max_growth:
+        failures.append(f"the managed server grew by {growth:.1f} MB (limit {args.max_growth:g} MB)")
+    for name, after in forgotten.items():
+        if after is None:
+            failures.append(f"the {name} server still tracks closed sessions")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
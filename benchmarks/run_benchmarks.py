@@ -0,0 +1,306 @@
+"""
+Benchmark suite with regression checking.
+
+Parts:
+    generator   generate_prompt across option presets and task sizes (1 B - 10 MB)
+    rerun       headless reruns of main.py through Streamlit's AppTest, one
+                timing per widget interaction
+    cold_start  time from launching run.py until the first page is served
+
+Every metric is a duration in seconds (lower is better). Results are written
+as JSON and compared against a stored baseline; the run fails when a metric
+is slower than the baseline by more than the tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --only generator,rerun --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+import timeit
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_RESULTS = os.path.join(ROOT, "benchmarks", "results.json")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+PARTS = ("generator", "rerun", "cold_start")
+
+TASK_SIZES = {
+    "1B": 1,
+    "1KB": 1024,
+    "100KB": 100 * 1024,
+    "1MB": 1024 * 1024,
+    "10MB": 10 * 1024 * 1024,
+}
+
+OPTION_PRESETS = {
+    "defaults": {},
+    "all_flags": dict(
+        edit_file=True, generate_file=False, ban_request=True, unittest=True, run=True,
+        error_handling=True, performance_optimization=True, security_check=True,
+    ),
+    "all_options": dict(
+        language="chinese", edit_file=True, ban_request=True, unittest=True, run=True,
+        dir="src/app", code_style="PEP8", documentation_level="detailed",
+        error_handling=True, performance_optimization=True, security_check=True,
+        framework="Django", compatibility="Python 3.8+", explanation_detail="high",
+    ),
+}
+
+def bench_generator():
+    """
+    Time generate_prompt per call for every preset and task size.
+
+    Returns:
+    - A dict mapping "preset/size" to the best seconds per call
+    """
+    from prompt_core import generate_prompt
+
+    results = {}
+    for size_name, size in TASK_SIZES.items():
+        task = "x" * size
+        # Fewer repetitions for large payloads keep the suite fast
+        number = max(3, min(20000, 20_000_000 // size))
+        for preset_name, options in OPTION_PRESETS.items():
+            timer = timeit.Timer(lambda: generate_prompt(task=task, **options))
+            best = min(timer.repeat(repeat=3, number=number))
+            results[f"{preset_name}/{size_name}"] = best / number
+    return results
+
+def _timed_run(app):
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f"main.py raised during the rerun: {app.exception[0].message}")
+    return elapsed
+
+def bench_rerun(rounds=5):
+    """
+    Time script reruns of main.py for a sequence of widget interactions.
+
+    Each interaction is replayed on a fresh AppTest for every round and the
+    best time is kept.
+
+    Returns:
+    - A dict mapping interaction name to the best seconds per rerun
+    """
+    from streamlit.testing.v1 import AppTest
+
+    from main import SERVER_ADDRESS_ENV
+    from run import LOCAL_ADDRESS
+
+    # AppTest has no server address; measure the app as run.py serves it,
+    # with the file-reading options shown
+    os.environ.setdefault(SERVER_ADDRESS_ENV, LOCAL_ADDRESS)
+    interactions = {
+        "initial_render": lambda app: app,
+        "type_task": lambda app: app.text_area[0].input("Refactor the parser module"),
+        "type_context_files": lambda app: app.text_area(key="opt_context_files").input("README.md"),
+        "select_manifest": lambda app: app.selectbox(key="opt_dir_manifest").set_value("files"),
+        # The value the preview component sends once option edits pause
+        "edit_options": lambda app: app.session_state.__setitem__(
+            "prompt_preview", {"id": "bench-edit", "options": {"edit_file": True, "framework": "Django"}, "edit": True}),
+        # The value the preview component sends when Generate is clicked
+        "generate": lambda app: app.session_state.__setitem__(
+            "prompt_preview", {"id": "bench", "options": {"edit_file": True, "framework": "Django"}}),
+        "switch_ui_language": lambda app: app.selectbox(key="ui_lang_selector").set_value("chinese"),
+    }
+
+    results = {}
+    for name, interact in interactions.items():
+        best = None
+        for _ in range(rounds):
+            app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=30)
+            if name == "initial_render":
+                elapsed = _timed_run(app)
+            else:
+                app.run()
+                interact(app)
+                elapsed = _timed_run(app)
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    return results
+
+def _wait_for_page(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"run.py exited with code {process.returncode} before serving a page")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.02)
+    raise RuntimeError(f"No page served at {url} within {timeout}s")
+
+def _stop_launcher(process):
+    # SIGINT lets run.py unwind through its atexit handlers
+    try:
+        os.killpg(process.pid, signal.SIGINT)
+        process.wait(timeout=15)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+def bench_cold_start(rounds=3, timeout=60, command=None):
+    """
+    Time launching run.py until the app page and health endpoint respond.
+
+    The browser is suppressed through the BROWSER environment variable, and
+    the launcher is interrupted (not killed) so it restores its config. The
+    lock and state files go to a temporary directory, so an instance started
+    by the user does not answer instead of a new launch.
+
+    Parameters:
+    - rounds: Number of launches
+    - timeout: Seconds to wait for the page of each launch
+    - command: Launch command (default: this interpreter running run.py)
+
+    Returns:
+    - A dict with the best and mean seconds to the first served page
+    """
+    import shutil
+    import tempfile
+
+    from single_instance import INSTANCE_DIR_ENV
+
+    if command is None:
+        import streamlit  # noqa: F401  (run.py cannot serve a page without it)
+        command = [sys.executable, os.path.join(ROOT, "run.py")]
+
+    directory = tempfile.mkdtemp(prefix="prompt_instance_")
+    env = dict(os.environ, BROWSER="true" if os.name != "nt" else "echo")
+    env[INSTANCE_DIR_ENV] = directory
+    times = []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                command, cwd=ROOT, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            try:
+                _wait_for_page("http://localhost:8501/_stcore/health", process, timeout)
+                _wait_for_page("http://localhost:8501/", process, timeout)
+                times.append(time.perf_counter() - start)
+            finally:
+                _stop_launcher(process)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"first_page_best": min(times), "first_page_mean": sum(times) / len(times)}
+
+def run_parts(parts):
+    """
+    Run the selected parts of the suite.
+
+    Parts whose dependencies are missing are reported as skipped.
+
+    Returns:
+    - A results document ready to be written as JSON
+    """
+    benches = {"generator": bench_generator, "rerun": bench_rerun, "cold_start": bench_cold_start}
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+        "skipped": {},
+    }
+    for part in parts:
+        print(f"Running {part} benchmarks...", file=sys.stderr)
+        try:
+            document["results"][part] = benches[part]()
+        except ImportError as e:
+            document["skipped"][part] = f"missing dependency: {e.name}"
+    return document
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline document.
+
+    Returns:
+    - A list of (metric, baseline seconds, current seconds, ratio) for every
+      metric slower than the baseline by more than the tolerance
+    """
+    regressions = []
+    for part, metrics in results["results"].items():
+        for name, current in metrics.items():
+            previous = baseline.get("results", {}).get(part, {}).get(name)
+            if not previous:
+                continue
+            ratio = current / previous
+            if ratio > 1 + tolerance:
+                regressions.append((f"{part}/{name}", previous, current, ratio))
+    return regressions
+
+def _print_results(document):
+    for part, metrics in document["results"].items():
+        print(f"[{part}]")
+        for name, seconds in metrics.items():
+            print(f"  {name:<28} {seconds * 1e3:12.4f} ms")
+    for part, reason in document["skipped"].items():
+        print(f"[{part}] skipped ({reason})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and check for regressions.")
+    parser.add_argument("--only", help=f"Comma separated parts to run (default: {','.join(PARTS)})")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown before a metric counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    parts = args.only.split(",") if args.only else list(PARTS)
+    unknown = set(parts) - set(PARTS)
+    if unknown:
+        parser.error(f"Unknown parts: {', '.join(sorted(unknown))}")
+
+    document = run_parts(parts)
+    _print_results(document)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(document, baseline, args.tolerance)
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        return
+
+    print(f"Regressions beyond {args.tolerance:.0%}:")
+    for name, previous, current, ratio in regressions:
+        print(f"  {name}: {previous * 1e3:.4f} ms -> {current * 1e3:.4f} ms ({ratio:.2f}x)")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
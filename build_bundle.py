@@ -0,0 +1,339 @@
+"""
+Build a self-contained Linux bundle of the AI Prompt Generator.
+
+The bundle is a directory holding the Python interpreter that runs this
+script, a trimmed copy of its standard library, the distributions Streamlit
+needs at run time and the app itself, with every module precompiled:
+
+    dist/ai_prompt_generator/
+        ai_prompt_generator     launcher script; arguments are passed to run.py
+        app/                    run.py, main.py, the other modules, components, locales
+        python/                 bin/python3.X, lib/libpython3.X.so, lib/python3.X/
+        MANIFEST.sha256         digest of every file in the bundle
+
+Trimmed are the parts the app never loads: stdlib test suites, tkinter, IDLE
+and the like, `tests` directories of packages, and the Streamlit requirements
+listed in TRIMMED_DISTRIBUTIONS with whatever only they require. Bytecode is
+compiled as unchecked hash-based .pyc files, so imports skip the source
+timestamp checks and the output does not depend on file times. Files are
+copied in a fixed order and their times set to SOURCE_DATE_EPOCH (by default
+the time of the last commit), so two builds of the same tree in the same
+environment produce the same manifest; --archive also writes a reproducible
+tar.gz.
+
+After building, benchmarks/bench_bundle_cold_start.py compares the time to
+the first served page of the bundle and of `python run.py`, and the build
+fails if the bundle misses its budget.
+
+Usage:
+    python build_bundle.py [--output dist] [--archive] [--no-bench] [--budget 5.0]
+"""
+import argparse
+import compileall
+import hashlib
+import importlib.metadata
+import os
+import py_compile
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import sysconfig
+import tarfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+BUNDLE_NAME = "ai_prompt_generator"
+
+# Files and directories of the app copied into the bundle
+APP_DIRS = ("components", "locales")
+APP_EXCLUDE = {"build_bundle.py"}
+# Benchmarks run by the app itself (run.py --compare-profiles)
+APP_BENCHMARKS = ("bench_ui_websocket.py",)
+
+# Distributions the app needs; their requirements are followed
+ROOT_DISTRIBUTIONS = ("streamlit",)
+
+# Streamlit requirements the app never imports: charts, maps, images and the
+# file watcher (only used by the dev profile, which falls back to polling)
+TRIMMED_DISTRIBUTIONS = ("altair", "pydeck", "pillow", "watchdog")
+
+# Standard library parts the app never imports
+STDLIB_EXCLUDE = {
+    "site-packages", "test", "idlelib", "tkinter", "turtledemo", "ensurepip", "lib2to3",
+    "pydoc_data", "turtle.py", "__phello__",
+}
+STDLIB_EXCLUDE_PATTERNS = (
+    re.compile(r"^config-"),
+    re.compile(r"^_test"),
+    re.compile(r"^(_tkinter|xxlimited|xxsubtype|_xxtestfuzz|_ctypes_test)"),
+)
+
+# Directories left out of every copied package
+PACKAGE_EXCLUDE_DIRS = {"__pycache__", "tests"}
+
+LAUNCHER = """#!/bin/sh
+# Launcher of the AI Prompt Generator bundle; arguments are passed to run.py
+HERE="$(cd "$(dirname "$0")" && pwd)"
+export LD_LIBRARY_PATH="$HERE/python/lib${{LD_LIBRARY_PATH:+:$LD_LIBRARY_PATH}}"
+export PYTHONNOUSERSITE=1
+export PYTHONDONTWRITEBYTECODE=1
+unset PYTHONHOME PYTHONPATH
+exec "$HERE/python/bin/{python}" "$HERE/app/run.py" "$@"
+"""
+
+def _normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _requirements(distribution):
+    """
+    Return the names of the required (non-extra) dependencies that apply here.
+    """
+    from packaging.requirements import Requirement
+
+    names = []
+    for line in distribution.requires or []:
+        requirement = Requirement(line)
+        if requirement.marker is not None and not requirement.marker.evaluate({"extra": ""}):
+            continue
+        names.append(requirement.name)
+    return names
+
+def runtime_distributions(roots=ROOT_DISTRIBUTIONS, trimmed=TRIMMED_DISTRIBUTIONS):
+    """
+    Return the installed distributions the roots require, without the trimmed ones.
+
+    Returns:
+    - A dict mapping normalized names to importlib.metadata distributions, sorted by name
+    """
+    trimmed = {_normalize(name) for name in trimmed}
+    found = {}
+    pending = list(roots)
+    while pending:
+        name = _normalize(pending.pop())
+        if name in found or name in trimmed:
+            continue
+        try:
+            distribution = importlib.metadata.distribution(name)
+        except importlib.metadata.PackageNotFoundError:
+            continue  # Optional on this platform or Python version
+        found[name] = distribution
+        pending.extend(_requirements(distribution))
+    return dict(sorted(found.items()))
+
+def _copy(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(source, target)
+    shutil.copymode(source, target)
+
+def _excluded_from_package(relative_path):
+    return any(part in PACKAGE_EXCLUDE_DIRS for part in relative_path.split("/")[:-1])
+
+def copy_app(target):
+    """
+    Copy the app modules, data directories and the benchmarks the app runs.
+    """
+    for name in sorted(os.listdir(ROOT)):
+        if name.endswith(".py") and name not in APP_EXCLUDE:
+            _copy(os.path.join(ROOT, name), os.path.join(target, name))
+    for directory in APP_DIRS:
+        for folder, dirs, files in os.walk(os.path.join(ROOT, directory)):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                source = os.path.join(folder, name)
+                _copy(source, os.path.join(target, os.path.relpath(source, ROOT)))
+    for name in APP_BENCHMARKS:
+        _copy(os.path.join(ROOT, "benchmarks", name), os.path.join(target, "benchmarks", name))
+
+def copy_interpreter(target):
+    """
+    Copy the running interpreter, its shared library and the trimmed standard library.
+
+    Returns:
+    - The name of the interpreter executable and the bundle's site-packages directory
+    """
+    version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    executable = os.path.realpath(sys.executable)
+    _copy(executable, os.path.join(target, "bin", version))
+    library_dir = sysconfig.get_config_var("LIBDIR")
+    library = sysconfig.get_config_var("INSTSONAME")
+    if sysconfig.get_config_var("Py_ENABLE_SHARED") and library:
+        _copy(os.path.join(library_dir, library), os.path.join(target, "lib", library))
+
+    stdlib = sysconfig.get_paths()["stdlib"]
+    stdlib_target = os.path.join(target, "lib", version)
+    for folder, dirs, files in os.walk(stdlib):
+        relative = os.path.relpath(folder, stdlib)
+        top = relative == "."
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__" and not (top and d in STDLIB_EXCLUDE))
+        for name in sorted(files):
+            if top and name in STDLIB_EXCLUDE:
+                continue
+            if any(pattern.match(name) for pattern in STDLIB_EXCLUDE_PATTERNS):
+                continue
+            _copy(os.path.join(folder, name), os.path.normpath(os.path.join(stdlib_target, relative, name)))
+    return version, os.path.join(stdlib_target, "site-packages")
+
+def copy_distributions(distributions, site_packages):
+    """
+    Copy the files of the distributions recorded in their RECORD files.
+
+    Files installed outside site-packages (scripts, headers) and the
+    excluded package directories are left out.
+    """
+    for distribution in distributions.values():
+        for path in sorted(distribution.files or (), key=str):
+            relative = path.as_posix()
+            if relative.startswith("..") or _excluded_from_package(relative) or relative.endswith(".pyc"):
+                continue
+            source = str(distribution.locate_file(path))
+            if os.path.isfile(source):
+                _copy(source, os.path.join(site_packages, relative))
+
+def compile_bytecode(bundle, python_lib):
+    """
+    Compile every module of the bundle to unchecked hash-based .pyc files.
+
+    The file names stored in the bytecode are relative to the bundle, so
+    they do not depend on where it was built.
+
+    Returns:
+    - True if every module compiled
+    """
+    ok = True
+    for directory in (os.path.join(bundle, "app"), python_lib):
+        ok &= bool(compileall.compile_dir(
+            directory, ddir=os.path.relpath(directory, bundle), quiet=2, workers=0,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        ))
+    return ok
+
+def source_date_epoch():
+    """
+    Return SOURCE_DATE_EPOCH, or the time of the last commit, or 0.
+    """
+    if os.environ.get("SOURCE_DATE_EPOCH"):
+        return int(os.environ["SOURCE_DATE_EPOCH"])
+    try:
+        output = subprocess.run(["git", "log", "-1", "--format=%ct"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout
+        return int(output.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return 0
+
+def _bundle_files(bundle):
+    paths = []
+    for folder, dirs, files in os.walk(bundle):
+        dirs.sort()
+        paths.extend(os.path.join(folder, name) for name in sorted(files))
+    return paths
+
+def write_manifest(bundle, epoch):
+    """
+    Set every file time to epoch and write the SHA-256 of every file.
+
+    Returns:
+    - The SHA-256 of the manifest, identifying the whole bundle
+    """
+    lines = []
+    for path in _bundle_files(bundle):
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        lines.append(f"{digest}  {os.path.relpath(path, bundle)}\n")
+        os.utime(path, (epoch, epoch))
+    manifest = "".join(lines).encode("utf-8")
+    manifest_path = os.path.join(bundle, "MANIFEST.sha256")
+    with open(manifest_path, "wb") as f:
+        f.write(manifest)
+    os.utime(manifest_path, (epoch, epoch))
+    for folder, dirs, _ in os.walk(bundle):
+        for name in dirs:
+            os.utime(os.path.join(folder, name), (epoch, epoch))
+    os.utime(bundle, (epoch, epoch))
+    return hashlib.sha256(manifest).hexdigest()
+
+def write_archive(bundle, path, epoch):
+    """
+    Write the bundle as a tar.gz whose bytes only depend on the bundle's files.
+    """
+    import gzip
+
+    def normalize(info):
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        info.mtime = epoch
+        return info
+
+    base = os.path.dirname(bundle)
+    with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=epoch) as compressed:
+        with tarfile.open(fileobj=compressed, mode="w", format=tarfile.PAX_FORMAT) as archive:
+            entries = [bundle]
+            for folder, dirs, files in os.walk(bundle):
+                dirs.sort()
+                entries.extend(os.path.join(folder, name) for name in dirs + sorted(files))
+            for entry in sorted(entries):
+                archive.add(entry, arcname=os.path.relpath(entry, base), recursive=False, filter=normalize)
+
+def build(output):
+    """
+    Build the bundle into output/BUNDLE_NAME, replacing an earlier build.
+
+    Returns:
+    - The bundle directory and its manifest digest
+    """
+    bundle = os.path.join(output, BUNDLE_NAME)
+    if os.path.exists(bundle):
+        shutil.rmtree(bundle)
+
+    print("Copying the interpreter and standard library...", file=sys.stderr)
+    version, site_packages = copy_interpreter(os.path.join(bundle, "python"))
+    distributions = runtime_distributions()
+    print(f"Copying {len(distributions)} distributions: {', '.join(distributions)}", file=sys.stderr)
+    copy_distributions(distributions, site_packages)
+    copy_app(os.path.join(bundle, "app"))
+
+    launcher = os.path.join(bundle, BUNDLE_NAME)
+    with open(launcher, "w", encoding="utf-8", newline="\n") as f:
+        f.write(LAUNCHER.format(python=version))
+    os.chmod(launcher, os.stat(launcher).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    print("Compiling bytecode...", file=sys.stderr)
+    if not compile_bytecode(bundle, os.path.join(bundle, "python", "lib", version)):
+        print("Warning: some modules did not compile; they cannot be imported from the bundle", file=sys.stderr)
+    return bundle, write_manifest(bundle, source_date_epoch())
+
+def _size(bundle):
+    return sum(os.path.getsize(path) for path in _bundle_files(bundle))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a self-contained Linux bundle of the app.")
+    parser.add_argument("--output", default=os.path.join(ROOT, "dist"), help="Directory the bundle is built in")
+    parser.add_argument("--archive", action="store_true", help="Also write a reproducible tar.gz of the bundle")
+    parser.add_argument("--no-bench", action="store_true", help="Skip the cold-start benchmark")
+    parser.add_argument("--rounds", type=int, default=3, help="Cold starts per variant in the benchmark")
+    parser.add_argument("--budget", type=float, default=5.0,
+                        help="Fail if the bundle's mean time to the first page exceeds this many seconds")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fail if the bundle starts slower than `python run.py` by more than this (0.1 = 10%%)")
+    args = parser.parse_args()
+    if not sys.platform.startswith("linux"):
+        parser.error("the bundle can only be built on Linux")
+
+    bundle, digest = build(args.output)
+    print(f"Bundle: {bundle} ({_size(bundle) / 1e6:.1f} MB)")
+    print(f"Manifest digest: {digest}")
+    if args.archive:
+        archive = os.path.join(args.output, f"{BUNDLE_NAME}-linux-{os.uname().machine}.tar.gz")
+        write_archive(bundle, archive, source_date_epoch())
+        print(f"Archive: {archive} ({os.path.getsize(archive) / 1e6:.1f} MB)")
+    if args.no_bench:
+        return
+    script = os.path.join(ROOT, "benchmarks", "bench_bundle_cold_start.py")
+    sys.exit(subprocess.call([
+        sys.executable, script, "--bundle", bundle, "--rounds", str(args.rounds),
+        "--budget", str(args.budget), "--tolerance", str(args.tolerance),
+    ], cwd=ROOT))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+/*
+ * Streamlit component holding the template options and the prompt preview.
+ *
+ * Options are edited and the preview is rendered here, without contacting
+ * the server. Once edits pause for EDIT_DELAY ms the options are sent as
+ * {id, options, edit: true}, so the server can update its size estimate.
+ * Generate sends {id, options} as the component value, which reruns the app
+ * so the prompt can be generated and saved; Copy writes the shown prompt to
+ * the clipboard. The options are reset from the arguments
+ * whenever the server bumps `revision`, e.g. after restoring a history entry.
+ *
+ * The server only sends the arguments that changed since its previous
+ * render, numbered by `seq`; `base` is the render they apply to, or null
+ * for a full render. When `base` is not the last render applied here, the
+ * server is asked for a full one with the value {id, resync: true}.
+ */
+(function () {
+    "use strict";
+
+    // Milliseconds without an option edit before the options are sent
+    var EDIT_DELAY = 400;
+
+    var args = null;
+    var seq = null;
+    var options = null;
+    var revision = null;
+    var layout = null;
+    var activeTab = 0;
+    var events = 0;
+    var editTimer = null;
+
+    function send(type, data) {
+        var message = { isStreamlitMessage: true, type: type };
+        Object.keys(data || {}).forEach(function (name) { message[name] = data[name]; });
+        window.parent.postMessage(message, "*");
+    }
+
+    function setFrameHeight() {
+        send("streamlit:setFrameHeight", { height: document.documentElement.scrollHeight });
+    }
+
+    // JSON with sorted keys, to compare option sets
+    function canonical(value) {
+        if (value === null || typeof value !== "object" || Array.isArray(value)) {
+            return JSON.stringify(value);
+        }
+        return "{" + Object.keys(value).sort().map(function (name) {
+            return JSON.stringify(name) + ":" + canonical(value[name]);
+        }).join(",") + "}";
+    }
+
+    function shownPrompt() {
+        var current = { task: args.task, options: options };
+        if (args.prompt !== null && args.prompt_for && canonical(args.prompt_for) === canonical(current)) {
+            // The generated prompt also has the sections only the server can build
+            return args.prompt;
+        }
+        var values = { task: args.task };
+        Object.keys(options).forEach(function (name) { values[name] = options[name]; });
+        return renderPrompt(args.spec, values);
+    }
+
+    function sendValue(value) {
+        events += 1;
+        value.id = Date.now() + "-" + events;
+        send("streamlit:setComponentValue", { value: value, dataType: "json" });
+    }
+
+    function cancelEdit() {
+        if (editTimer !== null) {
+            clearTimeout(editTimer);
+            editTimer = null;
+        }
+    }
+
+    // Send the options once editing pauses, so the server's size estimate follows them
+    function optionsEdited() {
+        updatePreview();
+        cancelEdit();
+        editTimer = setTimeout(function () {
+            editTimer = null;
+            sendValue({ options: options, edit: true });
+        }, EDIT_DELAY);
+    }
+
+    function updatePreview() {
+        var prompt = shownPrompt();
+        document.getElementById("preview").textContent = prompt;
+        document.getElementById("size").textContent = args.labels.preview_size
+            .replace("{chars}", Array.from(prompt).length.toLocaleString())
+            .replace("{bytes}", new TextEncoder().encode(prompt).length.toLocaleString());
+        setFrameHeight();
+    }
+
+    function buildControl(control) {
+        var label = document.createElement("label");
+        label.className = "control";
+        var input;
+        if (control.kind === "flag") {
+            input = document.createElement("input");
+            input.type = "checkbox";
+            input.checked = Boolean(options[control.option]);
+            input.addEventListener("change", function () {
+                options[control.option] = input.checked;
+                optionsEdited();
+            });
+            label.appendChild(input);
+            label.appendChild(document.createTextNode(" " + control.label));
+            return label;
+        }
+        label.appendChild(document.createTextNode(control.label));
+        if (control.kind === "choice") {
+            input = document.createElement("select");
+            control.choices.forEach(function (choice, index) {
+                var item = document.createElement("option");
+                item.value = String(index);
+                item.textContent = choice[1];
+                item.selected = choice[0] === options[control.option];
+                input.appendChild(item);
+            });
+            input.addEventListener("change", function () {
+                options[control.option] = control.choices[Number(input.value)][0];
+                optionsEdited();
+            });
+        } else {
+            input = document.createElement("input");
+            input.type = "text";
+            input.value = options[control.option] || "";
+            input.addEventListener("input", function () {
+                options[control.option] = input.value;
+                optionsEdited();
+            });
+        }
+        label.appendChild(input);
+        return label;
+    }
+
+    function buildControls() {
+        var tabs = document.getElementById("tabs");
+        var controls = document.getElementById("controls");
+        tabs.textContent = "";
+        controls.textContent = "";
+        args.tabs.forEach(function (tab, index) {
+            var button = document.createElement("button");
+            button.textContent = tab.label;
+            button.className = index === activeTab ? "active" : "";
+            button.addEventListener("click", function () {
+                activeTab = index;
+                buildControls();
+                setFrameHeight();
+            });
+            tabs.appendChild(button);
+        });
+        args.tabs[activeTab].controls.forEach(function (control) {
+            controls.appendChild(buildControl(control));
+        });
+    }
+
+    function applyTheme(theme) {
+        if (!theme) {
+            return;
+        }
+        var style = document.documentElement.style;
+        style.setProperty("--primary-color", theme.primaryColor);
+        style.setProperty("--background-color", theme.backgroundColor);
+        style.setProperty("--secondary-background-color", theme.secondaryBackgroundColor);
+        style.setProperty("--text-color", theme.textColor);
+        document.body.style.fontFamily = theme.font;
+    }
+
+    function requestResync() {
+        sendValue({ resync: true });
+    }
+
+    // Merge a render's changed arguments into the ones kept from earlier renders
+    function applyDelta(delta) {
+        if (delta.seq === seq) {
+            return true;  // The same render again, e.g. after a theme change
+        }
+        if (delta.base === null) {
+            args = {};
+        } else if (args === null || delta.base !== seq) {
+            return false;
+        }
+        Object.keys(delta).forEach(function (name) { args[name] = delta[name]; });
+        seq = delta.seq;
+        return true;
+    }
+
+    function render(delta, theme) {
+        if (!applyDelta(delta)) {
+            requestResync();
+            return;
+        }
+        applyTheme(theme);
+        if (args.revision !== revision) {
+            cancelEdit();
+            options = JSON.parse(JSON.stringify(args.options));
+            revision = args.revision;
+            layout = null;
+        }
+        // Labels change with the UI language
+        var newLayout = canonical(args.tabs);
+        if (newLayout !== layout) {
+            layout = newLayout;
+            activeTab = Math.min(activeTab, args.tabs.length - 1);
+            buildControls();
+        }
+        document.getElementById("options-header").textContent = args.labels.options_header;
+        document.getElementById("prompt-header").textContent = args.labels.prompt_header;
+        document.getElementById("generate").textContent = args.labels.generate_button;
+        document.getElementById("copy").textContent = args.labels.copy_button;
+        document.getElementById("note").textContent = args.note || "";
+        updatePreview();
+    }
+
+    function copyText(text) {
+        if (navigator.clipboard && window.isSecureContext) {
+            return navigator.clipboard.writeText(text);
+        }
+        // Fallback for plain http: copy from a selected, off-screen text area
+        var area = document.createElement("textarea");
+        area.value = text;
+        area.style.position = "fixed";
+        area.style.left = "-9999px";
+        document.body.appendChild(area);
+        area.select();
+        var copied = document.execCommand("copy");
+        document.body.removeChild(area);
+        return copied ? Promise.resolve() : Promise.reject(new Error("copy failed"));
+    }
+
+    document.getElementById("generate").addEventListener("click", function () {
+        // Generate sends the options itself
+        cancelEdit();
+        sendValue({ options: options });
+    });
+
+    document.getElementById("copy").addEventListener("click", function () {
+        var button = document.getElementById("copy");
+        copyText(shownPrompt()).then(function () {
+            button.textContent = args.labels.copied;
+            setTimeout(function () { button.textContent = args.labels.copy_button; }, 1500);
+        });
+    });
+
+    window.addEventListener("message", function (event) {
+        if (event.data && event.data.type === "streamlit:render") {
+            render(event.data.args, event.data.theme);
+        }
+    });
+
+    send("streamlit:componentReady", { apiVersion: 1 });
+})();
@@ -0,0 +1,93 @@
+/*
+ * Renders the prompt template exported by prompt_core.template_spec() with
+ * the same rules as the Python engine, so the preview needs no server.
+ *
+ * In the browser this defines renderPrompt(spec, options). Under Node it is
+ * a module, and run directly it reads {"spec": ..., "cases": [options, ...]}
+ * as JSON on stdin and writes the rendered prompts as a JSON list; this is
+ * how benchmarks/check_template_parity.py compares both implementations.
+ */
+(function (root) {
+    "use strict";
+
+    // Python's truthiness of a JSON value
+    function isSet(value) {
+        if (value === null || value === undefined || value === false || value === 0 || value === "") {
+            return false;
+        }
+        if (Array.isArray(value)) {
+            return value.length > 0;
+        }
+        if (typeof value === "object") {
+            return Object.keys(value).length > 0;
+        }
+        return true;
+    }
+
+    // Python's str() of a JSON value
+    function pythonStr(value) {
+        if (value === null || value === undefined) {
+            return "None";
+        }
+        if (value === true || value === false) {
+            return value ? "True" : "False";
+        }
+        return String(value);
+    }
+
+    function optionValue(spec, options, name) {
+        return Object.prototype.hasOwnProperty.call(options, name) ? options[name] : spec.defaults[name];
+    }
+
+    function renderChoice(spec, section, options) {
+        var value = optionValue(spec, options, section.option);
+        if (typeof value !== "string" || !Object.prototype.hasOwnProperty.call(section.values, value)) {
+            value = section.default;
+        }
+        return section.values[value];
+    }
+
+    function renderLines(spec, section, options) {
+        var text = "";
+        section.lines.forEach(function (line) {
+            var value = optionValue(spec, options, line.option);
+            var included;
+            if (Object.prototype.hasOwnProperty.call(line, "unless")) {
+                included = value !== line.unless;
+            } else {
+                included = line.negate ? !isSet(value) : isSet(value);
+            }
+            if (included) {
+                // split/join, not replace: the value may contain "$&" and the like
+                text += line.format.split("{}").join(pythonStr(value));
+            }
+        });
+        return text ? section.header + text : "";
+    }
+
+    function renderPrompt(spec, options) {
+        return spec.sections.map(function (section) {
+            return section.type === "choice"
+                ? renderChoice(spec, section, options)
+                : renderLines(spec, section, options);
+        }).join("");
+    }
+
+    if (typeof module !== "undefined" && module.exports) {
+        module.exports = { renderPrompt: renderPrompt };
+        if (require.main === module) {
+            var input = "";
+            process.stdin.setEncoding("utf8");
+            process.stdin.on("data", function (chunk) { input += chunk; });
+            process.stdin.on("end", function () {
+                var request = JSON.parse(input);
+                var prompts = request.cases.map(function (options) {
+                    return renderPrompt(request.spec, options);
+                });
+                process.stdout.write(JSON.stringify(prompts));
+            });
+        }
+    } else {
+        root.renderPrompt = renderPrompt;
+    }
+})(this);
@@ -0,0 +1,344 @@
+"""
+Context Files section: file contents attached to the prompt.
+
+Paths and glob patterns are resolved against a base directory and every
+matching text file is appended to the prompt as a fenced block. Files are
+read through mmap, so hashing a file and streaming it into the output never
+holds a second copy of it in memory: iter_prompt and write_prompt decode a
+file slice by slice as it is written. Files with identical contents are
+included once and the others are listed as duplicates.
+
+A byte budget, and optionally a token budget, bounds the embedded contents.
+Files are taken in priority order, which is the order of the patterns and
+then of the paths matched by each pattern. A file that fits is embedded
+whole; one that does not is trimmed at a line boundary to what is left of the
+budget, or summarized by its size, language and line count when too little
+is left.
+"""
+import codecs
+import glob
+import hashlib
+import mmap
+import os
+from contextlib import contextmanager
+
+from manifest import detect_language
+from prompt_size import count_tokens
+
+# Budget for the embedded file contents, in bytes of UTF-8
+DEFAULT_MAX_BYTES = 256 * 1024
+# A file is summarized instead of trimmed when less than this is left
+MIN_TRIMMED_BYTES = 1024
+
+# Slice length used to hash, count and decode mapped files
+_CHUNK = 1 << 20
+# A NUL byte in the first block marks a file as binary
+_BINARY_PROBE = 8192
+_GLOB_CHARS = "*?["
+
+# Fence info strings for languages whose manifest name is not one
+_FENCE_LANGUAGES = {
+    "C++": "cpp", "C#": "csharp", "Objective-C": "objectivec", "Shell": "bash",
+    "Batch": "bat", "reStructuredText": "rst", "Jupyter": "json", "Text": "",
+}
+
+# Status of a file in the section
+EMBEDDED = "embedded"
+TRIMMED = "trimmed"
+SUMMARIZED = "summarized"
+DUPLICATE = "duplicate"
+BINARY = "binary"
+MISSING = "missing"
+DIRECTORY = "directory"
+
+class ContextFile:
+    """
+    One attached file and how it is included.
+
+    Attributes:
+    - path: Path shown in the prompt, relative to the base directory when inside it
+    - full_path: Absolute path of the file
+    - status: EMBEDDED, TRIMMED, SUMMARIZED, DUPLICATE, BINARY, MISSING or DIRECTORY
+    - size: Size of the file in bytes
+    - length: Bytes of the file included in the prompt
+    - lines: Lines in the file
+    - included_lines: Lines included in the prompt
+    - tokens: Approximate tokens included, when a token budget is set
+    - duplicate_of: Path of the first attached file with the same contents
+    """
+
+    def __init__(self, path, full_path, status=None):
+        self.path = path
+        self.full_path = full_path
+        self.status = status
+        self.size = 0
+        self.length = 0
+        self.lines = 0
+        self.included_lines = 0
+        self.tokens = None
+        self.digest = None
+        self.duplicate_of = None
+        self.fence = "```"
+        self.ends_with_newline = True
+
+    @property
+    def language(self):
+        return detect_language(os.path.basename(self.full_path))
+
+@contextmanager
+def _mapped(path):
+    """
+    Map a file read-only; empty files, which cannot be mapped, give b"".
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+def _slices(data, start, end, chunk_size=_CHUNK):
+    for position in range(start, end, chunk_size):
+        yield position, min(position + chunk_size, end)
+
+def _count_lines(data, end):
+    lines = sum(data[start:stop].count(b"\n") for start, stop in _slices(data, 0, end))
+    if end and data[end - 1:end] != b"\n":
+        lines += 1
+    return lines
+
+def _count_tokens(data, end):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    return sum(count_tokens(decoder.decode(data[start:stop], stop == end))
+               for start, stop in _slices(data, 0, end))
+
+def _trim_length(data, allowed):
+    """
+    Return the length of the longest head of data within allowed bytes,
+    ending at a line boundary when there is one.
+    """
+    cut = data.rfind(b"\n", 0, allowed) + 1
+    if cut > 0:
+        return cut
+    # A single long line: cut before a UTF-8 continuation byte
+    while allowed > 0 and data[allowed] & 0xC0 == 0x80:
+        allowed -= 1
+    return allowed
+
+def parse_patterns(patterns):
+    """
+    Normalize the context_files option to a list of patterns.
+
+    Accepts one pattern per line in a string, or an iterable of patterns.
+    """
+    if isinstance(patterns, str):
+        patterns = patterns.splitlines()
+    return [pattern.strip() for pattern in patterns if pattern and pattern.strip()]
+
+def _display_path(full_path, base_dir):
+    relative = os.path.relpath(full_path, base_dir)
+    if relative.startswith(os.pardir):
+        relative = full_path
+    return relative.replace(os.sep, "/")
+
+def resolve_files(patterns, base_dir):
+    """
+    Resolve paths and glob patterns to files, in priority order.
+
+    Every file is listed once, at the position of the first pattern that
+    matches it. Patterns that match nothing are listed as MISSING and plain
+    paths to directories as DIRECTORY.
+
+    Returns:
+    - A list of ContextFile
+    """
+    files = []
+    seen = set()
+    for pattern in parse_patterns(patterns):
+        full_pattern = os.path.join(base_dir, os.path.expanduser(pattern))
+        if any(char in pattern for char in _GLOB_CHARS):
+            matches = sorted(path for path in glob.glob(full_pattern, recursive=True)
+                             if os.path.isfile(path))
+        elif os.path.isdir(full_pattern):
+            files.append(ContextFile(pattern, os.path.abspath(full_pattern), DIRECTORY))
+            continue
+        else:
+            matches = [full_pattern] if os.path.isfile(full_pattern) else []
+        if not matches:
+            files.append(ContextFile(pattern, os.path.abspath(full_pattern), MISSING))
+        for path in matches:
+            real = os.path.realpath(path)
+            if real not in seen:
+                seen.add(real)
+                full_path = os.path.abspath(path)
+                files.append(ContextFile(_display_path(full_path, base_dir), full_path))
+    return files
+
+class ContextSection:
+    """
+    The files attached to a prompt and the budget they were selected under.
+
+    Attributes:
+    - files: ContextFile entries in priority order
+    - bytes: Bytes of file contents included
+    - tokens: Approximate tokens included, when a token budget is set
+    """
+
+    def __init__(self, files, max_bytes, max_tokens):
+        self.files = files
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.bytes = sum(entry.length for entry in files)
+        self.tokens = sum(entry.tokens or 0 for entry in files) if max_tokens is not None else None
+
+    def chunks(self, chunk_size=None):
+        """
+        Yield the section text, decoding each included file from its mapping.
+
+        Parameters:
+        - chunk_size: Maximum bytes of a file decoded per chunk (default: whole file)
+        """
+        yield "\n## Context Files\n"
+        for entry in self.files:
+            if entry.status not in (EMBEDDED, TRIMMED):
+                continue
+            info = _FENCE_LANGUAGES.get(entry.language, (entry.language or "").lower())
+            yield f"\n### {entry.path}\n{entry.fence}{info}\n"
+            yield from _decoded(entry.full_path, entry.length, chunk_size)
+            yield f"{'' if entry.ends_with_newline else chr(10)}{entry.fence}\n"
+            if entry.status == TRIMMED:
+                yield (f"(Trimmed to fit the budget: first {entry.included_lines} of "
+                       f"{entry.lines} lines.)\n")
+
+        notes = [_note(entry) for entry in self.files if entry.status not in (EMBEDDED, TRIMMED)]
+        if notes:
+            yield "\nNot included:\n" + "".join(notes)
+
+    def text(self):
+        return "".join(self.chunks())
+
+    def summary(self):
+        """
+        Return the number of files per status.
+        """
+        counts = {}
+        for entry in self.files:
+            counts[entry.status] = counts.get(entry.status, 0) + 1
+        return counts
+
+def _decoded(path, length, chunk_size):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    with _mapped(path) as data:
+        # The file may have shrunk since it was selected
+        end = min(length, len(data))
+        if end == 0:
+            return
+        for start, stop in _slices(data, 0, end, chunk_size or end):
+            with memoryview(data) as view, view[start:stop] as piece:
+                text = decoder.decode(piece, stop == end)
+            yield text
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def _note(entry):
+    if entry.status == SUMMARIZED:
+        language = f"{entry.language}, " if entry.language else ""
+        return f"- {entry.path}: {language}{_format_size(entry.size)}, {entry.lines} lines (over budget)\n"
+    if entry.status == DUPLICATE:
+        return f"- {entry.path}: same contents as {entry.duplicate_of}\n"
+    if entry.status == BINARY:
+        return f"- {entry.path}: binary file, {_format_size(entry.size)}\n"
+    if entry.status == DIRECTORY:
+        return f"- {entry.path}: is a directory, use a glob such as {entry.path}/**/*.py\n"
+    return f"- {entry.path}: no matching file\n"
+
+def _select(entry, data, remaining_bytes, remaining_tokens):
+    """
+    Decide how much of a mapped, non-duplicate text file to include.
+
+    Only what the byte budget leaves room for is tokenized: a file larger
+    than the remaining bytes is cut to them before its tokens are counted.
+
+    Returns:
+    - The bytes and tokens used from the budget
+    """
+    size = len(data)
+    allowed = remaining_bytes
+    if size <= remaining_bytes:
+        tokens = _count_tokens(data, size) if remaining_tokens is not None else None
+        if tokens is None or tokens <= remaining_tokens:
+            entry.status, entry.length, entry.tokens, entry.included_lines = EMBEDDED, size, tokens, entry.lines
+            return size, tokens or 0
+        # Scale by the file's own bytes per token
+        allowed = remaining_tokens * size // max(tokens, 1)
+
+    length = head_tokens = 0
+    while allowed >= MIN_TRIMMED_BYTES:
+        length = _trim_length(data, allowed)
+        head_tokens = _count_tokens(data, length) if remaining_tokens is not None else None
+        if head_tokens is None or head_tokens <= remaining_tokens:
+            break
+        # Scale by the head's bytes per token, shrinking at least 10% per round
+        allowed = min(allowed * 9 // 10, remaining_tokens * length // max(head_tokens, 1))
+    else:
+        entry.status = SUMMARIZED
+        return 0, 0
+    entry.status, entry.length, entry.tokens = TRIMMED, length, head_tokens
+    entry.included_lines = _count_lines(data, length)
+    return length, head_tokens or 0
+
+def collect_context(patterns, base_dir=None, max_bytes=DEFAULT_MAX_BYTES, max_tokens=None):
+    """
+    Select the files for a Context Files section.
+
+    Parameters:
+    - patterns: Paths or glob patterns ("**" matches directories
+      recursively), as a list or one per line in a string
+    - base_dir: Directory relative patterns are resolved against (default:
+      the working directory)
+    - max_bytes: Budget for the included file contents, in bytes
+    - max_tokens: Optional budget for the included contents, in approximate tokens
+
+    Returns:
+    - A ContextSection
+    """
+    base_dir = os.path.abspath(base_dir if base_dir and os.path.isdir(base_dir) else os.curdir)
+    files = resolve_files(patterns, base_dir)
+    # First path seen with each content digest
+    seen = {}
+    remaining_bytes, remaining_tokens = max_bytes, max_tokens
+    for entry in files:
+        if entry.status is not None:
+            continue
+        try:
+            with _mapped(entry.full_path) as data:
+                entry.size = len(data)
+                if b"\0" in data[:_BINARY_PROBE]:
+                    entry.status = BINARY
+                    continue
+                digest = hashlib.sha256()
+                for start, stop in _slices(data, 0, entry.size):
+                    with memoryview(data) as view, view[start:stop] as piece:
+                        digest.update(piece)
+                entry.digest = digest.digest()
+                if entry.digest in seen:
+                    entry.status, entry.duplicate_of = DUPLICATE, seen[entry.digest]
+                    continue
+                seen[entry.digest] = entry.path
+                entry.lines = _count_lines(data, entry.size)
+                used_bytes, used_tokens = _select(entry, data, remaining_bytes, remaining_tokens)
+                if entry.status == SUMMARIZED:
+                    continue
+                remaining_bytes -= used_bytes
+                if remaining_tokens is not None:
+                    remaining_tokens -= used_tokens
+                entry.ends_with_newline = data[entry.length - 1:entry.length] in (b"\n", b"")
+                while data.find(entry.fence.encode("ascii"), 0, entry.length) != -1:
+                    entry.fence += "`"
+        except OSError:
+            entry.status = MISSING
+    return ContextSection(files, max_bytes, max_tokens)
@@ -0,0 +1,162 @@
+"""
+UI translation catalogs.
+
+Each UI language is stored as a JSON file in the locales directory and is
+only read the first time it is used. Loading compiles the locale and its
+fallback chain into one flat, read-only lookup table with interned keys, so
+a lookup is a single dict access and missing strings resolve to the next
+language in the chain (ultimately English).
+
+Run this module to check the catalogs before shipping:
+    python i18n.py --check [--strict]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+
+# Language every chain ends with; its catalog must contain every key
+ROOT_LOCALE = "english"
+
+# Explicit fallback chains, most specific first; unlisted locales fall back to ROOT_LOCALE
+FALLBACKS = {
+    "chinese": ("english",),
+}
+
+# Sources whose t["..."] lookups must all resolve in the root catalog
+UI_SOURCES = ("main.py",)
+
+_loaded = {}
+
+def available_locales():
+    """
+    Return the names of the locales that have a catalog file, root first.
+    """
+    names = {os.path.splitext(name)[0] for name in os.listdir(LOCALES_DIR) if name.endswith(".json")}
+    return sorted(names, key=lambda name: (name != ROOT_LOCALE, name))
+
+def fallback_chain(locale):
+    """
+    Return the lookup order for a locale, ending with ROOT_LOCALE.
+    """
+    chain = [locale]
+    for fallback in FALLBACKS.get(locale, ()):
+        if fallback not in chain:
+            chain.append(fallback)
+    if ROOT_LOCALE not in chain:
+        chain.append(ROOT_LOCALE)
+    return tuple(chain)
+
+def _read_locale(locale):
+    path = os.path.join(LOCALES_DIR, f"{locale}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"Unknown UI language: {locale}") from None
+
+def load_catalog(locale):
+    """
+    Return the compiled lookup table of a locale, loading it on first use.
+
+    Parameters:
+    - locale: Locale name, e.g. "english"
+
+    Returns:
+    - A read-only mapping of interned keys to translated strings
+
+    Raises:
+    - KeyError if the locale has no catalog file
+    """
+    catalog = _loaded.get(locale)
+    if catalog is None:
+        table = {}
+        # Apply the chain from the root up so specific translations win
+        for name in reversed(fallback_chain(locale)):
+            for key, value in _read_locale(name).items():
+                table[sys.intern(key)] = value
+        catalog = _loaded[locale] = MappingProxyType(table)
+    return catalog
+
+class Translations(Mapping):
+    """
+    Mapping of locale name to its catalog, loading catalogs lazily.
+    """
+
+    def __getitem__(self, locale):
+        return load_catalog(locale)
+
+    def __iter__(self):
+        return iter(available_locales())
+
+    def __len__(self):
+        return len(available_locales())
+
+    def __contains__(self, locale):
+        return locale in _loaded or os.path.exists(os.path.join(LOCALES_DIR, f"{locale}.json"))
+
+translations = Translations()
+
+def check_catalogs(strict=False, sources=UI_SOURCES):
+    """
+    Check the catalogs for completeness.
+
+    Errors: keys used by the UI that are missing from the root catalog, keys
+    that a locale defines but the root does not, and broken fallback chains.
+    Keys a locale does not translate are errors only when strict is set;
+    otherwise they are reported as falling back.
+
+    Returns:
+    - A tuple (list of errors, list of warnings)
+    """
+    errors, warnings = [], []
+    root_keys = set(_read_locale(ROOT_LOCALE))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    for source in sources:
+        with open(os.path.join(base_dir, source), "r", encoding="utf-8") as f:
+            used = set(re.findall(r"""\bt\[\s*["'](\w+)["']\s*\]""", f.read()))
+        for key in sorted(used - root_keys):
+            errors.append(f"{source}: key '{key}' is missing from the {ROOT_LOCALE} catalog")
+
+    locales = available_locales()
+    for locale in locales:
+        for fallback in fallback_chain(locale):
+            if fallback not in locales:
+                errors.append(f"{locale}: fallback '{fallback}' has no catalog")
+        if locale == ROOT_LOCALE:
+            continue
+        keys = set(_read_locale(locale))
+        for key in sorted(keys - root_keys):
+            errors.append(f"{locale}: key '{key}' is not defined in the {ROOT_LOCALE} catalog")
+        for key in sorted(root_keys - keys):
+            message = f"{locale}: key '{key}' is untranslated (falls back to {fallback_chain(locale)[1]})"
+            (errors if strict else warnings).append(message)
+    return errors, warnings
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the UI translation catalogs.")
+    parser.add_argument("--check", action="store_true", help="Check catalog completeness")
+    parser.add_argument("--strict", action="store_true", help="Treat untranslated keys as errors")
+    args = parser.parse_args()
+
+    if not args.check:
+        parser.print_help()
+        return
+
+    errors, warnings = check_catalogs(strict=args.strict)
+    for warning in warnings:
+        print(f"warning: {warning}")
+    for error in errors:
+        print(f"error: {error}")
+    if errors:
+        sys.exit(1)
+    print(f"Catalogs OK: {', '.join(available_locales())}")
+
+if __name__ == "__main__":
+    main()
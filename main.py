@@ -1,190 +1,16 @@
-import streamlit as st
-
-# Dictionary for UI translations
-translations = {
-    "english": {
-        "title": "AI Prompt Generator",
-        "subtitle": "Configure your AI prompt by selecting the options below:",
-        "task_input": "Enter your task for the AI:",
-        "options_header": "Prompt Options",
-        "generate_button": "Generate Prompt",
-        "copy_button": "Copy Prompt to Clipboard",
-        "copied_message": "Prompt copied to clipboard!",
-        "prompt_header": "Generated Prompt",
-        "prompt_label": "Your AI prompt:",
-        "lang_comm": "Language & Communication",
-        "file_ops": "File Operations",
-        "code_quality": "Code Quality & Style",
-        "perf_security": "Performance & Security",
-        "testing_exec": "Testing & Execution",
-        "project_specs": "Project Specifics",
-        "response_lang": "Response Language",
-        "explanation_detail": "Explanation Detail",
-        "edit_files": "Allow AI to edit files",
-        "generate_files": "Allow AI to generate files",
-        "ban_requests": "Ban external requests",
-        "code_style": "Code Style",
-        "error_handling": "Include error handling",
-        "doc_level": "Documentation Level",
-        "optimize_perf": "Optimize for performance",
-        "preferred_framework": "Preferred Framework",
-        "security_check": "Include security considerations",
-        "compatibility": "Compatibility Requirements",
-        "create_tests": "Create unit tests",
-        "executable": "Run tests without modifying existing ones",
-        "dir_check": "Directory to check (optional)",
-        "not_specified": "Not specified",
-        "ui_language": "UI Language"
-    },
-    "chinese": {
-        "title": "AI 提示生成器",
-        "subtitle": "通过选择以下选项配置您的 AI 提示：",
-        "task_input": "输入您给 AI 的任务：",
-        "options_header": "提示选项",
-        "generate_button": "生成提示",
-        "copy_button": "复制提示到剪贴板",
-        "copied_message": "提示已复制到剪贴板！",
-        "prompt_header": "生成的提示",
-        "prompt_label": "您的 AI 提示：",
-        "lang_comm": "语言和沟通",
-        "file_ops": "文件操作",
-        "code_quality": "代码质量和风格",
-        "perf_security": "性能和安全",
-        "testing_exec": "测试和执行",
-        "project_specs": "项目细节",
-        "response_lang": "响应语言",
-        "explanation_detail": "解释详细程度",
-        "edit_files": "允许 AI 编辑文件",
-        "generate_files": "允许 AI 生成文件",
-        "ban_requests": "禁止外部请求",
-        "code_style": "代码风格",
-        "error_handling": "包含错误处理",
-        "doc_level": "文档级别",
-        "optimize_perf": "优化性能",
-        "preferred_framework": "首选框架",
-        "security_check": "包含安全考虑",
-        "compatibility": "兼容性要求",
-        "create_tests": "创建单元测试",
-        "executable": "运行测试但不修改现有测试",
-        "dir_check": "要检查的目录（可选）",
-        "not_specified": "未指定",
-        "ui_language": "界面语言",
-        "minimal": "最小",
-        "low": "低",
-        "medium": "中等",
-        "high": "高",
-        "comprehensive": "全面"
-    }
-}
-
-def generate_prompt(task="", language="english", edit_file=False, generate_file=False, 
-                   ban_request=False, unittest=False, run=False, dir=None,
-                   code_style=None, documentation_level=None, error_handling=False,
-                   performance_optimization=False, security_check=False, 
-                   framework=None, compatibility=None, explanation_detail="medium"):
-    """
-    Generate an AI prompt based on the selected options.
-
-    Parameters:
-    - task: The specific task for the AI
-    - language: Language for the response (english, chinese, spanish, french)
-    - edit_file: Whether to allow AI to edit files
-    - generate_file: Whether to allow AI to generate files
-    - ban_request: Whether to ban certain requests
-    - unittest: Whether to create a unittest
-    - run: Whether to run tests after generation without modifying existing tests
-    - dir: Directory to be checked
-    - code_style: Preferred code style (PEP8, Google, etc.)
-    - documentation_level: Level of documentation required
-    - error_handling: Whether to include error handling
-    - performance_optimization: Whether to optimize for performance
-    - security_check: Whether to include security considerations
-    - framework: Preferred framework to use
-    - compatibility: Compatibility requirements
-    - explanation_detail: Level of detail in explanations
-
-    Returns:
-    - A formatted prompt string
-    """
-    prompt = ""
-
-    # Add the task if provided
-    if task:
-        prompt += f"Task: {task}\n\n"
-
-    # Language & Communication settings
-    if language != "english":
-        if language == "chinese":
-            prompt += "请使用中文回答。\n\n"
-        elif language == "spanish":
-            prompt += "Por favor, responde en español.\n\n"
-        elif language == "french":
-            prompt += "Veuillez répondre en français.\n\n"
-
-    # Explanation detail
-    if explanation_detail != "medium":
-        prompt += f"Please provide {explanation_detail} level of detail in your explanations.\n"
-
-    # File operations permissions section
-    has_file_ops = edit_file or (not generate_file) or ban_request
-    if has_file_ops:
-        prompt += "## File Operations\n"
-        if edit_file:
-            prompt += "You are allowed to edit existing files.\n"
-
-        if not generate_file:  # Default is True, so only include if False
-            prompt += "You are NOT allowed to generate new files.\n"
-
-        if ban_request:
-            prompt += "Please do not make any external API calls or access external resources.\n"
-
-    # Code Quality & Style section
-    has_code_quality = code_style or documentation_level or error_handling
-    if has_code_quality:
-        prompt += "\n## Code Quality & Style\n"
-        if code_style:
-            prompt += f"Please follow {code_style} style guidelines.\n"
-
-        if documentation_level:
-            prompt += f"Include {documentation_level} level of documentation in the code.\n"
-
-        if error_handling:
-            prompt += "Implement proper error handling and validation.\n"
-
-    # Performance & Security section
-    if performance_optimization or security_check:
-        prompt += "\n## Performance & Security\n"
-        if performance_optimization:
-            prompt += "Optimize the code for performance.\n"
-        if security_check:
-            prompt += "Include security best practices and considerations.\n"
-
-    # Framework & Compatibility section
-    if framework or compatibility:
-        prompt += "\n## Framework & Compatibility\n"
-        if framework:
-            prompt += f"Use {framework} framework.\n"
-        if compatibility:
-            prompt += f"Ensure compatibility with {compatibility}.\n"
-
-    # Testing & Execution section
-    has_testing = unittest or run
-    if has_testing:
-        prompt += "\n## Testing & Execution\n"
-        if unittest:
-            prompt += "Please create unit tests for the code.\n"
-        if run:
-            prompt += "Please run the tests after generation without modifying existing tests.\n"
-
-    # Project Specifics section
-    if dir:
-        prompt += f"\n## Project Specifics\nPlease check the following directory: {dir}\n"
-
-    return prompt
-
-def main():
-    # Apply custom CSS to make the UI more compact
-    st.markdown("""
+import ipaddress
+import os
+import time
+
+# The generator lives in prompt_core; generate_prompt is re-exported for existing callers
+from prompt_core import generate_prompt, translations  # noqa: F401
+from metrics import configure_from_environment, phase, register_collector, timed_rerun
+from prompt_preview import prompt_preview
+from prompt_size import PromptSizer, default_token_budget
+from session_store import close_streamlit_session, current_session_id, get_default_manager
+
+# Custom CSS to make the UI more compact, built once per process
+COMPACT_CSS = """
     <style>
         /* Reduce overall padding and margins */
         .stApp {
@@ -254,148 +80,400 @@ def main():
             padding: 0.5rem !important;
         }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+# Default value of every prompt option widget, keyed by generate_prompt parameter
+OPTION_DEFAULTS = {
+    "language": "english",
+    "explanation_detail": "medium",
+    "edit_file": False,
+    "generate_file": True,
+    "ban_request": True,
+    "framework": None,
+    "compatibility": None,
+    "code_style": None,
+    "documentation_level": None,
+    "error_handling": False,
+    "performance_optimization": False,
+    "security_check": False,
+    "unittest": False,
+    "run": True,
+    "dir": "",
+    "dir_manifest": None,
+    "context_files": "",
+    "context_budget": 0,
+}
+
+# Options edited in the server-side widgets: they read the file system, so the
+# browser preview cannot render their sections. The others are edited in the
+# preview component.
+SERVER_OPTIONS = ("dir_manifest", "context_files", "context_budget")
+BROWSER_OPTIONS = tuple(name for name in OPTION_DEFAULTS if name not in SERVER_OPTIONS)
+
+# Address the app is served on, set by run.py; in multi-worker mode this is
+# the balancer's address, since the workers themselves listen on loopback
+SERVER_ADDRESS_ENV = "PROMPT_SERVER_ADDRESS"
+# Set to 1 to offer the file-reading options on an app served to the network
+REMOTE_FILES_ENV = "PROMPT_REMOTE_FILES"
+
+# Values offered by the option selectors, in display order
+OPTION_CHOICES = {
+    "language": ["english", "chinese", "spanish", "french"],
+    "explanation_detail": ["minimal", "low", "medium", "high", "comprehensive"],
+    "framework": [None, "Django", "Flask", "FastAPI", "React", "Vue", "Angular", "TensorFlow", "PyTorch", "Other"],
+    "compatibility": [None, "Python 3.6+", "Python 3.8+", "Python 3.10+", "Cross-browser", "Mobile-friendly", "Other"],
+    "code_style": [None, "PEP8", "Google", "NumPy", "Microsoft", "Custom"],
+    "documentation_level": [None, "minimal", "standard", "detailed", "comprehensive"],
+}
+
+def option_key(name):
+    """
+    Session state key of the widget for a generate_prompt option.
+    """
+    return f"opt_{name}"
+
+def server_files_enabled(address):
+    """
+    Whether the server-side options may read the file system.
+
+    They read whatever paths the browser sends, so they are only offered on
+    an app served on a loopback address, unless REMOTE_FILES_ENV is set.
+
+    Parameters:
+    - address: Streamlit's server.address (None: every interface)
+    """
+    if os.environ.get(REMOTE_FILES_ENV) == "1":
+        return True
+    address = os.environ.get(SERVER_ADDRESS_ENV) or address
+    if address == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+def current_options(state):
+    """
+    Read the prompt options from the widget values stored in session state.
+
+    Widgets that have not been rendered yet fall back to their defaults, as
+    do the server-side options when state.server_files is False.
+    """
+    options = {name: state.get(option_key(name), default) for name, default in OPTION_DEFAULTS.items()}
+    if not state.get("server_files", True):
+        options.update((name, OPTION_DEFAULTS[name]) for name in SERVER_OPTIONS)
+    for name in ("dir", "context_files"):
+        if options[name] == "":
+            options[name] = None
+    return options
+
+def _sync_ui_language(state):
+    # Runs before the rerun triggered by the selector, so one rerun is enough
+    state.ui_language = state.ui_lang_selector
+
+def render_size_panel(slot, t, state):
+    """
+    Live prompt size with the token budget warning.
+
+    Rendered by the prompt panel into a placeholder above it. Options edited
+    in the preview count once the preview sends them, shortly after the last
+    edit. The session's sizer only recounts the part of the task that
+    changed since the last call.
+    """
+    if "prompt_sizer" not in state:
+        state.prompt_sizer = PromptSizer()
+    size = state.prompt_sizer.measure(task=state.get(option_key("task"), ""), **current_options(state))
+    budget = state.get("token_budget", default_token_budget())
+    message = t["prompt_size"].format(**size)
+    if budget and size["tokens"] > budget:
+        slot.warning(f"{message}  \n{t['over_budget'].format(tokens=size['tokens'], budget=budget)}")
+    else:
+        slot.caption(message)
+
+def keep_prompt(state, prompt, sessions=None):
+    """
+    Store a generated prompt in session state.
+
+    With a session manager the state holds the prompt's interned PromptRef,
+    which is shared with other sessions or spilled to disk as needed.
+    """
+    state.prompt = sessions.intern_prompt(current_session_id(), prompt) if sessions is not None else prompt
+    state.prompt_generated = True
+
+def discard_prompt(state):
+    """
+    Drop the generated prompt, e.g. once the task it was generated for changed.
+    """
+    state.prompt = ""
+    state.prompt_for = None
+    state.prompt_generated = False
+
+def restore_history_entry(state, history, entry_id, sessions=None):
+    """
+    Load the options, task and prompt of a history entry into the widgets.
+
+    Runs as a button callback, before the widgets are created again.
+    """
+    restored = history.restore(entry_id)
+    if restored is None:
+        return
+    options, prompt = restored
+    state[option_key("task")] = options.get("task", "")
+    for name, default in OPTION_DEFAULTS.items():
+        value = options.get(name, default)
+        # Text inputs hold "" where the option is None
+        state[option_key(name)] = default if value is None and default == "" else value
+    keep_prompt(state, prompt, sessions)
+    state.prompt_for = prompt_for(state)
+    state.history_restored = True
+    # Makes the preview drop its own option values for the restored ones
+    state.preview_revision = state.get("preview_revision", 0) + 1
+
+def browser_options(state):
+    """
+    Values of the options edited in the preview component.
+    """
+    return {name: state[option_key(name)] for name in BROWSER_OPTIONS}
+
+def prompt_for(state):
+    """
+    The task and preview options a generated prompt belongs to.
+
+    The preview shows the generated prompt instead of its own rendering
+    while its task and options still match.
+    """
+    return {"task": state.get(option_key("task"), ""), "options": browser_options(state)}
+
+def apply_options_event(state, event):
+    """
+    Store the options sent by the preview.
+    """
+    for name in BROWSER_OPTIONS:
+        if name in event["options"]:
+            state[option_key(name)] = event["options"][name]
+
+def apply_generate_event(state, event, generate, history=None, sessions=None):
+    """
+    Store the options sent by the preview, then generate and save the prompt.
+    """
+    apply_options_event(state, event)
+    task = state.get(option_key("task"), "")
+    options = current_options(state)
+    prompt = generate(task=task, **options)
+    keep_prompt(state, prompt, sessions)
+    state.prompt_for = prompt_for(state)
+    if history is not None:
+        # Queued; written by the history's background thread
+        history.record({"task": task, **options}, prompt)
+
+def render_history(st, t, history, sessions=None):
+    """
+    Search box and restore buttons for the prompt history.
+    """
+    with st.expander(t["history"]):
+        query = st.text_input(t["history_search"], key="history_query")
+        entries = history.search(query, limit=10)
+        if not entries:
+            st.caption(t["history_empty"])
+        for entry in entries:
+            col_text, col_button = st.columns([4, 1])
+            uses = f" · {t['history_uses'].format(uses=entry.uses)}" if entry.uses > 1 else ""
+            col_text.caption(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.created))}"
+                             f" · {entry.options.get('language', '')}{uses}  \n{entry.task or '-'}")
+            col_button.button(t["history_restore"], key=f"history_restore_{entry.id}",
+                              on_click=restore_history_entry, args=(st.session_state, history, entry.id, sessions))
+
+def preview_tabs(t):
+    """
+    Option tabs of the preview component, with their labels in the UI language.
+    """
+    not_specified = lambda x: t["not_specified"] if x is None else x
+
+    def flag(name, label):
+        return {"option": name, "label": label, "kind": "flag"}
+
+    def choice(name, label, format_func=not_specified):
+        return {"option": name, "label": label, "kind": "choice",
+                "choices": [[value, format_func(value)] for value in OPTION_CHOICES[name]]}
+
+    return [
+        {"label": t["lang_comm"], "controls": [
+            choice("language", t["response_lang"], str),
+            choice("explanation_detail", t["explanation_detail"], lambda x: t[x]),
+        ]},
+        {"label": t["file_ops"], "controls": [
+            flag("edit_file", t["edit_files"]),
+            flag("generate_file", t["generate_files"]),
+            flag("ban_request", t["ban_requests"]),
+            choice("framework", t["preferred_framework"]),
+            choice("compatibility", t["compatibility"]),
+        ]},
+        {"label": t["code_quality"], "controls": [
+            choice("code_style", t["code_style"]),
+            choice("documentation_level", t["doc_level"]),
+            flag("error_handling", t["error_handling"]),
+            flag("performance_optimization", t["optimize_perf"]),
+            flag("security_check", t["security_check"]),
+        ]},
+        {"label": t["testing_exec"], "controls": [
+            flag("unittest", t["create_tests"]),
+            flag("run", t["executable"]),
+            {"option": "dir", "label": t["dir_check"], "kind": "text"},
+        ]},
+    ]
+
+def render_server_options(st, t):
+    """
+    Widgets of the options whose sections are built from the file system.
+    """
+    if not st.session_state.get("server_files", True):
+        st.caption(t["server_files_disabled"])
+        return
+    st.text_area(t["context_files"], height=68, placeholder="src/**/*.py\nREADME.md",
+                 help=t["context_files_help"], key=option_key("context_files"))
+    st.number_input(t["context_budget"], min_value=0, step=1000, key=option_key("context_budget"))
+    manifest_labels = {
+        None: t["manifest_off"],
+        "files": t["manifest_files"],
+        "snippets": t["manifest_snippets"],
+    }
+    st.selectbox(
+        t["dir_manifest"],
+        options=list(manifest_labels),
+        format_func=manifest_labels.get,
+        key=option_key("dir_manifest")
+    )
+
+@timed_rerun("prompt_panel")
+def render_prompt_panel(st, t, generate, size_slot, history=None, sessions=None):
+    """
+    Task input, options, prompt preview and history.
+
+    Runs as a fragment. The template options are edited in the preview
+    component, which renders the prompt in the browser and sends them back
+    once editing pauses, so the size estimate follows; that, typing a task,
+    changing a server-side option or clicking Generate reruns this panel only. Restoring a history entry
+    reruns the whole app, since it changes the options too.
+
+    With a session manager, every run records the session's activity and
+    state size, and generated prompts are kept as interned PromptRefs.
+    """
+    state = st.session_state
+    if state.pop("history_restored", False):
+        st.rerun()
+
+    # Edited options and Generate clicks in the preview arrive as its new
+    # value; a resync request is answered by prompt_preview itself
+    event = state.get("prompt_preview")
+    if event and "options" in event and event["id"] != state.get("preview_event"):
+        state.preview_event = event["id"]
+        if event.get("edit"):
+            apply_options_event(state, event)
+        else:
+            with phase("generate"):
+                apply_generate_event(state, event, generate, history, sessions)
+
+    col_task, col_options = st.columns([1, 1])
+
+    with col_task:
+        with phase("task_input"):
+            task = st.text_area(t["task_input"], height=80, key=option_key("task"))
+            generated_for = state.get("prompt_for")
+            if generated_for is not None and generated_for["task"] != task:
+                # The prompt can no longer be shown; keep neither it nor its task text
+                discard_prompt(state)
+            st.number_input(t["token_budget"], min_value=0, step=500, value=default_token_budget(),
+                            key="token_budget")
+        with phase("server_options"):
+            render_server_options(st, t)
+        with phase("size_estimate"):
+            render_size_panel(size_slot, t, state)
+        if history is not None:
+            with phase("history"):
+                render_history(st, t, history, sessions)
+
+    with col_options, phase("render_prompt"):
+        server_sections = state.get(option_key("context_files")) or state.get(option_key("dir_manifest"))
+        prompt_preview(
+            task, browser_options(state), state.get("preview_revision", 0), preview_tabs(t),
+            labels={
+                "options_header": t["options_header"],
+                "prompt_header": t["prompt_header"] if state.prompt_generated else t["preview_header"],
+                "generate_button": t["generate_button"],
+                "copy_button": t["copy_button"],
+                "copied": t["copied"],
+                "preview_size": t["preview_size"],
+            },
+            prompt=str(state.prompt) if state.prompt_generated else None,
+            prompt_for=state.get("prompt_for"),
+            note=t["server_sections_note"] if server_sections else None,
+            key="prompt_preview",
+        )
+
+    if sessions is not None:
+        with phase("session_usage"):
+            sessions.touch(current_session_id(), state, close_streamlit_session)
+
+@timed_rerun("app")
+def main():
+    # UI-only dependencies are imported here so that importing this module stays cheap
+    import streamlit as st
+
+    from prompt_cache import cached_generate_prompt
+    from prompt_history import get_default_history
+
+    # Full script runs only happen on session start and UI language changes;
+    # widget interactions rerun their fragment, so the CSS is not resent
+    with phase("css"):
+        st.markdown(COMPACT_CSS, unsafe_allow_html=True)
 
     # Initialize session state for storing the generated prompt and UI language
     if "prompt" not in st.session_state:
         st.session_state.prompt = ""
         st.session_state.prompt_generated = False
 
+    # Option widgets and the preview take their initial values from session
+    # state, so that restoring a history entry can set them before they are created
+    for name, default in OPTION_DEFAULTS.items():
+        st.session_state.setdefault(option_key(name), default)
+
     if "ui_language" not in st.session_state:
         st.session_state.ui_language = "english"
+    st.session_state.server_files = server_files_enabled(st.get_option("server.address"))
 
     # Get translations for the current UI language
     t = translations[st.session_state.ui_language]
 
     # UI Language selector in a small container at the top right
-    with st.container():
+    ui_languages = list(translations)
+    with phase("header"), st.container():
         col1, col2 = st.columns([3, 1])
         with col1:
             st.markdown(f"<h1>{t['title']}</h1>", unsafe_allow_html=True)
         with col2:
-            ui_lang = st.selectbox(
+            # Every label depends on the UI language, so this needs a full rerun;
+            # the callback updates the language before that single rerun
+            st.selectbox(
                 t["ui_language"],
-                options=["english", "chinese"],
-                index=0 if st.session_state.ui_language == "english" else 1,
+                options=ui_languages,
+                index=ui_languages.index(st.session_state.ui_language),
                 key="ui_lang_selector",
-                label_visibility="collapsed"
-            )
-            # Update UI language if changed
-            if ui_lang != st.session_state.ui_language:
-                st.session_state.ui_language = ui_lang
-                st.rerun()
-
-    # Compact layout with task input and options side by side
-    col_task, col_options = st.columns([1, 1])
-
-    with col_task:
-        # Task input in the left column
-        task = st.text_area(t["task_input"], height=80)
-
-        # Generate button below task input
-        generate_button = st.button(t["generate_button"], use_container_width=True)
-
-        # Display the generated prompt if available
-        if st.session_state.prompt_generated:
-            st.subheader(t["prompt_header"])
-            st.code(st.session_state.prompt, language="markdown")
-
-    with col_options:
-        # Options in the right column
-        st.markdown(f"<h3>{t['options_header']}</h3>", unsafe_allow_html=True)
-
-        # Tabs for different option categories to save space
-        tabs = st.tabs([t["lang_comm"], t["file_ops"], t["code_quality"], t["testing_exec"]])
-
-        # Tab 1: Language & Communication
-        with tabs[0]:
-            language = st.radio(
-                t["response_lang"],
-                options=["english", "chinese", "spanish", "french"],
-                index=0,
-                horizontal=True
+                label_visibility="collapsed",
+                on_change=_sync_ui_language,
+                args=(st.session_state,)
             )
 
-            explanation_options = ["minimal", "low", "medium", "high", "comprehensive"]
-            explanation_detail = st.select_slider(
-                t["explanation_detail"],
-                options=explanation_options,
-                value="medium",
-                format_func=lambda x: t.get(x, x)
-            )
-
-        # Tab 2: File Operations
-        with tabs[1]:
-            edit_file = st.checkbox(t["edit_files"], value=False)
-            generate_file = st.checkbox(t["generate_files"], value=True)
-            ban_request = st.checkbox(t["ban_requests"], value=True)
-
-            # Framework & Compatibility in the same tab to save space
-            framework = st.selectbox(
-                t["preferred_framework"],
-                options=[None, "Django", "Flask", "FastAPI", "React", "Vue", "Angular", "TensorFlow", "PyTorch", "Other"],
-                format_func=lambda x: t["not_specified"] if x is None else x
-            )
+    # Live prompt size, updated when the panel reruns
+    size_slot = st.empty()
 
-            compatibility = st.selectbox(
-                t["compatibility"],
-                options=[None, "Python 3.6+", "Python 3.8+", "Python 3.10+", "Cross-browser", "Mobile-friendly", "Other"],
-                format_func=lambda x: t["not_specified"] if x is None else x
-            )
-
-        # Tab 3: Code Quality
-        with tabs[2]:
-            code_style = st.selectbox(
-                t["code_style"],
-                options=[None, "PEP8", "Google", "NumPy", "Microsoft", "Custom"],
-                format_func=lambda x: t["not_specified"] if x is None else x
-            )
+    # Interns prompts across sessions and evicts idle sessions
+    sessions = get_default_manager()
+    register_collector(sessions.metric_lines)
 
-            documentation_level = st.select_slider(
-                t["doc_level"],
-                options=[None, "minimal", "standard", "detailed", "comprehensive"],
-                value=None,
-                format_func=lambda x: t["not_specified"] if x is None else x
-            )
-
-            error_handling = st.checkbox(t["error_handling"], value=False)
-            performance_optimization = st.checkbox(t["optimize_perf"], value=False)
-            security_check = st.checkbox(t["security_check"], value=False)
-
-        # Tab 4: Testing & Execution
-        with tabs[3]:
-            unittest = st.checkbox(t["create_tests"], value=False)
-            run = st.checkbox(t["executable"], value=True)
-
-            dir = st.text_input(t["dir_check"])
-            if dir == "":
-                dir = None
-
-    # Generate prompt when button is clicked
-    if generate_button:
-        # Generate the prompt and store it in session state
-        st.session_state.prompt = generate_prompt(
-            task=task,
-            language=language,
-            edit_file=edit_file,
-            generate_file=generate_file,
-            ban_request=ban_request,
-            unittest=unittest,
-            run=run,
-            dir=dir,
-            code_style=code_style,
-            documentation_level=documentation_level,
-            error_handling=error_handling,
-            performance_optimization=performance_optimization,
-            security_check=security_check,
-            framework=framework,
-            compatibility=compatibility,
-            explanation_detail=explanation_detail
-        )
-        st.session_state.prompt_generated = True
-        st.rerun()  # Rerun to update the UI
-
-    # The prompt is already displayed in the task column when generated
+    # Compact layout with task input and options side by side
+    st.fragment(render_prompt_panel)(st, t, cached_generate_prompt, size_slot, get_default_history(), sessions)
 
 if __name__ == '__main__':
+    # Starts the metrics endpoint on the first run when run.py asked for it
+    configure_from_environment()
     main()
@@ -0,0 +1,524 @@
+"""
+File manifest of a project directory for the Project Specifics section.
+
+Walks the directory with a pool of threads, pruning everything matched by
+.gitignore files, and lists the tree with sizes, languages, line counts and
+optionally the first lines of each file. Line counts and snippets are kept in
+an on-disk index keyed by path, size and mtime, so a re-scan only reads files
+that changed since the last one. Scans stop at a time limit and the listing
+at a size limit; both are reported in the manifest.
+
+The index lives at ~/.cache/prompt_generator/manifest_index.sqlite3 unless
+the PROMPT_MANIFEST_INDEX environment variable names another path.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Environment variable naming the on-disk index database
+INDEX_PATH_ENV = "PROMPT_MANIFEST_INDEX"
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "prompt_generator",
+                                  "manifest_index.sqlite3")
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_SECONDS = 5.0
+# Limit for the rendered manifest, in bytes of UTF-8
+DEFAULT_MAX_BYTES = 64 * 1024
+
+# Files larger than this are listed without a line count
+MAX_COUNTED_SIZE = 8 * 1024 * 1024
+SNIPPET_LINES = 8
+SNIPPET_MAX_CHARS = 600
+
+_READ_CHUNK = 1024 * 1024
+# A NUL byte in the first block marks a file as binary
+_BINARY_PROBE = 8192
+
+# Directories that are never walked, whether ignored or not
+ALWAYS_SKIPPED = frozenset({".git", ".hg", ".svn"})
+
+LANGUAGES = {
+    ".py": "Python", ".pyi": "Python", ".ipynb": "Jupyter",
+    ".js": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript", ".jsx": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript",
+    ".java": "Java", ".kt": "Kotlin", ".scala": "Scala",
+    ".c": "C", ".h": "C", ".cc": "C++", ".cpp": "C++", ".cxx": "C++", ".hpp": "C++",
+    ".cs": "C#", ".go": "Go", ".rs": "Rust", ".rb": "Ruby", ".php": "PHP",
+    ".swift": "Swift", ".m": "Objective-C", ".r": "R", ".lua": "Lua",
+    ".sh": "Shell", ".bash": "Shell", ".ps1": "PowerShell", ".bat": "Batch",
+    ".sql": "SQL", ".html": "HTML", ".htm": "HTML", ".css": "CSS", ".scss": "SCSS",
+    ".vue": "Vue", ".svelte": "Svelte",
+    ".md": "Markdown", ".rst": "reStructuredText", ".txt": "Text",
+    ".json": "JSON", ".yaml": "YAML", ".yml": "YAML", ".toml": "TOML",
+    ".ini": "INI", ".cfg": "INI", ".xml": "XML", ".csv": "CSV",
+}
+
+_SPECIAL_NAMES = {"Dockerfile": "Dockerfile", "Makefile": "Makefile", "CMakeLists.txt": "CMake"}
+
+# One listed file. path is relative to the scanned root with "/" separators;
+# lines and head are None for binary or oversized files.
+FileEntry = namedtuple("FileEntry", "path size language lines head")
+
+def detect_language(name):
+    """
+    Return the language of a file from its name, or None if unknown.
+    """
+    special = _SPECIAL_NAMES.get(name)
+    if special:
+        return special
+    return LANGUAGES.get(os.path.splitext(name)[1].lower())
+
+def _glob_to_regex(pattern):
+    parts = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            parts.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            close = pattern.find("]", index + 1)
+            if close == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[index + 1:close]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                index = close
+        elif char == "\\" and index + 1 < len(pattern):
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return "".join(parts)
+
+class IgnoreRules:
+    """
+    The .gitignore rules in effect for one directory.
+
+    Rules are (regex, negated, directory only, anchored, base) tuples, where
+    base is the directory of the .gitignore relative to the top of the tree.
+    The last matching rule decides, as in git.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = tuple(rules)
+
+    def extended(self, gitignore_path, base):
+        """
+        Return the rules with those of a .gitignore file appended.
+        """
+        try:
+            with open(gitignore_path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return self
+        rules = list(self.rules)
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+            regex = re.compile(f"^{_glob_to_regex(line)}$")
+            rules.append((regex, negated, directory_only, anchored, base))
+        return IgnoreRules(rules)
+
+    def ignored(self, relative_path, name, is_dir):
+        """
+        Return True if the entry at relative_path (from the top) is ignored.
+        """
+        result = False
+        for regex, negated, directory_only, anchored, base in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if anchored:
+                if base:
+                    if not relative_path.startswith(base + "/"):
+                        continue
+                    target = relative_path[len(base) + 1:]
+                else:
+                    target = relative_path
+            else:
+                target = name
+            if regex.match(target):
+                result = not negated
+        return result
+
+class ManifestIndex:
+    """
+    On-disk index of file line counts and snippets, keyed by path.
+
+    An entry is valid while the file keeps the size and mtime it was indexed
+    with. One connection is shared by every thread, since each rerun of the
+    UI runs on a new one, and is used under a lock; writes are batched per
+    scan.
+
+    Parameters:
+    - path: Path of the SQLite database file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        # Held while using the connection
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        # Called with the lock held
+        connection = self._connection
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "lines INTEGER, head TEXT)"
+            )
+            self._connection = connection
+        return connection
+
+    def load(self, root):
+        """
+        Return {absolute path: (size, mtime_ns, lines, head)} for files under root.
+        """
+        prefix = os.path.join(root, "")
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT path, size, mtime_ns, lines, head FROM files WHERE path >= ? AND path < ?",
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)),
+            ).fetchall()
+        return {path: (size, mtime_ns, lines, head) for path, size, mtime_ns, lines, head in rows}
+
+    def store(self, entries, removed=()):
+        """
+        Insert or replace (path, size, mtime_ns, lines, head) rows and delete
+        the removed paths, in one transaction.
+        """
+        if not entries and not removed:
+            return
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, lines, head) VALUES (?, ?, ?, ?, ?)",
+                    entries,
+                )
+                connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+_default_index = None
+
+def get_default_index():
+    """
+    Return the index at PROMPT_MANIFEST_INDEX, or at the default location.
+    """
+    global _default_index
+    path = os.environ.get(INDEX_PATH_ENV) or DEFAULT_INDEX_PATH
+    if _default_index is None or _default_index.path != path:
+        _default_index = ManifestIndex(path)
+    return _default_index
+
+def read_file_info(path, size):
+    """
+    Count the lines of a file and read its first lines.
+
+    Returns:
+    - A tuple (lines, head); both are None for binary files, and lines is
+      None for files over MAX_COUNTED_SIZE
+    """
+    with open(path, "rb") as f:
+        block = f.read(_READ_CHUNK)
+        if b"\0" in block[:_BINARY_PROBE]:
+            return None, None
+        head = block[:SNIPPET_MAX_CHARS * 4].decode("utf-8", "replace")
+        head = "\n".join(head.splitlines()[:SNIPPET_LINES])[:SNIPPET_MAX_CHARS]
+        if size > MAX_COUNTED_SIZE:
+            return None, head
+        lines = 0
+        last = b""
+        while block:
+            lines += block.count(b"\n")
+            last = block
+            block = f.read(_READ_CHUNK)
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return lines, head
+
+class ScanResult:
+    """
+    Outcome of a directory scan.
+
+    Attributes:
+    - root: The scanned directory
+    - files: FileEntry tuples sorted by path
+    - directories: Relative paths of the walked directories
+    - truncated: Reason the scan stopped early, or None
+    - read: Files whose contents were read during this scan
+    - reused: Files whose line counts came from the index
+    - seconds: Duration of the scan
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.files = []
+        self.directories = []
+        self.truncated = None
+        self.read = 0
+        self.reused = 0
+        self.seconds = 0.0
+
+def _join(*parts):
+    return "/".join(part for part in parts if part)
+
+def _repository_rules(root):
+    """
+    Return (rules, prefix) for a scan of root.
+
+    When root is inside a git work tree, the .gitignore files of its parent
+    directories up to the top of the work tree apply too; rule paths are then
+    relative to the top, and prefix is root's path from there.
+    """
+    top = root
+    while not os.path.exists(os.path.join(top, ".git")):
+        parent = os.path.dirname(top)
+        if parent == top:
+            return IgnoreRules(), ""
+        top = parent
+    prefix = os.path.relpath(root, top).replace(os.sep, "/")
+    prefix = "" if prefix == "." else prefix
+    rules = IgnoreRules()
+    parts = prefix.split("/") if prefix else []
+    for depth in range(len(parts)):
+        base = "/".join(parts[:depth])
+        gitignore = os.path.join(top, *parts[:depth], ".gitignore")
+        if os.path.isfile(gitignore):
+            rules = rules.extended(gitignore, base)
+    return rules, prefix
+
+def _scan_one(root, prefix, relative, rules, known, deadline):
+    """
+    List one directory. Runs in a worker thread.
+
+    Returns:
+    - A tuple (files, subdirectories as (relative path, rules), index rows, reused count)
+    """
+    directory = os.path.join(root, *relative.split("/")) if relative else root
+    gitignore = os.path.join(directory, ".gitignore")
+    if os.path.isfile(gitignore):
+        rules = rules.extended(gitignore, _join(prefix, relative))
+
+    files, subdirectories, rows = [], [], []
+    reused = 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files, subdirectories, rows, reused
+    for entry in entries:
+        name = entry.name
+        path = f"{relative}/{name}" if relative else name
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if not is_dir and not entry.is_file(follow_symlinks=False):
+                continue  # Symlinks and special files are not listed
+        except OSError:
+            continue
+        if is_dir and name in ALWAYS_SKIPPED:
+            continue
+        if rules.ignored(_join(prefix, path), name, is_dir):
+            continue
+        if is_dir:
+            subdirectories.append((path, rules))
+            continue
+
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        cached = known.get(entry.path)
+        if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            lines, head = cached[2], cached[3]
+            reused += 1
+        elif time.monotonic() < deadline:
+            try:
+                lines, head = read_file_info(entry.path, stat.st_size)
+            except OSError:
+                lines = head = None
+            rows.append((entry.path, stat.st_size, stat.st_mtime_ns, lines, head))
+        else:
+            lines = head = None  # Out of time: listed without contents
+        files.append(FileEntry(path, stat.st_size, detect_language(name), lines, head))
+    return files, subdirectories, rows, reused
+
+def scan_directory(root, workers=DEFAULT_WORKERS, max_seconds=DEFAULT_MAX_SECONDS, index=None):
+    """
+    Walk a directory tree in parallel, honouring .gitignore files.
+
+    Parameters:
+    - root: Directory to scan
+    - workers: Number of scanning threads
+    - max_seconds: Time limit; when reached, no further directories are
+      walked and unindexed files are listed without line counts
+    - index: ManifestIndex to reuse and update, or None for no index
+
+    Returns:
+    - A ScanResult
+    """
+    start = time.monotonic()
+    deadline = start + max_seconds
+    root = os.path.abspath(root)
+    result = ScanResult(root)
+    known = index.load(root) if index is not None else {}
+    rules, prefix = _repository_rules(root)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_one, root, prefix, "", rules, known, deadline)}
+        result.directories.append("")
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                result.truncated = f"time limit of {max_seconds:g} s reached"
+                for future in pending:
+                    future.cancel()
+                break
+            for future in done:
+                files, subdirectories, new_rows, reused = future.result()
+                result.files.extend(files)
+                rows.extend(new_rows)
+                result.reused += reused
+                for relative, rules in subdirectories:
+                    if time.monotonic() >= deadline:
+                        result.truncated = f"time limit of {max_seconds:g} s reached"
+                        break
+                    result.directories.append(relative)
+                    pending.add(pool.submit(_scan_one, root, prefix, relative, rules, known, deadline))
+
+    if index is not None:
+        removed = ()
+        if result.truncated is None:
+            # Files that were indexed before but are gone or now ignored
+            seen = {os.path.join(root, *entry.path.split("/")) for entry in result.files}
+            removed = known.keys() - seen
+        index.store(rows, removed)
+    result.read = len(rows)
+    result.files.sort(key=lambda entry: entry.path)
+    result.directories.sort()
+    result.seconds = time.monotonic() - start
+    return result
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_manifest(result, snippets=False, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Render a scan as the manifest text embedded in the prompt.
+
+    The summary is always included; the tree is cut off once the text would
+    exceed max_bytes.
+    """
+    languages = {}
+    total_lines = 0
+    for entry in result.files:
+        if entry.language:
+            languages[entry.language] = languages.get(entry.language, 0) + 1
+        total_lines += entry.lines or 0
+    total_size = sum(entry.size for entry in result.files)
+    top = sorted(languages.items(), key=lambda item: (-item[1], item[0]))[:8]
+
+    lines = [
+        "### Directory Manifest",
+        f"{len(result.files)} files, {_format_size(total_size)}, {total_lines} lines"
+        + (f" ({', '.join(f'{name}: {count}' for name, count in top)})" if top else ""),
+    ]
+    if result.truncated:
+        lines.append(f"Scan incomplete: {result.truncated}.")
+    lines.append("")
+    used = sum(len(line.encode("utf-8")) + 1 for line in lines)
+
+    shown_dirs = set()
+    for position, entry in enumerate(result.files):
+        block = []
+        parts = entry.path.split("/")
+        # Print the directories leading to the file the first time they appear
+        for depth in range(len(parts) - 1):
+            directory = "/".join(parts[:depth + 1])
+            if directory not in shown_dirs:
+                shown_dirs.add(directory)
+                block.append(f"{'  ' * depth}{parts[depth]}/")
+        details = [entry.language] if entry.language else []
+        if entry.lines is not None:
+            details.append(f"{entry.lines} lines")
+        details.append(_format_size(entry.size))
+        indent = "  " * (len(parts) - 1)
+        block.append(f"{indent}{parts[-1]} ({', '.join(details)})")
+        if snippets and entry.head:
+            block.append(f"{indent}  ```")
+            block.extend(f"{indent}  {line}" for line in entry.head.splitlines())
+            block.append(f"{indent}  ```")
+
+        size = sum(len(line.encode("utf-8")) + 1 for line in block)
+        if used + size > max_bytes:
+            lines.append(f"... {len(result.files) - position} more files not shown "
+                         f"(manifest limit of {_format_size(max_bytes)})")
+            break
+        lines.extend(block)
+        used += size
+    return "\n".join(lines) + "\n"
+
+def build_manifest(root, snippets=False, workers=DEFAULT_WORKERS, max_seconds=DEFAULT_MAX_SECONDS,
+                   max_bytes=DEFAULT_MAX_BYTES, index=None):
+    """
+    Scan a directory and return its manifest text.
+
+    Parameters:
+    - root: Directory to describe
+    - snippets: Whether to include the first lines of every file
+    - workers, max_seconds: See scan_directory
+    - max_bytes: Size limit of the returned text
+    - index: ManifestIndex to use; defaults to get_default_index()
+
+    Returns:
+    - The manifest text, or a one-line note if root is not a directory
+    """
+    if not os.path.isdir(root):
+        return f"### Directory Manifest\nNot available: {root} is not a directory.\n"
+    result = scan_directory(root, workers=workers, max_seconds=max_seconds,
+                            index=get_default_index() if index is None else index)
+    return format_manifest(result, snippets=snippets, max_bytes=max_bytes)
@@ -0,0 +1,364 @@
+"""
+In-process instrumentation of the UI and the prompt generator.
+
+When enabled, every script run and fragment rerun of the UI, each of its
+phases and every generate_prompt call are timed into histograms that are
+served in the Prometheus text format on a local HTTP endpoint. An optional
+sampling profiler records the call stacks of reruns and keeps the slowest
+ones on disk as folded stacks, ready for flame graph tools.
+
+Instrumentation is off unless the PROMPT_METRICS_PORT environment variable
+is set, which `run.py --metrics-port` does for the Streamlit server. While it
+is off, phase() and rerun() return a shared no-op context manager and
+generate_prompt only checks whether an observer is installed.
+"""
+import functools
+import heapq
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import nullcontext
+
+# Environment variables read by the Streamlit server process
+METRICS_PORT_ENV = "PROMPT_METRICS_PORT"
+SAMPLE_RERUNS_ENV = "PROMPT_SAMPLE_RERUNS"
+SAMPLE_DIR_ENV = "PROMPT_SAMPLE_DIR"
+
+DEFAULT_SAMPLE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "prompt_generator", "profiles")
+SAMPLE_INTERVAL = 0.005
+
+METRICS_PATH = "/metrics"
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the histogram buckets, in seconds
+RERUN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+GENERATE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 1e-3, 0.01, 0.1, 1.0)
+
+_NULL_CONTEXT = nullcontext()
+
+class Histogram:
+    """
+    Prometheus histogram with one optional label.
+
+    Parameters:
+    - name: Metric name
+    - help: Description shown in the exposition
+    - buckets: Increasing upper bounds of the buckets
+    - label: Name of the label observations are split by, if any
+    """
+
+    def __init__(self, name, help, buckets, label=None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        # Label value -> per-bucket counts (the last one is +Inf) and the sum
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value=None):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        """
+        Return the exposition lines of this histogram.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key or "", counts[:], total) for key, (counts, total) in self._series.items())
+        for label_value, counts, total in series:
+            labels = f'{self.label}="{_escape(label_value)}",' if self.label else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels}le="{le}"}} {cumulative}')
+            labels = f"{{{labels[:-1]}}}" if labels else ""
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _folded(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """
+    Samples the stacks of running reruns and keeps the slowest on disk.
+
+    A background thread reads the stack of every thread inside a rerun each
+    interval. When a rerun finishes and is among the `keep` slowest seen, its
+    samples are written to the directory as folded stacks; the file of the
+    rerun it displaces is removed.
+    """
+
+    def __init__(self, keep, directory=DEFAULT_SAMPLE_DIR, interval=SAMPLE_INTERVAL):
+        self.keep = keep
+        self.directory = directory
+        self.interval = interval
+        self._active = {}
+        # Min-heap of (seconds, path) of the kept reruns
+        self._kept = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """
+        Begin sampling the calling thread. Returns False if it already is.
+        """
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id in self._active:
+                return False
+            self._active[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="rerun-sampler", daemon=True)
+                self._thread.start()
+        return True
+
+    def stop(self, scope, seconds):
+        """
+        Stop sampling the calling thread and keep its samples if slow enough.
+
+        Returns:
+        - The path of the written profile, or None
+        """
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+            if not samples or (len(self._kept) >= self.keep and seconds <= self._kept[0][0]):
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory,
+                                f"rerun-{seconds * 1e3:09.1f}ms-{scope}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            heapq.heappush(self._kept, (seconds, path))
+            if len(self._kept) > self.keep:
+                _, evicted = heapq.heappop(self._kept)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+        return path
+
+    def kept(self):
+        """
+        Return (seconds, path) of the kept reruns, slowest first.
+        """
+        with self._lock:
+            return sorted(self._kept, reverse=True)
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_folded(frame)] += 1
+            del frames
+
+class Metrics:
+    """
+    The histograms of one process and the optional profiler.
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.reruns = Histogram("prompt_generator_rerun_seconds",
+                                "Duration of UI script runs and fragment reruns.", RERUN_BUCKETS, "scope")
+        self.phases = Histogram("prompt_generator_phase_seconds",
+                                "Duration of the phases of a UI run.", RERUN_BUCKETS, "phase")
+        self.generate = Histogram("prompt_generator_generate_seconds",
+                                  "Duration of generate_prompt calls.", GENERATE_BUCKETS)
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for histogram in (self.reruns, self.phases, self.generate):
+            lines.extend(histogram.render())
+        if self.profiler is not None:
+            lines.append("# HELP prompt_generator_profiled_rerun_seconds Duration of the kept slowest reruns.")
+            lines.append("# TYPE prompt_generator_profiled_rerun_seconds gauge")
+            for seconds, path in self.profiler.kept():
+                lines.append(f'prompt_generator_profiled_rerun_seconds{{file="{_escape(path)}"}} {seconds!r}')
+        for collect in _collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+class _Timer:
+    __slots__ = ("histogram", "label", "start")
+
+    def __init__(self, histogram, label):
+        self.histogram = histogram
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.label)
+
+class _RerunTimer(_Timer):
+    __slots__ = ("profiler", "sampling")
+
+    def __init__(self, histogram, label, profiler):
+        super().__init__(histogram, label)
+        self.profiler = profiler
+        self.sampling = False
+
+    def __enter__(self):
+        # Only the outermost rerun of a thread is sampled
+        self.sampling = self.profiler is not None and self.profiler.start()
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.histogram.observe(seconds, self.label)
+        if self.sampling:
+            self.profiler.stop(self.label, seconds)
+
+_metrics = None
+_configured = False
+_server = None
+# Functions returning extra exposition lines, e.g. the session gauges
+_collectors = []
+
+def enable(port=None, sample_reruns=0, sample_dir=DEFAULT_SAMPLE_DIR):
+    """
+    Turn instrumentation on for this process.
+
+    Parameters:
+    - port: Serve the metrics on http://127.0.0.1:port/metrics (None: no endpoint)
+    - sample_reruns: Keep stack samples of this many slowest reruns (0: no profiler)
+    - sample_dir: Directory the profiles are written to
+
+    Returns:
+    - The Metrics instance
+    """
+    import prompt_core
+
+    global _metrics, _server
+    if _metrics is None:
+        profiler = SamplingProfiler(sample_reruns, sample_dir) if sample_reruns > 0 else None
+        _metrics = Metrics(profiler)
+        prompt_core.set_generate_observer(_metrics.generate.observe)
+    if port is not None and _server is None:
+        _server = _start_server(port, _metrics)
+    return _metrics
+
+def disable():
+    """
+    Turn instrumentation off and stop the endpoint.
+    """
+    import prompt_core
+
+    global _metrics, _server
+    prompt_core.set_generate_observer(None)
+    _metrics = None
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+def configure_from_environment():
+    """
+    Enable instrumentation if PROMPT_METRICS_PORT is set; only acts once.
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        enable(int(port), int(os.environ.get(SAMPLE_RERUNS_ENV) or 0),
+               os.environ.get(SAMPLE_DIR_ENV) or DEFAULT_SAMPLE_DIR)
+
+def get_metrics():
+    """
+    Return the Metrics instance, or None while instrumentation is off.
+    """
+    return _metrics
+
+def register_collector(collect):
+    """
+    Add a function returning exposition lines to every metrics scrape.
+
+    Registering the same function again has no effect.
+    """
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+def phase(name):
+    """
+    Context manager timing one phase of a UI run.
+    """
+    if _metrics is None:
+        return _NULL_CONTEXT
+    return _Timer(_metrics.phases, name)
+
+def rerun(scope):
+    """
+    Context manager timing a script run ("app") or fragment rerun, and
+    sampling it when the profiler is on.
+    """
+    if _metrics is None:
+        return _NULL_CONTEXT
+    return _RerunTimer(_metrics.reruns, scope, _metrics.profiler)
+
+def timed_rerun(scope):
+    """
+    Decorator running a function inside rerun(scope), e.g. a fragment.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with rerun(scope):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _start_server(port, metrics):
+    # Imported here so the launcher can read this module's settings cheaply
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != METRICS_PATH:
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", _CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    return server
@@ -0,0 +1,277 @@
+"""
+Cross-process cache of generated prompts.
+
+Prompts are stored in a small SQLite database opened with memory-mapped I/O,
+so every Streamlit, batch or server process on the host shares the same
+entries. Keys are derived from the normalized options of generate_prompt;
+the task text is hashed and never stored as part of the key. The store is
+bounded by a byte budget and evicts least recently used entries.
+
+Enable it for the UI, batch CLI and HTTP service by setting the
+PROMPT_CACHE_PATH environment variable to the database path.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from prompt_core import generate_prompt
+
+# Environment variable naming the shared cache database
+CACHE_PATH_ENV = "PROMPT_CACHE_PATH"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_TASK_SIZE = 1024 * 1024
+
+# Eviction frees space down to this fraction of the budget
+_EVICTION_TARGET = 0.9
+
+_SIGNATURE = inspect.signature(generate_prompt)
+_BOOLEAN_OPTIONS = frozenset(
+    name for name, param in _SIGNATURE.parameters.items() if isinstance(param.default, bool)
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    key TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompts_last_used ON prompts (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('total_size', 0);
+"""
+
+def cache_key(options):
+    """
+    Derive the cache key for a set of generate_prompt options.
+
+    Options are bound to the generate_prompt signature so defaults map to
+    the same key as the values they stand for. Only values that render
+    identically share a key: flags by truth value and tasks by their text;
+    every other option is keyed on its exact value.
+
+    Parameters:
+    - options: Keyword arguments for generate_prompt
+
+    Returns:
+    - A hex digest, or None if the options cannot be keyed
+    """
+    try:
+        bound = _SIGNATURE.bind(**options)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+
+    normalized = []
+    for name, value in bound.arguments.items():
+        if name in ("dir_manifest", "context_files") and value:
+            # Manifests and attached files reflect the file system, not just the options
+            return None
+        if name == "context_budget":
+            # Only applies to context files, and prompts with files bypass the cache
+            continue
+        if name == "task":
+            value = hashlib.sha256(str(value or "").encode("utf-8")).hexdigest()
+        elif name in _BOOLEAN_OPTIONS:
+            value = bool(value)
+        elif value is not None and not isinstance(value, (str, int, float)):
+            # Only JSON scalars are keyed; anything else bypasses the cache
+            return None
+        normalized.append(value)
+    return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+class PromptCache:
+    """
+    Size-bounded LRU cache of prompts shared between processes.
+
+    Each process opens its own connection to the shared database, used by
+    all its threads in turn (Streamlit runs every rerun on a new thread); the
+    hit/miss/eviction counters are per process.
+
+    Parameters:
+    - path: Path of the SQLite database file
+    - max_bytes: Budget for the stored prompts, in bytes
+    - max_task_size: Tasks longer than this (in characters) bypass the cache
+    - touch_interval: Minimum seconds between recency updates of one entry
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, max_task_size=DEFAULT_MAX_TASK_SIZE,
+                 touch_interval=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_task_size = max_task_size
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self._connection = None
+        self._pid = None
+        # Held while using the connection
+        self._lock = threading.RLock()
+
+    def _locked(self):
+        if self._pid is not None and self._pid != os.getpid():
+            # A lock held by another thread at fork time stays held in the child
+            self._lock = threading.RLock()
+        return self._lock
+
+    def _connect(self):
+        # Called with the lock held. Connections are not shared across fork,
+        # so reopen in child processes
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={max(self.max_bytes * 2, 1 << 24)}")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get(self, key):
+        """
+        Return the cached prompt for key, or None.
+        """
+        with self._locked():
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT prompt, last_used FROM prompts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            prompt, last_used = row
+            now = time.time()
+            # Approximate LRU: refresh recency at most once per touch_interval
+            if now - last_used > self.touch_interval:
+                connection.execute("UPDATE prompts SET last_used = ? WHERE key = ?", (now, key))
+            return prompt
+
+    def put(self, key, prompt):
+        """
+        Store a prompt, evicting least recently used entries over the budget.
+        """
+        size = len(prompt.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._locked():
+            self._put(self._connect(), key, prompt, size)
+
+    def _put(self, connection, key, prompt, size):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            old = connection.execute("SELECT size FROM prompts WHERE key = ?", (key,)).fetchone()
+            delta = size - (old[0] if old else 0)
+            connection.execute(
+                "INSERT OR REPLACE INTO prompts (key, prompt, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, prompt, size, time.time()))
+            connection.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'total_size'", (delta,))
+            total = connection.execute(
+                "SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(connection, total)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection, total):
+        target = self.max_bytes * _EVICTION_TARGET
+        freed = 0
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM prompts ORDER BY last_used"):
+            if total - freed <= target:
+                break
+            evicted.append((key,))
+            freed += size
+        connection.executemany("DELETE FROM prompts WHERE key = ?", evicted)
+        connection.execute("UPDATE meta SET value = value - ? WHERE name = 'total_size'", (freed,))
+        self.evictions += len(evicted)
+
+    def generate(self, **options):
+        """
+        Drop-in replacement for generate_prompt that consults the cache.
+        """
+        task = options.get("task") or ""
+        if not isinstance(task, str):
+            task = str(task)
+        key = cache_key(options) if len(task) <= self.max_task_size else None
+        if key is None:
+            self.bypassed += 1
+            return generate_prompt(**options)
+
+        prompt = self.get(key)
+        if prompt is None:
+            prompt = generate_prompt(**options)
+            self.put(key, prompt)
+        return prompt
+
+    def stats(self):
+        """
+        Return the counters of this process and the shared store usage.
+        """
+        with self._locked():
+            connection = self._connect()
+            entries = connection.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+            total = connection.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bypassed": self.bypassed,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        """
+        Remove every entry from the shared store.
+        """
+        with self._locked():
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM prompts")
+            connection.execute("UPDATE meta SET value = 0 WHERE name = 'total_size'")
+            connection.execute("COMMIT")
+
+    def close(self):
+        with self._locked():
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+_default_cache = None
+
+def get_default_cache():
+    """
+    Return the cache configured through PROMPT_CACHE_PATH, or None if unset.
+    """
+    global _default_cache
+    path = os.environ.get(CACHE_PATH_ENV)
+    if not path:
+        return None
+    if _default_cache is None or _default_cache.path != path:
+        _default_cache = PromptCache(path)
+    return _default_cache
+
+def cached_generate_prompt(**options):
+    """
+    Generate a prompt through the default cache when one is configured.
+    """
+    cache = get_default_cache()
+    if cache is None:
+        return generate_prompt(**options)
+    return cache.generate(**options)
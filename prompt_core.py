@@ -0,0 +1,429 @@
+"""
+Core prompt generation, independent of the Streamlit UI.
+
+Holds the compiled prompt template engine and exposes the UI translation
+catalogs. This module only uses the standard library so that CLI, batch and
+service callers can import generate_prompt without paying for a Streamlit
+import.
+"""
+from functools import lru_cache
+from time import perf_counter
+
+# UI translations, loaded lazily per language from the locales directory
+from i18n import translations  # noqa: F401
+
+# Compiled prompt template engine
+# The prompt is built from a fixed sequence of sections. Sections that only
+# depend on boolean flags are precomputed once into tables indexed by a
+# bitmask, enum-like options are looked up by index, and sections that embed
+# free-form option values are memoized so repeated option sets are cheap.
+
+# Bits of the option bitmask
+FLAG_EDIT_FILE = 1 << 0
+FLAG_NO_GENERATE_FILE = 1 << 1
+FLAG_BAN_REQUEST = 1 << 2
+FLAG_PERFORMANCE = 1 << 3
+FLAG_SECURITY = 1 << 4
+FLAG_UNITTEST = 1 << 5
+FLAG_RUN = 1 << 6
+
+# Response languages, in enum index order (english adds no instruction)
+RESPONSE_LANGUAGES = ("english", "chinese", "spanish", "french")
+_LANGUAGE_INDEX = {name: index for index, name in enumerate(RESPONSE_LANGUAGES)}
+
+# The text of every section, in prompt order. The engine below compiles its
+# tables and memoized builders from these definitions, and template_spec()
+# exports them for the browser preview, which renders them with the same
+# rules (components/prompt_preview/prompt_template.js):
+# - "choice": the text for the option's value, or for the default value
+# - "lines": each line whose option is set (not set for "negate", any other
+#   value than "unless" when given), with "{}" replaced by the value; the
+#   header goes before the lines when at least one is included
+PROMPT_TEMPLATE = (
+    {"type": "lines", "header": "", "lines": (
+        {"option": "task", "format": "Task: {}\n\n"},
+    )},
+    {"type": "choice", "option": "language", "default": "english", "values": {
+        "english": "",
+        "chinese": "请使用中文回答。\n\n",
+        "spanish": "Por favor, responde en español.\n\n",
+        "french": "Veuillez répondre en français.\n\n",
+    }},
+    {"type": "lines", "header": "", "lines": (
+        {"option": "explanation_detail", "unless": "medium",
+         "format": "Please provide {} level of detail in your explanations.\n"},
+    )},
+    {"type": "lines", "header": "## File Operations\n", "lines": (
+        {"option": "edit_file", "format": "You are allowed to edit existing files.\n"},
+        {"option": "generate_file", "negate": True, "format": "You are NOT allowed to generate new files.\n"},
+        {"option": "ban_request",
+         "format": "Please do not make any external API calls or access external resources.\n"},
+    )},
+    {"type": "lines", "header": "\n## Code Quality & Style\n", "lines": (
+        {"option": "code_style", "format": "Please follow {} style guidelines.\n"},
+        {"option": "documentation_level", "format": "Include {} level of documentation in the code.\n"},
+        {"option": "error_handling", "format": "Implement proper error handling and validation.\n"},
+    )},
+    {"type": "lines", "header": "\n## Performance & Security\n", "lines": (
+        {"option": "performance_optimization", "format": "Optimize the code for performance.\n"},
+        {"option": "security_check", "format": "Include security best practices and considerations.\n"},
+    )},
+    {"type": "lines", "header": "\n## Framework & Compatibility\n", "lines": (
+        {"option": "framework", "format": "Use {} framework.\n"},
+        {"option": "compatibility", "format": "Ensure compatibility with {}.\n"},
+    )},
+    {"type": "lines", "header": "\n## Testing & Execution\n", "lines": (
+        {"option": "unittest", "format": "Please create unit tests for the code.\n"},
+        {"option": "run", "format": "Please run the tests after generation without modifying existing tests.\n"},
+    )},
+    {"type": "lines", "header": "", "lines": (
+        {"option": "dir", "format": "\n## Project Specifics\nPlease check the following directory: {}\n"},
+    )},
+)
+(_TASK, _LANGUAGE, _EXPLANATION, _FILE_OPS, _CODE_QUALITY,
+ _PERF_SECURITY, _FRAMEWORK, _TESTING, _PROJECT) = PROMPT_TEMPLATE
+
+def _render_lines(section, values):
+    """
+    Render a "lines" section of PROMPT_TEMPLATE for one value per line.
+    """
+    text = ""
+    for line, value in zip(section["lines"], values):
+        if "unless" in line:
+            included = value != line["unless"]
+        else:
+            included = not value if line.get("negate") else bool(value)
+        if included:
+            text += line["format"].format(value)
+    return section["header"] + text if text else ""
+
+def template_spec():
+    """
+    Return PROMPT_TEMPLATE as JSON-serializable data for the browser preview.
+
+    Returns:
+    - A dict with the "sections" and the generate_prompt "defaults" of the
+      options they use
+    """
+    sections = []
+    options = []
+    for section in PROMPT_TEMPLATE:
+        section = dict(section)
+        if "lines" in section:
+            section["lines"] = [dict(line) for line in section["lines"]]
+            options.extend(line["option"] for line in section["lines"])
+        else:
+            section["values"] = dict(section["values"])
+            options.append(section["option"])
+        sections.append(section)
+    code = generate_prompt.__code__
+    defaults = dict(zip(code.co_varnames[:code.co_argcount], generate_prompt.__defaults__))
+    return {"sections": sections, "defaults": {name: defaults[name] for name in options}}
+
+# Text around the task and the directory; the task is embedded between its
+# prefix and suffix without formatting it into a copy
+_TASK_PREFIX, _TASK_SUFFIX = _TASK["lines"][0]["format"].split("{}")
+_PROJECT_PREFIX, _PROJECT_SUFFIX = _PROJECT["lines"][0]["format"].split("{}")
+_LANGUAGE_FRAGMENTS = tuple(_LANGUAGE["values"][name] for name in RESPONSE_LANGUAGES)
+
+def _compile_block(section):
+    """
+    Build the table of fragments for a section made only of flag lines.
+
+    Parameters:
+    - section: "lines" section of PROMPT_TEMPLATE
+
+    Returns:
+    - A tuple indexed by the local bitmask of the section, where the n-th
+      bit is set when the n-th line is included
+    """
+    table = []
+    for mask in range(1 << len(section["lines"])):
+        # The value of each line that includes it, or excludes it when negated
+        values = [bool(mask & (1 << bit)) != bool(line.get("negate"))
+                  for bit, line in enumerate(section["lines"])]
+        table.append(_render_lines(section, values))
+    return tuple(table)
+
+_FILE_OPS_FRAGMENTS = _compile_block(_FILE_OPS)
+_PERF_SECURITY_FRAGMENTS = _compile_block(_PERF_SECURITY)
+_TESTING_FRAGMENTS = _compile_block(_TESTING)
+
+def _cached(func, *args):
+    """
+    Call a memoized section builder, bypassing the cache for unhashable values.
+    """
+    try:
+        return func(*args)
+    except TypeError:
+        return func.__wrapped__(*args)
+
+@lru_cache(maxsize=256, typed=True)
+def _explanation_fragment(explanation_detail):
+    return _render_lines(_EXPLANATION, (explanation_detail,))
+
+@lru_cache(maxsize=1024, typed=True)
+def _code_quality_fragment(code_style, documentation_level, error_handling):
+    return _render_lines(_CODE_QUALITY, (code_style, documentation_level, error_handling))
+
+@lru_cache(maxsize=1024, typed=True)
+def _framework_fragment(framework, compatibility):
+    return _render_lines(_FRAMEWORK, (framework, compatibility))
+
+# Memoized option bodies, keyed by the normalized option tuple
+_BODY_CACHE = {}
+_BODY_CACHE_SIZE = 4096
+
+def _options_body(mask, language, explanation_detail, code_style,
+                  documentation_level, error_handling, framework, compatibility):
+    """
+    Join every option section except the task and the directory.
+    """
+    # Unknown languages add no instruction, same as english
+    language_index = _LANGUAGE_INDEX.get(language, 0) if isinstance(language, str) else 0
+    return "".join((
+        _LANGUAGE_FRAGMENTS[language_index],
+        _cached(_explanation_fragment, explanation_detail),
+        _FILE_OPS_FRAGMENTS[mask & 0b111],
+        _cached(_code_quality_fragment, code_style, documentation_level, error_handling),
+        _PERF_SECURITY_FRAGMENTS[(mask >> 3) & 0b11],
+        _cached(_framework_fragment, framework, compatibility),
+        _TESTING_FRAGMENTS[(mask >> 5) & 0b11],
+    ))
+
+def _is_cacheable(values):
+    # Only text keys are stored, so 1 and True can never share a cache entry
+    return all(value is None or type(value) is str for value in values)
+
+def _prompt_body(language, edit_file, generate_file, ban_request, unittest, run,
+                 code_style, documentation_level, error_handling,
+                 performance_optimization, security_check, framework,
+                 compatibility, explanation_detail):
+    mask = ((FLAG_EDIT_FILE if edit_file else 0)
+            | (0 if generate_file else FLAG_NO_GENERATE_FILE)
+            | (FLAG_BAN_REQUEST if ban_request else 0)
+            | (FLAG_PERFORMANCE if performance_optimization else 0)
+            | (FLAG_SECURITY if security_check else 0)
+            | (FLAG_UNITTEST if unittest else 0)
+            | (FLAG_RUN if run else 0))
+    key = (mask, language, explanation_detail, code_style or None,
+           documentation_level or None, bool(error_handling), framework or None,
+           compatibility or None)
+    try:
+        body = _BODY_CACHE.get(key)
+    except TypeError:  # Unhashable option values are never cached
+        return _options_body(*key)
+    if body is None:
+        body = _options_body(*key)
+        if _is_cacheable(key[1:5]) and _is_cacheable(key[6:]):
+            if len(_BODY_CACHE) >= _BODY_CACHE_SIZE:
+                _BODY_CACHE.clear()
+            _BODY_CACHE[key] = body
+    return body
+
+# Values of dir_manifest that embed a file manifest of dir
+MANIFEST_MODES = ("files", "snippets")
+
+def _directory_section(dir, dir_manifest):
+    section = f"{_PROJECT_PREFIX}{dir}{_PROJECT_SUFFIX}"
+    if not dir_manifest:
+        return section
+    if dir_manifest not in MANIFEST_MODES:
+        raise ValueError(f"Unknown dir_manifest mode: {dir_manifest!r}")
+    # Imported on demand: the manifest reads the file system and is opt-in
+    from manifest import build_manifest
+    return section + "\n" + build_manifest(dir, snippets=dir_manifest == "snippets")
+
+def _context_section(context_files, context_budget, dir):
+    # Imported on demand like the manifest; relative paths resolve against dir
+    from context_files import collect_context
+    return collect_context(context_files, base_dir=dir,
+                           max_tokens=int(context_budget) if context_budget else None)
+
+def _prompt_parts(task, dir, body, dir_manifest=None):
+    # Add the task and the Project Specifics section around the option body;
+    # a task that is not a string is formatted like the f-string used to be
+    if task and not isinstance(task, str):
+        task = str(task)
+    if task and dir:
+        return (_TASK_PREFIX, task, _TASK_SUFFIX, body, _directory_section(dir, dir_manifest))
+    if task:
+        return (_TASK_PREFIX, task, _TASK_SUFFIX, body)
+    if dir:
+        return (body, _directory_section(dir, dir_manifest))
+    return (body,)
+
+# The prompt as an ordered sequence of sections, for callers that build many
+# prompts sharing a prefix (see prompt_matrix). Each entry is (option names,
+# builder); the builder returns the section text for the values of those
+# options, normalized the same way generate_prompt normalizes them. An option
+# may feed more than one section: context files resolve against dir.
+def _task_section(task):
+    return _render_lines(_TASK, (task,))
+
+def _language_section(language):
+    return _LANGUAGE_FRAGMENTS[_LANGUAGE_INDEX.get(language, 0) if isinstance(language, str) else 0]
+
+def _explanation_section(explanation_detail):
+    return _cached(_explanation_fragment, explanation_detail)
+
+def _file_ops_section(edit_file, generate_file, ban_request):
+    return _FILE_OPS_FRAGMENTS[(FLAG_EDIT_FILE if edit_file else 0)
+                               | (0 if generate_file else FLAG_NO_GENERATE_FILE)
+                               | (FLAG_BAN_REQUEST if ban_request else 0)]
+
+def _code_quality_section(code_style, documentation_level, error_handling):
+    return _cached(_code_quality_fragment, code_style or None,
+                   documentation_level or None, bool(error_handling))
+
+def _perf_security_section(performance_optimization, security_check):
+    return _PERF_SECURITY_FRAGMENTS[(1 if performance_optimization else 0)
+                                    | (2 if security_check else 0)]
+
+def _framework_section(framework, compatibility):
+    return _cached(_framework_fragment, framework or None, compatibility or None)
+
+def _testing_section(unittest, run):
+    return _TESTING_FRAGMENTS[(1 if unittest else 0) | (2 if run else 0)]
+
+def _project_section(dir, dir_manifest):
+    return _directory_section(dir, dir_manifest) if dir else ""
+
+def _context_files_section(context_files, context_budget, dir):
+    return _context_section(context_files, context_budget, dir).text() if context_files else ""
+
+PROMPT_SECTIONS = (
+    (("task",), _task_section),
+    (("language",), _language_section),
+    (("explanation_detail",), _explanation_section),
+    (("edit_file", "generate_file", "ban_request"), _file_ops_section),
+    (("code_style", "documentation_level", "error_handling"), _code_quality_section),
+    (("performance_optimization", "security_check"), _perf_security_section),
+    (("framework", "compatibility"), _framework_section),
+    (("unittest", "run"), _testing_section),
+    (("dir", "dir_manifest"), _project_section),
+    (("context_files", "context_budget", "dir"), _context_files_section),
+)
+
+def iter_prompt(task="", language="english", edit_file=False, generate_file=False,
+                ban_request=False, unittest=False, run=False, dir=None,
+                code_style=None, documentation_level=None, error_handling=False,
+                performance_optimization=False, security_check=False,
+                framework=None, compatibility=None, explanation_detail="medium",
+                dir_manifest=None, context_files=None, context_budget=None, *,
+                chunk_size=None):
+    """
+    Generate an AI prompt as a sequence of string chunks.
+
+    Takes the same options as generate_prompt. The task is yielded as is, or
+    as slices of chunk_size characters, so no intermediate string holding a
+    copy of it is built; joining the chunks gives generate_prompt's result.
+    The options are applied when iteration starts. Context files are decoded
+    from their memory mapping one chunk at a time.
+
+    Parameters:
+    - chunk_size: Maximum length of the task and file chunks (default: whole
+      task, whole files)
+
+    Yields:
+    - Consecutive pieces of the prompt
+    """
+    parts = _prompt_parts(task, dir, _prompt_body(
+        language, edit_file, generate_file, ban_request, unittest, run,
+        code_style, documentation_level, error_handling, performance_optimization,
+        security_check, framework, compatibility, explanation_detail,
+    ), dir_manifest)
+    for part in parts:
+        if chunk_size is None or len(part) <= chunk_size:
+            yield part
+        else:
+            for start in range(0, len(part), chunk_size):
+                yield part[start:start + chunk_size]
+    if context_files:
+        yield from _context_section(context_files, context_budget, dir).chunks(chunk_size)
+
+# Task slice length used when writing to a stream; bounds the encoder's buffers
+WRITE_CHUNK_SIZE = 1 << 20
+
+def write_prompt(stream, chunk_size=WRITE_CHUNK_SIZE, **options):
+    """
+    Write an AI prompt to a text stream without building it in memory.
+
+    Parameters:
+    - stream: Object with a write(str) method, e.g. a file opened in text mode
+    - chunk_size: Maximum length of each task chunk written
+    - options: The options of generate_prompt
+
+    Returns:
+    - The number of characters written
+    """
+    written = 0
+    for chunk in iter_prompt(chunk_size=chunk_size, **options):
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+# Called with the duration of every generate_prompt call; set by metrics
+_generate_observer = None
+
+def set_generate_observer(observer):
+    """
+    Install a callable receiving the seconds taken by each generate_prompt
+    call, or None to stop timing them.
+    """
+    global _generate_observer
+    _generate_observer = observer
+
+def generate_prompt(task="", language="english", edit_file=False, generate_file=False, 
+                   ban_request=False, unittest=False, run=False, dir=None,
+                   code_style=None, documentation_level=None, error_handling=False,
+                   performance_optimization=False, security_check=False, 
+                   framework=None, compatibility=None, explanation_detail="medium",
+                   dir_manifest=None, context_files=None, context_budget=None):
+    """
+    Generate an AI prompt based on the selected options.
+
+    Parameters:
+    - task: The specific task for the AI
+    - language: Language for the response (english, chinese, spanish, french)
+    - edit_file: Whether to allow AI to edit files
+    - generate_file: Whether to allow AI to generate files
+    - ban_request: Whether to ban certain requests
+    - unittest: Whether to create a unittest
+    - run: Whether to run tests after generation without modifying existing tests
+    - dir: Directory to be checked
+    - code_style: Preferred code style (PEP8, Google, etc.)
+    - documentation_level: Level of documentation required
+    - error_handling: Whether to include error handling
+    - performance_optimization: Whether to optimize for performance
+    - security_check: Whether to include security considerations
+    - framework: Preferred framework to use
+    - compatibility: Compatibility requirements
+    - explanation_detail: Level of detail in explanations
+    - dir_manifest: Embed a manifest of dir: "files" (tree, sizes, languages,
+      line counts) or "snippets" (also the first lines of each file)
+    - context_files: Paths or glob patterns of files to append as fenced
+      blocks in a Context Files section, in priority order (a list, or one per
+      line in a string); relative paths are resolved against dir
+    - context_budget: Token budget for the context files, on top of their
+      256 KB byte budget
+
+    Returns:
+    - A formatted prompt string
+    """
+    observer = _generate_observer
+    if observer is not None:
+        start = perf_counter()
+    # Same parts iter_prompt streams; one join copies the task once, straight
+    # into the result
+    parts = _prompt_parts(task, dir, _prompt_body(
+        language, edit_file, generate_file, ban_request, unittest, run,
+        code_style, documentation_level, error_handling, performance_optimization,
+        security_check, framework, compatibility, explanation_detail,
+    ), dir_manifest)
+    if context_files:
+        parts += tuple(_context_section(context_files, context_budget, dir).chunks())
+    prompt = "".join(parts)
+    if observer is not None:
+        observer(perf_counter() - start)
+    return prompt
@@ -0,0 +1,451 @@
+"""
+Persistent, searchable history of generated prompts.
+
+Every prompt generated in the UI is recorded in a local SQLite database with
+its task and options. Task and prompt text are indexed with FTS5 and the
+option values are stored in indexed columns, so the history can be searched
+by text and filtered by option as it grows. Regenerating a prompt that is
+already stored moves it to the top instead of adding a copy.
+
+Writes go through a queue to a background thread, so recording never blocks
+the caller. The same thread applies the retention policy (maximum age,
+number of entries and total size) and compacts the full-text index. A history
+opens two connections, one for writes and one for reads, shared by every
+thread behind a lock each: Streamlit runs every rerun on a new thread.
+
+The history lives at ~/.cache/prompt_generator/history.sqlite3 unless the
+PROMPT_HISTORY_PATH environment variable names another path; set it to "off"
+to disable recording.
+"""
+import atexit
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# Environment variable naming the history database, or "off"
+HISTORY_PATH_ENV = "PROMPT_HISTORY_PATH"
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "prompt_generator",
+                                    "history.sqlite3")
+
+# Retention policy
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_AGE_DAYS = 180
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Prompts larger than this (in bytes of UTF-8) are not recorded
+DEFAULT_MAX_PROMPT_SIZE = 1024 * 1024
+
+# Writes waiting for the background thread; further records are dropped
+QUEUE_SIZE = 1000
+# Records written per transaction, at most
+_BATCH_SIZE = 256
+# Written records between two retention passes
+_COMPACT_EVERY = 1000
+# Work done per incremental merge of the full-text index
+_MERGE_PAGES = 500
+
+# Options stored in their own indexed columns; boolean options are stored as
+# bits of the flags column, in signature order of generate_prompt
+TEXT_OPTIONS = ("language", "explanation_detail", "framework", "compatibility",
+                "code_style", "documentation_level", "dir", "dir_manifest")
+FLAG_OPTIONS = ("edit_file", "generate_file", "ban_request", "unittest", "run",
+                "error_handling", "performance_optimization", "security_check")
+
+# Characters of the task returned with search results
+PREVIEW_CHARS = 200
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    digest BLOB NOT NULL UNIQUE,
+    uses INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    options TEXT NOT NULL,
+    {", ".join(f"{name} TEXT" for name in TEXT_OPTIONS)},
+    flags INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_created ON history (created);
+CREATE INDEX IF NOT EXISTS history_flags ON history (flags);
+{"".join(f"CREATE INDEX IF NOT EXISTS history_{name} ON history ({name});" for name in TEXT_OPTIONS)}
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    task, prompt, content='history', content_rowid='id', prefix='2 3'
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('total_size', 0);
+CREATE TRIGGER IF NOT EXISTS history_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, task, prompt) VALUES (new.id, new.task, new.prompt);
+    UPDATE meta SET value = value + new.size WHERE name = 'total_size';
+END;
+CREATE TRIGGER IF NOT EXISTS history_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, task, prompt)
+    VALUES ('delete', old.id, old.task, old.prompt);
+    UPDATE meta SET value = value - old.size WHERE name = 'total_size';
+END;
+"""
+
+_INSERT = (
+    f"INSERT INTO history (created, digest, uses, size, task, prompt, options, "
+    f"{', '.join(TEXT_OPTIONS)}, flags) VALUES ({', '.join('?' * (len(TEXT_OPTIONS) + 8))})"
+)
+
+# Terms as the FTS5 unicode61 tokenizer splits them
+_TERM_RE = re.compile(r"[^\W_]+")
+
+# One search result. task is a preview of at most PREVIEW_CHARS characters
+# and options holds every option except the task.
+HistoryEntry = namedtuple("HistoryEntry", "id created task options size uses")
+
+def fts_query(text, prefix=False):
+    """
+    Turn free text into an FTS5 query matching every term.
+
+    Terms are quoted, so FTS5 operators in the text are not applied.
+
+    Parameters:
+    - prefix: Match the last term as a prefix, for text that is still being typed
+
+    Returns:
+    - The query, or None if the text has no searchable terms
+    """
+    terms = _TERM_RE.findall(text)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + ("*" if prefix else "")
+
+def _flags(options):
+    return sum(1 << bit for bit, name in enumerate(FLAG_OPTIONS) if options.get(name))
+
+class PromptHistory:
+    """
+    Prompt history stored in SQLite, written by a background thread.
+
+    Parameters:
+    - path: Path of the SQLite database file
+    - max_entries: Entries kept, newest first (None: no limit)
+    - max_age_days: Entries older than this are removed (None: no limit)
+    - max_bytes: Budget for the stored prompts, in bytes (None: no limit)
+    - max_prompt_size: Prompts larger than this are not recorded
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 max_bytes=DEFAULT_MAX_BYTES, max_prompt_size=DEFAULT_MAX_PROMPT_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.max_prompt_size = max_prompt_size
+        self.recorded = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.last_error = None
+        self._connections = {}
+        # Held while using the connection of the same role
+        self._read_lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._writer = None
+        self._lock = threading.Lock()
+        self._since_compact = _COMPACT_EVERY
+
+    def _connect(self, role):
+        # Called with the lock of the role held
+        connection = self._connections.get(role)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            # Only takes effect on a new database, before the first table
+            connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connections[role] = connection
+        return connection
+
+    def record(self, options, prompt):
+        """
+        Queue a generated prompt for writing and return immediately.
+
+        Parameters:
+        - options: The generate_prompt options the prompt was generated with
+        - prompt: The generated prompt
+
+        Returns:
+        - True if the prompt was queued, False if it was skipped because it is
+          too large or the queue is full
+        """
+        if len(prompt) > self.max_prompt_size or len(prompt.encode("utf-8")) > self.max_prompt_size:
+            self.skipped += 1
+            return False
+        self._start_writer()
+        try:
+            self._queue.put_nowait((time.time(), dict(options), prompt))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="prompt-history",
+                                                    daemon=True)
+                    self._writer.start()
+                    atexit.register(self.close)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self.write(records)
+            except sqlite3.Error as e:
+                self.last_error = e
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+
+    def write(self, records):
+        """
+        Store records synchronously, in one transaction.
+
+        A prompt that is already stored is moved to the top with its use
+        count incremented. Runs the retention policy every 1000 records.
+
+        Parameters:
+        - records: Iterable of (created timestamp, options, prompt)
+        """
+        with self._write_lock:
+            count = self._write(self._connect("write"), records)
+            self.recorded += count
+            self._since_compact += count
+            if self._since_compact >= _COMPACT_EVERY:
+                self._since_compact = 0
+                self.compact()
+
+    def _write(self, connection, records):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            count = 0
+            for created, options, prompt in records:
+                options = dict(options)
+                task = options.pop("task", None) or ""
+                encoded = prompt.encode("utf-8")
+                digest = hashlib.blake2b(encoded, digest_size=16).digest()
+                old = connection.execute("SELECT id, uses FROM history WHERE digest = ?",
+                                         (digest,)).fetchone()
+                if old is not None:
+                    connection.execute("DELETE FROM history WHERE id = ?", (old[0],))
+                connection.execute(_INSERT, (
+                    created, digest, old[1] + 1 if old else 1, len(encoded), task, prompt,
+                    json.dumps(options, default=str),
+                    *(None if options.get(name) is None else str(options[name]) for name in TEXT_OPTIONS),
+                    _flags(options),
+                ))
+                count += 1
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return count
+
+    def flush(self):
+        """
+        Wait until every queued record is written.
+        """
+        self._queue.join()
+
+    def search(self, query="", limit=20, **filters):
+        """
+        Return the newest entries matching a text query and option filters.
+
+        Parameters:
+        - query: Free text matched against task and prompt; every term must
+          occur, and the last one also matches as a prefix when there are
+          fewer than limit whole-word matches
+        - limit: Maximum number of entries
+        - filters: Option values that must match, e.g. language="chinese" or
+          unittest=True
+
+        Returns:
+        - A list of HistoryEntry, newest first
+
+        Raises:
+        - ValueError for filters that are not stored options
+        """
+        conditions, parameters = [], []
+        for name, value in filters.items():
+            if name in TEXT_OPTIONS:
+                conditions.append(f"h.{name} IS ?")
+                parameters.append(None if value is None else str(value))
+            elif name in FLAG_OPTIONS:
+                bit = 1 << FLAG_OPTIONS.index(name)
+                conditions.append("h.flags & ? = ?")
+                parameters.extend((bit, bit if value else 0))
+            else:
+                raise ValueError(f"Cannot filter history by {name!r}")
+
+        match = fts_query(query)
+        if match is None:
+            return self._select("", conditions, parameters, limit)
+        # Whole terms are read from the index newest first and stop at the
+        # limit; a prefix term has to merge the lists of every matching word,
+        # so it is only used when whole terms do not fill the page
+        entries = self._select(match, conditions, parameters, limit)
+        if len(entries) < limit:
+            entries = self._select(fts_query(query, prefix=True), conditions, parameters, limit)
+        return entries
+
+    def _select(self, match, conditions, parameters, limit):
+        columns = f"h.id, h.created, substr(h.task, 1, {PREVIEW_CHARS}), h.options, h.size, h.uses"
+        if match:
+            sql = f"SELECT {columns} FROM history_fts JOIN history AS h ON h.id = history_fts.rowid"
+            conditions = ["history_fts MATCH ?", *conditions]
+            parameters = [match, *parameters]
+            order = "history_fts.rowid"
+        else:
+            sql = f"SELECT {columns} FROM history AS h"
+            order = "h.id"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        with self._read_lock:
+            rows = self._connect("read").execute(sql, (*parameters, limit)).fetchall()
+        return [HistoryEntry(id, created, task, json.loads(options), size, uses)
+                for id, created, task, options, size, uses in rows]
+
+    def restore(self, entry_id):
+        """
+        Return (options including the task, prompt) of an entry, or None.
+        """
+        with self._read_lock:
+            row = self._connect("read").execute(
+                "SELECT task, options, prompt FROM history WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        task, options, prompt = row
+        return {"task": task, **json.loads(options)}, prompt
+
+    def compact(self):
+        """
+        Apply the retention policy and compact the database.
+
+        Removes entries older than max_age_days, then the oldest entries over
+        max_entries or max_bytes, and merges the full-text index and returns
+        freed pages to the file system when anything was removed.
+
+        Returns:
+        - The number of removed entries
+        """
+        with self._write_lock:
+            return self._compact(self._connect("write"))
+
+    def _compact(self, connection):
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            removed = 0
+            if self.max_age_days is not None:
+                removed += connection.execute(
+                    "DELETE FROM history WHERE created < ?",
+                    (time.time() - self.max_age_days * 86400,)).rowcount
+            # Newest entry that no longer fits a bound; it and every older entry go
+            cutoff = 0
+            if self.max_entries is not None:
+                row = connection.execute(
+                    "SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_entries,)
+                ).fetchone()
+                cutoff = row[0] if row else 0
+            total = connection.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+            if self.max_bytes is not None and total > self.max_bytes:
+                row = connection.execute(
+                    "SELECT id FROM (SELECT id, SUM(size) OVER (ORDER BY id DESC) AS total "
+                    "FROM history) WHERE total > ? LIMIT 1", (self.max_bytes,)
+                ).fetchone()
+                cutoff = max(cutoff, row[0] if row else 0)
+            if cutoff:
+                removed += connection.execute("DELETE FROM history WHERE id <= ?", (cutoff,)).rowcount
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        if removed:
+            connection.execute("INSERT INTO history_fts (history_fts, rank) VALUES ('merge', ?)",
+                               (_MERGE_PAGES,))
+            connection.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    def delete(self, entry_id):
+        """
+        Remove one entry.
+        """
+        with self._write_lock:
+            self._connect("write").execute("DELETE FROM history WHERE id = ?", (entry_id,))
+
+    def stats(self):
+        """
+        Return the counters of this process and the size of the store.
+        """
+        with self._read_lock:
+            connection = self._connect("read")
+            entries = connection.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            size = connection.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        return {
+            "recorded": self.recorded,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        """
+        Write the queued records and stop the background thread.
+        """
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join()
+        for role, lock in (("read", self._read_lock), ("write", self._write_lock)):
+            with lock:
+                connection = self._connections.pop(role, None)
+                if connection is not None:
+                    connection.close()
+
+_default_history = None
+
+def get_default_history():
+    """
+    Return the history at PROMPT_HISTORY_PATH or the default location, or
+    None if recording is turned off.
+    """
+    global _default_history
+    path = os.environ.get(HISTORY_PATH_ENV) or DEFAULT_HISTORY_PATH
+    if path.lower() == "off":
+        return None
+    if _default_history is None or _default_history.path != path:
+        _default_history = PromptHistory(path)
+    return _default_history
@@ -0,0 +1,385 @@
+"""
+Combinatorial prompt generation for A/B evaluation sweeps.
+
+A PromptMatrix takes a list of values per option of generate_prompt and
+enumerates every combination. Combinations are numbered in mixed radix with
+the options in prompt order, so consecutive indexes share the longest
+possible prompt prefix: the matrix walks them like a trie, keeping the
+prompt text built up to every option and only rebuilding the sections after
+the option that changed. Sections are built once per distinct value
+combination they depend on. Prompts are yielded lazily and any index range
+can be generated on its own, which is how the work is split across processes.
+
+Usage:
+    python prompt_matrix.py matrix.json -o prompts.jsonl --workers 4
+    python prompt_matrix.py matrix.json --shard 2/8 -o part2.jsonl
+    python prompt_matrix.py matrix.json --count-only
+
+The matrix file is a JSON object mapping option names to a list of values
+(or a single value), e.g. {"task": "Fix the login bug", "unittest": [false, true]}.
+"""
+import argparse
+import inspect
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+from batch import BatchStats, normalize_row
+from prompt_core import PROMPT_SECTIONS, generate_prompt
+
+# Default value of every option, from generate_prompt's signature
+OPTION_DEFAULTS = {name: param.default
+                   for name, param in inspect.signature(generate_prompt).parameters.items()}
+
+def _axis_order():
+    # Options in the order they first appear in the prompt
+    order = []
+    for names, _ in PROMPT_SECTIONS:
+        order.extend(name for name in names if name not in order)
+    return tuple(order)
+
+class PromptMatrix:
+    """
+    Every combination of a set of option values, indexed from 0 to len - 1.
+
+    Parameters:
+    - values: Option name -> list or tuple of values; any other value is
+      used as the only value. Options left out keep generate_prompt's default.
+    """
+
+    def __init__(self, **values):
+        unknown = sorted(set(values) - set(OPTION_DEFAULTS))
+        if unknown:
+            raise TypeError(f"Unknown option: {', '.join(unknown)}")
+        self.options = _axis_order()
+        self.values = []
+        for name in self.options:
+            axis = values.get(name, OPTION_DEFAULTS[name])
+            axis = tuple(axis) if isinstance(axis, (list, tuple)) else (axis,)
+            if not axis:
+                raise ValueError(f"No values given for option {name}")
+            self.values.append(axis)
+        self.values = tuple(self.values)
+        self.radices = tuple(len(axis) for axis in self.values)
+
+        # Only options with several values are levels of the walk, and a
+        # section is built at the deepest level it, or any section before
+        # it, depends on; sections fixed for the whole matrix form the root
+        position = {name: index for index, name in enumerate(self.options)}
+        self._levels = [i for i, radix in enumerate(self.radices) if radix > 1]
+        level_of = {axis: level for level, axis in enumerate(self._levels)}
+        self._root = ""
+        self._sections = [[] for _ in self._levels]
+        deepest = -1
+        for names, builder in PROMPT_SECTIONS:
+            axes = tuple(position[name] for name in names)
+            deepest = max([deepest] + [level_of[axis] for axis in axes if axis in level_of])
+            if deepest < 0:
+                self._root += builder(*(self.values[axis][0] for axis in axes))
+            else:
+                # Section texts, keyed by the value indexes of its options
+                self._sections[deepest].append((axes, builder, {}))
+
+        # Text of each level keyed by the value indexes of the options it
+        # depends on, and the leaf texts of the last level for every value of
+        # its option, keyed by the value indexes of the others
+        self._level_keys = []
+        for sections in self._sections:
+            axes = sorted({axis for section_axes, _, _ in sections for axis in section_axes})
+            self._level_keys.append(_key_getter(axes))
+        self._level_texts = [{} for _ in self._levels]
+        if self._levels:
+            leaf_axis = self._levels[-1]
+            axes = {axis for section_axes, _, _ in self._sections[-1] for axis in section_axes}
+            self._leaf_key = _key_getter(sorted(axes - {leaf_axis}))
+        self._leaves = {}
+
+        self._size = 1
+        for radix in self.radices:
+            self._size *= radix
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def _digits(self, index):
+        # Value index of every option for a combination index
+        if not 0 <= index < self._size:
+            raise IndexError("combination index out of range")
+        digits = [0] * len(self.radices)
+        for axis in reversed(range(len(self.radices))):
+            index, digits[axis] = divmod(index, self.radices[axis])
+        return digits
+
+    def options_at(self, index, varied_only=False):
+        """
+        Return the generate_prompt keyword arguments of a combination.
+
+        Parameters:
+        - index: Combination index
+        - varied_only: Only include options with more than one value
+        """
+        digits = self._digits(index)
+        return {name: self.values[axis][digits[axis]]
+                for axis, name in enumerate(self.options)
+                if not varied_only or self.radices[axis] > 1}
+
+    def prompt_at(self, index):
+        """
+        Return the prompt of one combination.
+        """
+        return generate_prompt(**self.options_at(index))
+
+    def _build_level(self, level, digits):
+        text = ""
+        for axes, builder, built in self._sections[level]:
+            key = tuple(digits[axis] for axis in axes)
+            section = built.get(key)
+            if section is None:
+                section = built[key] = builder(*(self.values[axis][digits[axis]] for axis in axes))
+            text += section
+        return text
+
+    def _level_text(self, level, digits):
+        key = self._level_keys[level](digits)
+        texts = self._level_texts[level]
+        text = texts.get(key)
+        if text is None:
+            text = texts[key] = self._build_level(level, digits)
+        return text
+
+    def _leaf_texts(self, digits):
+        # Texts of the last level for every value of its option
+        key = self._leaf_key(digits)
+        leaves = self._leaves.get(key)
+        if leaves is None:
+            leaf_axis = self._levels[-1]
+            leaf_digits = list(digits)
+            leaves = []
+            for value in range(self.radices[leaf_axis]):
+                leaf_digits[leaf_axis] = value
+                leaves.append(self._build_level(len(self._levels) - 1, leaf_digits))
+            self._leaves[key] = leaves
+        return leaves
+
+    def iter_range(self, start=0, stop=None):
+        """
+        Lazily yield the prompts of the combinations start to stop - 1.
+
+        Yields:
+        - (index, prompt) tuples in index order
+        """
+        stop = self._size if stop is None else min(stop, self._size)
+        if start >= stop:
+            return
+        levels = self._levels
+        if not levels:
+            yield 0, self._root
+            return
+
+        digits = self._digits(start)
+        # prefixes[level] is the prompt text before that level's sections
+        prefixes = [self._root] * len(levels)
+        last = len(levels) - 1
+        changed = 0
+        index = start
+        while index < stop:
+            for level in range(changed, last):
+                prefixes[level + 1] = prefixes[level] + self._level_text(level, digits)
+            # The leaves under the current prefix
+            leaf_axis = levels[last]
+            prefix = prefixes[last]
+            first = digits[leaf_axis]
+            count = min(self.radices[leaf_axis] - first, stop - index)
+            for leaf in self._leaf_texts(digits)[first:first + count]:
+                yield index, prefix + leaf
+                index += 1
+            # Advance like an odometer to the next prefix
+            digits[leaf_axis] = 0
+            changed = last - 1
+            while changed >= 0:
+                axis = levels[changed]
+                digits[axis] += 1
+                if digits[axis] < self.radices[axis]:
+                    break
+                digits[axis] = 0
+                changed -= 1
+
+    def shard(self, shard, shards):
+        """
+        Lazily yield the prompts of one of `shards` contiguous index ranges.
+        """
+        return self.iter_range(*shard_bounds(self._size, shard, shards))
+
+def _key_getter(axes):
+    # Callable returning a hashable key of the digits at the given axes
+    if not axes:
+        return lambda digits: ()
+    return itemgetter(*axes)
+
+def shard_bounds(total, shard, shards):
+    """
+    Return the (start, stop) index range of shard number `shard` of `shards`.
+
+    The ranges are contiguous and their sizes differ by at most one.
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is not in 0..{shards - 1}")
+    return total * shard // shards, total * (shard + 1) // shards
+
+def load_matrix(spec):
+    """
+    Build a PromptMatrix from a parsed matrix file.
+
+    Values are normalized like batch input: flags may be given as strings
+    and empty optional values mean not specified.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("The matrix must be a JSON object")
+    values = {}
+    for name, axis in spec.items():
+        if name not in OPTION_DEFAULTS:
+            raise ValueError(f"Unknown option: {name}")
+        axis = axis if isinstance(axis, list) else [axis]
+        values[name] = [normalize_row({name: value}).get(name, OPTION_DEFAULTS[name]) for value in axis]
+    return PromptMatrix(**values)
+
+# The matrix of a pool worker, built once per process
+_worker_matrix = None
+
+def _init_worker(spec):
+    global _worker_matrix
+    _worker_matrix = load_matrix(spec)
+
+def generate_range(start, stop, count_only=False, matrix=None):
+    """
+    Generate the output records for an index range.
+
+    This is the unit of work sent to the process pool.
+
+    Returns:
+    - A tuple (serialized JSONL text, worker pid, seconds spent)
+    """
+    matrix = matrix or _worker_matrix
+    begin = time.perf_counter()
+    lines = []
+    for index, prompt in matrix.iter_range(start, stop):
+        if not count_only:
+            record = {"index": index, "options": matrix.options_at(index, varied_only=True),
+                      "prompt": prompt}
+            lines.append(json.dumps(record, ensure_ascii=False))
+    lines.append("")
+    return "\n".join(lines), os.getpid(), time.perf_counter() - begin
+
+def run_matrix(spec, output, start=0, stop=None, workers=None, chunk_size=10000,
+               max_pending=None, count_only=False):
+    """
+    Generate the combinations start to stop - 1 and write them in index order.
+
+    Parameters:
+    - spec: Matrix file contents (option name -> values)
+    - output: Text stream the JSONL records are written to
+    - start, stop: Index range to generate (default: the whole matrix)
+    - workers: Number of worker processes (1 runs in the current process)
+    - chunk_size: Number of combinations per unit of work
+    - max_pending: Maximum number of chunks in flight (default: 2 per worker)
+    - count_only: Generate the prompts without writing them
+
+    Returns:
+    - The BatchStats of the run
+    """
+    matrix = load_matrix(spec)
+    stop = len(matrix) if stop is None else min(stop, len(matrix))
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    stats = BatchStats(unit="combinations")
+    chunks = [(first, min(first + chunk_size, stop)) for first in range(start, stop, chunk_size)]
+
+    if workers == 1:
+        for first, last in chunks:
+            text, pid, busy = generate_range(first, last, count_only, matrix)
+            output.write(text)
+            stats.record(pid, last - first, busy)
+        stats.finish()
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(spec,)) as pool:
+        pending = deque()
+        for first, last in chunks:
+            if len(pending) >= max_pending:
+                _write_result(pending.popleft(), output, stats)
+            pending.append((pool.submit(generate_range, first, last, count_only), last - first))
+        while pending:
+            _write_result(pending.popleft(), output, stats)
+
+    stats.finish()
+    return stats
+
+def _write_result(item, output, stats):
+    future, combinations = item
+    text, pid, busy = future.result()
+    output.write(text)
+    stats.record(pid, combinations, busy)
+
+def _parse_shard(value):
+    try:
+        shard, shards = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected I/N, got {value!r}")
+    return shard, shards
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the prompts of every combination of option values.")
+    parser.add_argument("matrix", nargs="?", help="Matrix JSON file (default: stdin)")
+    parser.add_argument("-o", "--output", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--shard", type=_parse_shard, metavar="I/N",
+                        help="Only generate the I-th of N contiguous index ranges (0-based)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=10000,
+                        help="Combinations per unit of work")
+    parser.add_argument("--count-only", action="store_true",
+                        help="Generate the prompts without writing them")
+    parser.add_argument("--quiet", action="store_true", help="Do not print the throughput report")
+    args = parser.parse_args()
+
+    try:
+        if args.matrix:
+            with open(args.matrix, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+        else:
+            spec = json.load(sys.stdin)
+        total = len(load_matrix(spec))
+        start, stop = shard_bounds(total, *args.shard) if args.shard else (0, total)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.count_only:
+        target = io.StringIO()
+    elif args.output:
+        target = open(args.output, "w", encoding="utf-8", newline="\n")
+    else:
+        target = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="\n")
+    try:
+        stats = run_matrix(spec, target, start, stop, workers=args.workers,
+                           chunk_size=args.chunk_size, count_only=args.count_only)
+    finally:
+        target.flush()
+        if args.output and not args.count_only:
+            target.close()
+
+    if not args.quiet:
+        print(f"Combinations {start} to {stop - 1} of {total}", file=sys.stderr)
+        print(stats.report(), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
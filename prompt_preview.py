@@ -0,0 +1,109 @@
+"""
+Prompt preview component of the UI.
+
+A custom Streamlit component that holds the template options, renders the
+prompt from prompt_core.template_spec() as they change and copies it to the
+clipboard, all in the browser: the preview follows every edit without a
+server round trip. The server hears from it once editing pauses, which
+sends the options so the size estimate can be updated, and when Generate is
+clicked, which sends them so the prompt can be generated and saved to the
+history.
+
+The frontend in components/prompt_preview is plain HTML and JavaScript
+served as is, so there is nothing to build.
+
+Streamlit sends a component's arguments with every rerun, so only the
+arguments that changed since the last render of the session are passed: the
+template spec, the tabs and the last prompt usually go to the browser once.
+Each render carries a sequence number and the one it builds on; a browser
+that missed a render (or lost its copy, e.g. because the frame was rebuilt)
+asks for a full resend by setting the value {"id", "resync": true}.
+"""
+import hashlib
+import json
+import os
+
+from prompt_core import template_spec
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "prompt_preview")
+
+_component = None
+_spec = None
+
+# Arguments sent only when they differ from the last render of the session
+_DELTA_ARGS = ("spec", "task", "options", "revision", "tabs", "labels", "prompt", "prompt_for", "note")
+
+def _declare():
+    global _component, _spec
+    if _component is None:
+        # Imported here so that importing this module does not import Streamlit
+        import streamlit.components.v1 as components
+        _component = components.declare_component("prompt_preview", path=FRONTEND_DIR)
+        _spec = template_spec()
+    return _component
+
+def prompt_preview(task, options, revision, tabs, labels, prompt=None, prompt_for=None,
+                   note=None, key=None):
+    """
+    Render the option tabs, the live preview and the Generate and Copy buttons.
+
+    Parameters:
+    - task: Current task text
+    - options: Values of the template options to start from
+    - revision: Reset the options in the browser to `options` when this changes
+    - tabs: List of {"label", "controls"} dicts; each control is a dict with
+      "option", "label", "kind" ("flag", "choice" or "text") and, for
+      choices, "choices" as [value, label] pairs
+    - labels: UI strings (options_header, prompt_header, generate_button,
+      copy_button, copied, preview_size)
+    - prompt: Last generated prompt, shown while the task and options still
+      match prompt_for
+    - prompt_for: {"task", "options"} the prompt was generated for
+    - note: Caption shown under the preview
+    - key: Streamlit widget key
+
+    Returns:
+    - The last event, a dict with a unique "id" and the "options", plus
+      "edit": True when the options were edited rather than Generate
+      clicked; None before the first event
+    """
+    component = _declare()
+    values = dict(spec=_spec, task=task, options=options, revision=revision, tabs=tabs,
+                  labels=labels, prompt=prompt, prompt_for=prompt_for, note=note)
+    return component(**changed_args(values, key), key=key, default=None)
+
+def _fingerprint(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+def changed_args(values, key):
+    """
+    Return the arguments to send for this render of the component.
+
+    The fingerprints of the arguments last sent are kept in the session
+    state under "<key>_sync", with the sequence number of that render.
+
+    Parameters:
+    - values: Dict of all the component arguments (_DELTA_ARGS)
+    - key: Widget key of the component
+
+    Returns:
+    - The changed arguments plus "seq" and "base" (None for a full render)
+    """
+    import streamlit as st
+
+    state = st.session_state
+    sync = state.get(f"{key}_sync") or {"seq": 0, "sent": {}, "resync": None}
+    request = state.get(key)
+    if isinstance(request, dict) and request.get("resync") and request.get("id") != sync["resync"]:
+        # The browser is missing a render; start over from a full one
+        sync = {"seq": sync["seq"], "sent": {}, "resync": request.get("id")}
+    base = sync["seq"] if sync["sent"] else None
+    args = {"seq": sync["seq"] + 1, "base": base}
+    sent = {}
+    for name in _DELTA_ARGS:
+        fingerprint = _fingerprint(values[name])
+        sent[name] = fingerprint
+        if base is None or sync["sent"].get(name) != fingerprint:
+            args[name] = values[name]
+    state[f"{key}_sync"] = {"seq": args["seq"], "sent": sent, "resync": sync["resync"]}
+    return args
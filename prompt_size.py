@@ -0,0 +1,225 @@
+"""
+Live size estimate of the generated prompt.
+
+Counts characters, UTF-8 bytes and approximate tokens of the prompt for the
+current task and options without generating or retokenizing the whole
+prompt. The option sections come from the template engine's cache and their
+counts are memoized; the task is split into blocks at whitespace, and an edit
+only recounts the blocks around the changed span.
+
+The token count is an offline approximation of a BPE tokenizer: a word is one
+token plus one per further six letters, digits count in groups of three,
+indentation in groups of up to four spaces, and every punctuation character
+and every CJK character is one token. It is meant for budgeting, not for
+exact billing.
+"""
+import os
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import accumulate
+
+# Text the task section adds around the task
+from prompt_core import _TASK_PREFIX, _TASK_SUFFIX, iter_prompt
+
+# Environment variable overriding the default token budget of the UI warning
+TOKEN_BUDGET_ENV = "PROMPT_TOKEN_BUDGET"
+DEFAULT_TOKEN_BUDGET = 8000
+
+# Target length of the task blocks recounted after an edit
+BLOCK_SIZE = 256
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+
+# Pieces that cost one token each: runs of letters (words), every further six
+# letters of a word, digits in groups of three, newline runs, indentation in
+# groups of up to four, punctuation and symbol characters, and CJK characters.
+# Each pattern is counted with findall, which keeps the loop in C.
+_PIECE_RE = re.compile(rf"[^\W\d_{_CJK}]+|\d{{1,3}}|\n+|[ \t]{{2,4}}|[^\w\s]|_|[{_CJK}]")
+_LONG_WORD_RE = re.compile(rf"[^\W\d_{_CJK}]{{6}}")
+
+# Block boundaries: after whitespace and before non-whitespace, so no counted
+# piece ever spans two blocks and block counts add up exactly
+_BOUNDARY_RE = re.compile(r"\s(?=\S)")
+
+def count_tokens(text):
+    """
+    Return the approximate number of tokens in a text.
+    """
+    return len(_PIECE_RE.findall(text)) + len(_LONG_WORD_RE.findall(text))
+
+def _byte_length(text):
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+@lru_cache(maxsize=1024)
+def text_size(text):
+    """
+    Return (characters, bytes, tokens) of a short text, memoized.
+    """
+    return len(text), _byte_length(text), count_tokens(text)
+
+def split_blocks(text, start=0, end=None, block_size=BLOCK_SIZE):
+    """
+    Split text[start:end] into blocks of about block_size characters.
+
+    Blocks end after a whitespace character that precedes a non-whitespace
+    one, so that counting the blocks separately gives the same token count
+    as counting the whole span.
+    """
+    end = len(text) if end is None else end
+    blocks = []
+    while start < end:
+        match = _BOUNDARY_RE.search(text, start + block_size, end) if end - start > block_size else None
+        stop = match.end() if match else end
+        blocks.append(text[start:stop])
+        start = stop
+    return blocks
+
+def _is_boundary(text, index):
+    return text[index - 1].isspace() and not text[index].isspace()
+
+def common_prefix_length(a, b):
+    """
+    Return the length of the longest common prefix of two strings.
+
+    Binary search over startswith: the probes compare halving spans, so the
+    total work is about one pass over the prefix, done in C.
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if b.startswith(a[low:middle], low):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def common_suffix_length(a, b, limit):
+    """
+    Return the length of the longest common suffix of two strings, at most limit.
+    """
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if b.endswith(a[len(a) - middle:len(a) - low], 0, len(b) - low):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+class TaskSizer:
+    """
+    Incremental size counter for a task that is edited in place.
+
+    Keeps the task as blocks with their counts. update() finds the span that
+    differs from the previous text and only splits and counts the blocks
+    covering it.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.text = ""
+        self.blocks = []
+        self.sizes = []
+        # Start offset of every block in self.text
+        self.starts = []
+        self.chars = self.bytes = self.tokens = 0
+        self.recounted = 0
+
+    def update(self, text):
+        """
+        Update the counts for a new version of the task.
+
+        Returns:
+        - A tuple (characters, bytes, tokens)
+        """
+        old = self.text
+        if text is old or text == old:
+            self.recounted = 0
+            return self.chars, self.bytes, self.tokens
+
+        prefix = common_prefix_length(old, text)
+        suffix = common_suffix_length(old, text, min(len(old), len(text)) - prefix)
+
+        # Blocks entirely inside the unchanged prefix and suffix are kept
+        starts = self.starts
+        head = bisect_right(starts, prefix) - 1 if starts else 0
+        tail = bisect_left(starts, len(old) - suffix)
+        tail = max(tail, head)
+        position = starts[head] if head < len(starts) else len(old)
+        end = (starts[tail] if tail < len(starts) else len(old)) + len(text) - len(old)
+        # A changed character next to a kept block can turn its edge into a
+        # non-boundary; recount that neighbouring block too
+        if 0 < position < len(text) and not _is_boundary(text, position):
+            head -= 1
+            position = starts[head]
+        # Merge short spans with the next block so edits do not fragment the task
+        if end < len(text) and (end - position < self.block_size or not _is_boundary(text, end)):
+            end += len(self.blocks[tail])
+            tail += 1
+
+        new_blocks = split_blocks(text, position, end, self.block_size)
+        new_sizes = [(len(block), _byte_length(block), count_tokens(block)) for block in new_blocks]
+        for chars, size, tokens in self.sizes[head:tail]:
+            self.chars -= chars
+            self.bytes -= size
+            self.tokens -= tokens
+        for chars, size, tokens in new_sizes:
+            self.chars += chars
+            self.bytes += size
+            self.tokens += tokens
+        self.blocks[head:tail] = new_blocks
+        self.sizes[head:tail] = new_sizes
+        self.starts = list(accumulate(map(len, self.blocks), initial=0))[:-1]
+        self.text = text
+        self.recounted = end - position
+        return self.chars, self.bytes, self.tokens
+
+class PromptSizer:
+    """
+    Size of the prompt for a task and option set, updated incrementally.
+
+    Sections are counted separately: the task through a TaskSizer, and the
+    option body and Project Specifics section through the memoized
+    text_size, since the template engine returns the same few strings for
+    every option set.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.task = TaskSizer(block_size)
+
+    def measure(self, task="", **options):
+        """
+        Return the size of the prompt generate_prompt would produce.
+
+        A directory manifest and context files are not included: both read
+        the file system, which is too slow for an estimate updated on every
+        edit. Context files have their own budget.
+
+        Returns:
+        - A dict with "chars", "bytes" and "tokens" totals and the same
+          counts per section under "sections"
+        """
+        sections = {}
+        if task:
+            chars, size, tokens = self.task.update(task)
+            frame = text_size(_TASK_PREFIX + _TASK_SUFFIX)
+            sections["task"] = (chars + frame[0], size + frame[1], tokens + frame[2])
+        options["dir_manifest"] = options["context_files"] = None
+        for name, chunk in zip(("options", "directory"), iter_prompt(**options)):
+            sections[name] = text_size(chunk)
+        return {
+            "chars": sum(section[0] for section in sections.values()),
+            "bytes": sum(section[1] for section in sections.values()),
+            "tokens": sum(section[2] for section in sections.values()),
+            "sections": sections,
+        }
+
+def default_token_budget():
+    """
+    Return the token budget from the environment, or the default.
+    """
+    try:
+        return int(os.environ.get(TOKEN_BUDGET_ENV, DEFAULT_TOKEN_BUDGET))
+    except ValueError:
+        return DEFAULT_TOKEN_BUDGET
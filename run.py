@@ -1,157 +1,503 @@
+import argparse
 import os
+import signal
 import subprocess
 import sys
-import tempfile
+import threading
 import webbrowser
 import time
-import atexit
+import re
 import shutil
+import socket
 
-def create_config():
-    """
-    Create a temporary Streamlit config file to customize the app appearance.
-    """
-    config_dir = os.path.join(os.path.expanduser("~"), ".streamlit")
-    os.makedirs(config_dir, exist_ok=True)
-
-    config_path = os.path.join(config_dir, "config.toml")
-
-    # Save original config if it exists
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            original_config = f.read()
-
-        # Create a backup
-        with open(f"{config_path}.backup", 'w') as f:
-            f.write(original_config)
-    else:
-        original_config = None
-
-    # Write compact window configuration
-    with open(config_path, 'w') as f:
-        f.write("""
-[browser]
-serverAddress = "localhost"
-gatherUsageStats = false
-serverPort = 8501
-autoOpenBrowser = false
-
-[theme]
-base = "light"
-primaryColor = "#1E88E5"
-backgroundColor = "#FFFFFF"
-secondaryBackgroundColor = "#F0F2F6"
-textColor = "#262730"
-font = "sans serif"
-
-[server]
-port = 8501
-baseUrlPath = ""
-enableCORS = false
-enableXsrfProtection = true
-maxUploadSize = 200
-maxMessageSize = 200
-enableWebsocketCompression = true
-headless = true
-
-[runner]
-magicEnabled = true
-installTracer = true
-fixMatplotlib = true
-""")
-
-    # Return the original config to restore later
-    return original_config
-
-def restore_config(original_config):
-    """
-    Restore the original Streamlit config file.
-    """
-    config_path = os.path.join(os.path.expanduser("~"), ".streamlit", "config.toml")
-
-    if original_config is not None:
-        with open(config_path, 'w') as f:
-            f.write(original_config)
-    else:
-        # If there was no original config, remove the created one
-        if os.path.exists(config_path):
-            os.remove(config_path)
+from main import REMOTE_FILES_ENV, SERVER_ADDRESS_ENV
+from metrics import METRICS_PATH, METRICS_PORT_ENV, SAMPLE_DIR_ENV, SAMPLE_RERUNS_ENV
+from session_store import SESSION_MAX_BYTES_ENV, SESSION_TTL_ENV, SPILL_DIR_ENV
+from single_instance import (LOCK_FILE, InstanceError, InstanceLock, InstanceServer, instance_dir, send_command,
+                             wait_until_stopped)
 
-def main():
+SERVER_PORT = 8501
+SERVER_URL = f"http://localhost:{SERVER_PORT}"
+
+# Directory holding main.py; Streamlit is started from here
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Health endpoints, newest Streamlit first
+HEALTH_PATHS = ("/_stcore/health", "/healthz")
+
+# Readiness probing: exponential backoff between polls, overall deadline
+READY_TIMEOUT = 60
+PROBE_INITIAL_DELAY = 0.05
+PROBE_MAX_DELAY = 1.0
+
+# Seconds a terminated server gets to exit before it is killed
+STOP_TIMEOUT = 10
+
+# Interface the app listens on unless --address says otherwise; the loopback
+# address keeps it, and the files its server-side options read, off the network
+LOCAL_ADDRESS = "127.0.0.1"
+
+# Settings shared by every launch profile, passed as command line flags
+BASE_OPTIONS = {
+    "server.headless": True,
+    "server.address": LOCAL_ADDRESS,
+    "browser.serverAddress": "localhost",
+    "browser.gatherUsageStats": False,
+    "server.enableXsrfProtection": False,
+    "server.enableCORS": False,
+    "server.maxUploadSize": 200,
+    "theme.base": "light",
+    "theme.primaryColor": "#1E88E5",
+    "theme.backgroundColor": "#FFFFFF",
+    "theme.secondaryBackgroundColor": "#F0F2F6",
+    "theme.textColor": "#262730",
+}
+
+# Launch profiles, passed to Streamlit as STREAMLIT_* environment variables.
+# Options the installed Streamlit does not know are ignored rather than
+# rejected, so profiles work across Streamlit versions.
+PROFILES = {
+    # Previous launcher behaviour: script tracing, magic and file watching on
+    "dev": {
+        "runner.magicEnabled": True,
+        "runner.installTracer": True,
+        "runner.fixMatplotlib": True,
+        "server.runOnSave": True,
+        "server.fileWatcherType": "auto",
+        "server.enableWebsocketCompression": True,
+        "server.maxMessageSize": 200,
+        "logger.level": "info",
+    },
+    # No per-run tracer or magic rewriting, no file watcher, and no deflate on
+    # the localhost websocket; the message cap still fits a 10 MB task preview
+    "production": {
+        "runner.magicEnabled": False,
+        "runner.installTracer": False,
+        "runner.fixMatplotlib": False,
+        "runner.fastReruns": True,
+        "server.runOnSave": False,
+        "server.fileWatcherType": "none",
+        "server.enableWebsocketCompression": False,
+        "server.maxMessageSize": 50,
+        "client.toolbarMode": "minimal",
+        "logger.level": "warning",
+    },
+}
+
+DEFAULT_PROFILE = "production"
+
+# Environment variable selecting the profile when --profile is not given
+PROFILE_ENV = "PROMPT_GENERATOR_PROFILE"
+
+def _option_value(value):
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+def option_env_var(option):
     """
-    Run the Streamlit application using Python's subprocess module.
-    This script helps users run the application without directly calling the Streamlit executable.
-    Configures Streamlit to run in a compact, floating window.
+    Return the environment variable Streamlit reads for a config option.
+
+    For example "runner.magicEnabled" becomes STREAMLIT_RUNNER_MAGIC_ENABLED.
     """
-    print("Starting AI Prompt Generator...")
+    name = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", option.replace(".", "_"))
+    return f"STREAMLIT_{name.upper()}"
 
-    # Create custom config for compact window
-    original_config = create_config()
+def profile_environment(profile=DEFAULT_PROFILE, base=None):
+    """
+    Build the environment for a Streamlit server running a launch profile.
 
-    # Register function to restore original config on exit
-    atexit.register(lambda: restore_config(original_config))
+    Parameters:
+    - profile: Name of an entry in PROFILES
+    - base: Environment to extend (defaults to os.environ)
 
-    # Create a flag file to track if browser has been opened
-    # This helps prevent multiple browser windows from opening
-    flag_dir = tempfile.gettempdir()
-    browser_flag_file = os.path.join(flag_dir, "ai_prompt_generator_browser_opened.flag")
+    Returns:
+    - A new environment dict
+    """
+    env = dict(os.environ if base is None else base)
+    for option, value in PROFILES[profile].items():
+        env[option_env_var(option)] = _option_value(value)
+    return env
 
-    # Check if the flag file exists and is recent (less than 30 seconds old)
-    browser_already_opened = False
-    if os.path.exists(browser_flag_file):
-        file_age = time.time() - os.path.getmtime(browser_flag_file)
-        if file_age < 30:  # If file is less than 30 seconds old
-            browser_already_opened = True
-        else:
-            # Flag file is old, remove it
-            try:
-                os.remove(browser_flag_file)
-            except:
-                pass
+def metrics_environment(env, port, sample_reruns=0, sample_dir=None):
+    """
+    Add the variables that make a Streamlit server serve its metrics.
 
-    # Get the path to the Python executable
-    python_exe = sys.executable
+    Parameters:
+    - env: Environment of the server, updated in place
+    - port: Port of the metrics endpoint
+    - sample_reruns: Number of slowest reruns the sampling profiler keeps (0: off)
+    - sample_dir: Directory for the profiles (default: the metrics module's)
 
-    # Construct the command to run Streamlit
-    streamlit_module = "-m streamlit run"
-    main_script = "main.py"
+    Returns:
+    - env
+    """
+    env[METRICS_PORT_ENV] = str(port)
+    if sample_reruns:
+        env[SAMPLE_RERUNS_ENV] = str(sample_reruns)
+    if sample_dir:
+        env[SAMPLE_DIR_ENV] = sample_dir
+    return env
 
-    # Additional parameters for a compact window
-    # Prevent auto-opening browser windows
-    params = "--server.port=8501 --server.headless=true --browser.serverAddress=localhost --browser.gatherUsageStats=false --server.enableXsrfProtection=false --server.enableCORS=false --browser.serverPort=8501 --server.enableWebsocketCompression=true"
+def streamlit_args(port=SERVER_PORT, public_port=None, address=None):
+    """
+    Build the command line that starts the Streamlit server.
 
-    # Full command
-    command = f"{python_exe} {streamlit_module} {main_script} {params}"
+    Parameters:
+    - port: Port the server listens on
+    - public_port: Port the browser connects to, if different (e.g. behind a proxy)
+    - address: Interface the server listens on (default: LOCAL_ADDRESS)
+
+    Returns:
+    - A list of command line arguments
+    """
+    public_port = public_port or port
+    options = dict(BASE_OPTIONS)
+    options["server.port"] = port
+    options["browser.serverPort"] = public_port
+    if address:
+        options["server.address"] = address
+    return [sys.executable, "-m", "streamlit", "run", "main.py"] + [
+        f"--{option}={_option_value(value)}" for option, value in options.items()
+    ]
 
-    # Start the Streamlit server in the background
+def port_in_use(port, host="localhost"):
+    """
+    Check whether something is already listening on the given port.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex((host, port)) == 0
+
+def probe_health(base_url):
+    """
+    Return True if the Streamlit server answers its health endpoint.
+    """
+    # Imported here so that handing a launch to the running instance stays fast
+    import urllib.error
+    import urllib.request
+
+    for path in HEALTH_PATHS:
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                continue  # Older Streamlit, try the next endpoint
+            return False
+        except (urllib.error.URLError, ConnectionError, OSError):
+            return False
+    return False
+
+def wait_until_ready(process, base_url=SERVER_URL, timeout=READY_TIMEOUT):
+    """
+    Poll the server health endpoint with exponential backoff.
+
+    Parameters:
+    - process: The launched server process, checked for early exit
+    - base_url: Root URL of the server
+    - timeout: Seconds to wait before giving up
+
+    Returns:
+    - The number of seconds until the server was ready
+
+    Raises:
+    - RuntimeError if the process exits or the server is not ready in time
+    """
+    start = time.monotonic()
+    delay = PROBE_INITIAL_DELAY
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Streamlit exited with code {process.returncode} during startup")
+        if probe_health(base_url):
+            return time.monotonic() - start
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise RuntimeError(f"Streamlit did not become ready within {timeout} seconds")
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * 2, PROBE_MAX_DELAY)
+
+def stop_process(process):
+    """
+    Terminate the server process if it is still running.
+    """
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def open_browser():
+    """
+    Open the app in the browser, reusing an open window where the browser allows.
+    """
+    print("Opening browser window...")
+    webbrowser.open(f"{SERVER_URL}/?embed=true", new=0, autoraise=True)
+
+class InstanceControl:
+    """
+    Commands later launches send to this one through the instance socket.
+
+    The running mode attaches functions listing its server processes and
+    stopping them; `ready` is set once the app answers.
+    """
+
+    def __init__(self, profile, workers, metrics_port=None):
+        self.profile = profile
+        self.workers = workers
+        self.metrics_port = metrics_port
+        self.started = time.time()
+        self.ready = threading.Event()
+        self.stopping = False
+        self._server_pids = list
+        self._stop = None
+
+    def attach(self, server_pids, stop):
+        self._server_pids = server_pids
+        self._stop = stop
+
+    def handlers(self):
+        return {"open": self.open, "status": self.status, "stop": self.stop}
+
+    def open(self):
+        # A launch during startup waits for the server instead of opening a dead page
+        if not self.ready.wait(READY_TIMEOUT):
+            raise RuntimeError("the server did not become ready")
+        open_browser()
+        return {"url": SERVER_URL}
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "url": SERVER_URL,
+            "profile": self.profile,
+            "workers": self.workers,
+            "ready": self.ready.is_set(),
+            "uptime": time.time() - self.started,
+            "server_pids": self._server_pids(),
+            "metrics_port": self.metrics_port,
+        }
+
+    def stop(self):
+        self.stopping = True
+        if self._stop is not None:
+            # Unblocks the main thread, which then cleans up and exits
+            threading.Thread(target=self._stop, name="instance-stop").start()
+        return {"pid": os.getpid()}
+
+def control_running_instance(command):
+    """
+    Hand a command to the instance that holds the lock and print its answer.
+
+    A plain launch becomes "open", which shows the running app in the browser.
+
+    Returns:
+    - The exit code for this launch
+    """
     try:
-        process = subprocess.Popen(command, shell=True)
+        response = send_command("open" if command == "start" else command, timeout=READY_TIMEOUT + 5)
+    except InstanceError as e:
+        print(f"Error: {e}")
+        return 1
+    if response is None:
+        print("AI Prompt Generator is not running.")
+        # Exit codes of `status` and `stop` follow the LSB init script conventions
+        return {"status": 3, "stop": 0}.get(command, 1)
+    if command == "start":
+        print(f"AI Prompt Generator is already running at {response['url']}; opened it in the browser.")
+    elif command == "status":
+        minutes, seconds = divmod(int(response["uptime"]), 60)
+        state = "running" if response["ready"] else "starting"
+        print(f"AI Prompt Generator is {state} at {response['url']} (pid {response['pid']}, "
+              f"{response['profile']} profile, {response['workers']} worker(s), up {minutes}m {seconds}s).")
+        print(f"Server processes: {', '.join(map(str, response['server_pids'])) or '-'}")
+        if response["metrics_port"]:
+            print(f"Metrics: http://localhost:{response['metrics_port']}{METRICS_PATH}")
+    elif command == "stop":
+        if not wait_until_stopped():
+            print(f"Error: AI Prompt Generator (pid {response['pid']}) did not stop in time.")
+            return 1
+        print(f"Stopped AI Prompt Generator (pid {response['pid']}).")
+    return 0
 
-        # Wait a moment for the server to start
-        time.sleep(2)
+def _terminated(signum, frame):
+    # Lets `kill` take the same cleanup path as Ctrl+C
+    raise KeyboardInterrupt
 
-        # Open the browser only if it hasn't been opened recently
-        if not browser_already_opened:
-            print("Opening browser window...")
-            # Create the flag file to indicate browser has been opened
-            with open(browser_flag_file, 'w') as f:
-                f.write(f"Browser opened at {time.ctime()}")
+def run_workers(workers, report_interval, profile, control, metrics=None, address=LOCAL_ADDRESS):
+    """
+    Run several Streamlit workers behind the local load balancer.
 
-            # Open browser with reuse flag (new=0)
-            webbrowser.open("http://localhost:8501/?embed=true", new=0, autoraise=True)
-        else:
-            print("Browser window already open, reusing existing window.")
+    The balancer listens on SERVER_PORT of address and the workers on the
+    loopback ports after it.
+    With metrics (port, sample_reruns, sample_dir), worker i serves its
+    metrics on port + i.
+    """
+    import asyncio
 
-        print("AI Prompt Generator is running. Close this window to exit.")
+    from balancer import Balancer
 
-        # Wait for the process to complete
-        process.wait()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running Streamlit: {e}")
+    balancer = Balancer(workers, SERVER_PORT, profile=profile, metrics=metrics)
+    busy = [worker.port for worker in balancer.workers if port_in_use(worker.port)]
+    if busy:
+        print(f"Error: worker ports already in use: {', '.join(map(str, busy))}")
+        sys.exit(1)
+    control.attach(lambda: [worker.process.pid for worker in balancer.workers if worker.process], balancer.stop)
+
+    try:
+        try:
+            ready_after = balancer.start_workers()
+        except RuntimeError as e:
+            print(f"Error starting Streamlit workers: {e}")
+            sys.exit(1)
+        print(f"{workers} workers ready in {ready_after:.2f} seconds "
+              f"(ports {balancer.workers[0].port}-{balancer.workers[-1].port}).")
+
+        control.ready.set()
+        open_browser()
+        print(f"AI Prompt Generator is running with {workers} workers. "
+              f"Load report: {SERVER_URL}/_balancer/status. Close this window to exit.")
+        asyncio.run(balancer.serve(host=address, report_interval=report_interval))
+        print("\nApplication stopped by `run.py stop`.")
+        print(balancer.report())
+    except KeyboardInterrupt:
+        print("\nApplication stopped by user.")
+        print(balancer.report())
+    finally:
+        balancer.stop_workers()
+
+def compare_profiles():
+    """
+    Report the rerun time of every UI interaction under each profile.
+
+    Runs the websocket benchmark, which starts its own server per profile on
+    a spare port, so this works while the app is running.
+
+    Returns:
+    - The benchmark's exit code
+    """
+    script = os.path.join(APP_DIR, "benchmarks", "bench_ui_websocket.py")
+    if not os.path.isfile(script):
+        print(f"Error: --compare-profiles needs {script}, which this installation does not include.",
+              file=sys.stderr)
+        return 1
+    return subprocess.call([sys.executable, script, "--compare-profiles"], cwd=APP_DIR)
+
+def main():
+    """
+    Run the Streamlit application using Python's subprocess module.
+    This script helps users run the application without directly calling the Streamlit executable.
+    Configures Streamlit to run in a compact, floating window.
+    """
+    parser = argparse.ArgumentParser(description="Launch the AI Prompt Generator.")
+    parser.add_argument("command", nargs="?", choices=("start", "status", "stop"), default="start",
+                        help="start the app, or open it if it is already running (default); "
+                             "report the status of the running instance; stop it")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of Streamlit workers; more than 1 starts them behind a local load balancer")
+    parser.add_argument("--report-interval", type=int, default=60,
+                        help="Seconds between worker load reports in multi-worker mode")
+    parser.add_argument("--profile", choices=sorted(PROFILES),
+                        default=os.environ.get(PROFILE_ENV, DEFAULT_PROFILE),
+                        help=f"Streamlit launch profile (default: ${PROFILE_ENV} or {DEFAULT_PROFILE})")
+    parser.add_argument("--compare-profiles", action="store_true",
+                        help="Measure rerun times under every profile and report the difference")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve timing histograms in Prometheus format on this local port")
+    parser.add_argument("--sample-reruns", type=int, default=0, metavar="N",
+                        help="With --metrics-port, profile reruns and keep stack samples of the N slowest")
+    parser.add_argument("--sample-dir",
+                        help="Directory for the rerun profiles (default: ~/.cache/prompt_generator/profiles)")
+    parser.add_argument("--address", default=LOCAL_ADDRESS,
+                        help=f"Interface to serve the app on (default: {LOCAL_ADDRESS}; 0.0.0.0 for every interface)")
+    parser.add_argument("--remote-files", action="store_true",
+                        help="Let browsers on other hosts attach context files and directory manifests, "
+                             "which read any path on this host")
+    parser.add_argument("--session-ttl", type=float, metavar="SECONDS",
+                        help="Close browser sessions idle for this long (default: 1800; 0 keeps them)")
+    parser.add_argument("--session-max-bytes", type=int, metavar="BYTES",
+                        help="Spill generated prompts to disk past this much state per session (default: 1 MB)")
+    parser.add_argument("--spill-dir",
+                        help="Directory for spilled prompts (default: a temporary directory)")
+    args = parser.parse_args()
+    if args.profile not in PROFILES:
+        parser.error(f"Unknown profile in ${PROFILE_ENV}: {args.profile}")
+
+    if args.compare_profiles:
+        sys.exit(compare_profiles())
+    if args.sample_reruns and args.metrics_port is None:
+        parser.error("--sample-reruns requires --metrics-port")
+    metrics = (args.metrics_port, args.sample_reruns, args.sample_dir) if args.metrics_port else None
+    # Inherited by every server process through its environment
+    for variable, value in ((SESSION_TTL_ENV, args.session_ttl), (SESSION_MAX_BYTES_ENV, args.session_max_bytes),
+                            (SPILL_DIR_ENV, args.spill_dir), (SERVER_ADDRESS_ENV, args.address),
+                            (REMOTE_FILES_ENV, "1" if args.remote_files else None)):
+        if value is not None:
+            os.environ[variable] = str(value)
+
+    if args.command != "start":
+        sys.exit(control_running_instance(args.command))
+    # Only one instance runs at a time; later launches hand their request to it
+    lock = InstanceLock(os.path.join(instance_dir(), LOCK_FILE))
+    if not lock.acquire():
+        sys.exit(control_running_instance("start"))
+
+    print(f"Starting AI Prompt Generator ({args.profile} profile)...")
+
+    # Fail fast if something else already holds the port
+    if port_in_use(SERVER_PORT):
+        print(f"Error: port {SERVER_PORT} is already in use. "
+              "Close the other application and try again.")
+        lock.release()
         sys.exit(1)
+
+    control = InstanceControl(args.profile, args.workers, args.metrics_port)
+    instance = InstanceServer(control.handlers())
+    instance.start()
+    signal.signal(signal.SIGTERM, _terminated)
+    process = None
+    try:
+        if args.workers > 1:
+            run_workers(args.workers, args.report_interval, args.profile, control, metrics, args.address)
+            return
+
+        # Start the Streamlit server as a direct child, so it is stopped and reaped with the launcher
+        env = profile_environment(args.profile)
+        if metrics:
+            metrics_environment(env, *metrics)
+        process = subprocess.Popen(streamlit_args(SERVER_PORT, address=args.address), cwd=APP_DIR, env=env)
+        control.attach(lambda: [process.pid], lambda: stop_process(process))
+
+        # Wait until the server answers its health check
+        try:
+            ready_after = wait_until_ready(process)
+        except RuntimeError as e:
+            print(f"Error starting Streamlit: {e}")
+            sys.exit(1)
+        print(f"Server ready in {ready_after:.2f} seconds.")
+        if metrics:
+            print(f"Metrics: http://localhost:{args.metrics_port}{METRICS_PATH}")
+
+        control.ready.set()
+        open_browser()
+
+        print("AI Prompt Generator is running. Close this window or run `python run.py stop` to exit.")
+
+        # Wait for the process to complete
+        returncode = process.wait()
+        if control.stopping:
+            print("Application stopped by `run.py stop`.")
+        elif returncode != 0:
+            print(f"Streamlit exited with code {returncode}.")
+            sys.exit(returncode)
     except KeyboardInterrupt:
         print("\nApplication stopped by user.")
         sys.exit(0)
+    finally:
+        if process is not None:
+            stop_process(process)
+        instance.close()
+        lock.release()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,297 @@
+"""
+Headless HTTP prompt service.
+
+A small asyncio HTTP/1.1 server that wraps generate_prompt for internal tools
+that need prompts at high rates without going through the Streamlit UI.
+
+Endpoints:
+    POST /generate        JSON object of generate_prompt options -> {"prompt": ...}
+    POST /generate/batch  JSON array of option objects -> {"prompts": [...]}
+    GET  /health          -> {"status": "ok"}
+
+Connections are kept alive and pipelined requests are answered in order.
+With --workers N, N processes share the listening port through SO_REUSEPORT.
+
+Usage:
+    python server.py --port 8600 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import traceback
+
+from batch import BOOLEAN_OPTIONS, PROMPT_OPTIONS, normalize_row
+from prompt_cache import CACHE_PATH_ENV, cached_generate_prompt
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+
+# Largest accepted request body, in bytes
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# Seconds an idle keep-alive connection is held open
+KEEP_ALIVE_TIMEOUT = 15
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+# Options that take a string or null; flags are checked by normalize_row
+_STRING_OPTIONS = frozenset(PROMPT_OPTIONS) - BOOLEAN_OPTIONS - {"context_files", "context_budget"}
+
+class HTTPError(Exception):
+    """
+    Error that is answered with the given HTTP status code.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _generate_one(options):
+    if not isinstance(options, dict):
+        raise HTTPError(400, "Each option set must be a JSON object")
+    for name in ("dir_manifest", "context_files"):
+        if options.get(name):
+            # Would let any client read file listings and contents of the host
+            raise HTTPError(400, f"{name} is not available over HTTP")
+    for name in _STRING_OPTIONS.intersection(options):
+        if options[name] is not None and not isinstance(options[name], str):
+            raise HTTPError(400, f"{name} must be a string or null")
+    try:
+        return cached_generate_prompt(**normalize_row(options))
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+def handle_request(method, path, body):
+    """
+    Dispatch a request and return (status, payload).
+
+    Parameters:
+    - method: HTTP method
+    - path: Request path without the query string
+    - body: Raw request body
+
+    Returns:
+    - A tuple (HTTP status code, JSON-serializable payload)
+    """
+    if path == "/health":
+        if method != "GET":
+            raise HTTPError(405, "Use GET")
+        return 200, {"status": "ok"}
+
+    if path not in ("/generate", "/generate/batch"):
+        raise HTTPError(404, f"Unknown path: {path}")
+    if method != "POST":
+        raise HTTPError(405, "Use POST")
+
+    try:
+        data = json.loads(body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+
+    if path == "/generate":
+        return 200, {"prompt": _generate_one(data)}
+
+    if not isinstance(data, list):
+        raise HTTPError(400, "Batch body must be a JSON array")
+    return 200, {"prompts": [_generate_one(options) for options in data]}
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("ascii") + body
+
+async def _read_request(reader):
+    """
+    Read one HTTP request from the stream.
+
+    Returns:
+    - (method, path, headers, body), or None if the client closed the connection
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    headers[":version"] = version
+
+    body = b""
+    if method == "POST":
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length is required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0 or length > MAX_BODY_SIZE:
+            raise HTTPError(413, f"Body exceeds {MAX_BODY_SIZE} bytes")
+        body = await reader.readexactly(length)
+
+    return method, target.split("?", 1)[0], headers, body
+
+def _wants_keep_alive(headers):
+    connection = headers.get("connection", "").lower()
+    if headers[":version"] == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+async def handle_connection(reader, writer):
+    """
+    Serve requests on one connection until it is closed.
+
+    Requests are read and answered strictly in order, so pipelined requests
+    get their responses in the order they were sent.
+    """
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except HTTPError as e:
+                writer.write(_response(e.status, {"error": e.message}, False))
+                break
+            except asyncio.IncompleteReadError:
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = _wants_keep_alive(headers)
+            try:
+                status, payload = handle_request(method, path, body)
+            except HTTPError as e:
+                status, payload = e.status, {"error": e.message}
+            except Exception:
+                # Answer instead of dropping the connection; the client may retry
+                traceback.print_exc()
+                status, payload = 500, {"error": "Internal server error"}
+            writer.write(_response(status, payload, keep_alive))
+            # Only wait for the socket when the client stops reading
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+def create_socket(host, port, reuse_port=False):
+    """
+    Create a listening socket, optionally shared between processes.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise OSError("SO_REUSEPORT is not available; use a single worker on this platform")
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+async def serve(sock):
+    """
+    Serve HTTP requests on an already bound socket until cancelled.
+    """
+    server = await asyncio.start_server(handle_connection, sock=sock)
+    async with server:
+        await server.serve_forever()
+
+def _run_worker(sock):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(serve(sock))
+
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=1):
+    """
+    Run the service in the foreground.
+
+    Parameters:
+    - host: Interface to bind
+    - port: TCP port to listen on
+    - workers: Number of server processes sharing the port
+    """
+    if workers <= 1:
+        try:
+            asyncio.run(serve(create_socket(host, port)))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Bind every socket up front so a taken port is reported immediately
+    sockets = [create_socket(host, port, reuse_port=True) for _ in range(workers)]
+    processes = [
+        multiprocessing.Process(target=_run_worker, args=(sock,), daemon=True)
+        for sock in sockets
+    ]
+    for process in processes:
+        process.start()
+    # Make SIGTERM unwind through the cleanup below instead of orphaning workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        for sock in sockets:
+            sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve generate_prompt over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of server processes (default: 1)")
+    parser.add_argument("--cache", help=f"Shared prompt cache database (default: ${CACHE_PATH_ENV})")
+    args = parser.parse_args()
+
+    if args.cache:
+        os.environ[CACHE_PATH_ENV] = args.cache
+
+    print(f"Prompt service listening on http://{args.host}:{args.port} "
+          f"with {args.workers} worker(s) (pid {os.getpid()})", file=sys.stderr)
+    try:
+        run_server(args.host, args.port, args.workers)
+    except OSError as e:
+        print(f"Error starting server: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Bounded memory for the sessions of the UI.
+
+Every browser tab is a Streamlit session, and a session keeps its state,
+including the generated prompt, until the tab is closed. This module bounds
+what a session costs the server:
+
+- Generated prompts are interned: sessions that generate the same prompt
+  share one PromptRef instead of holding a copy each. A prompt is freed, and
+  its spill file removed, once no session refers to it any more.
+- A prompt that would take a session over its byte budget is written to a
+  temporary file store and read back only when it is shown.
+- Sessions idle for longer than the TTL are closed, which releases their
+  state; the browser tab reconnects to a fresh session when used again.
+  Sessions Streamlit has already dropped, e.g. because their tab was
+  closed, are forgotten as well, with or without a TTL.
+- The state bytes, prompt bytes and idle time of every session are reported
+  by SessionManager.usage() and, when metrics are on, on the metrics endpoint.
+
+The UI reads its settings from the environment, which `run.py` sets:
+PROMPT_SESSION_MAX_BYTES (budget per session), PROMPT_SESSION_TTL (idle
+seconds before eviction, 0 to keep sessions forever) and PROMPT_SPILL_DIR
+(where spilled prompts go, by default a temporary directory removed at exit).
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+# Environment variables read by the Streamlit server process
+SESSION_MAX_BYTES_ENV = "PROMPT_SESSION_MAX_BYTES"
+SESSION_TTL_ENV = "PROMPT_SESSION_TTL"
+SPILL_DIR_ENV = "PROMPT_SPILL_DIR"
+
+DEFAULT_SESSION_MAX_BYTES = 1024 * 1024
+DEFAULT_SESSION_TTL = 30 * 60
+
+# Seconds between eviction passes, at most
+EVICTION_INTERVAL = 60
+
+def current_session_id():
+    """
+    Return the id of the Streamlit session running the calling thread, or None.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def state_size(value, seen=None):
+    """
+    Approximate the bytes held by a session state value.
+
+    Follows dicts, lists, tuples and sets; PromptRefs are counted by
+    SessionManager separately, since they may be shared or on disk. Objects
+    whose ids are in `seen` are not counted again; pass the same set to
+    measure several values that share objects.
+    """
+    if isinstance(value, PromptRef):
+        return 0
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += state_size(key, seen) + state_size(item, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += state_size(item, seen)
+    return size
+
+class PromptRef:
+    """
+    Handle on an interned prompt, held in session state instead of the text.
+
+    Parameters:
+    - digest: SHA-256 digest of the prompt
+    - size: Bytes the prompt takes in memory
+    - text: The prompt, or None if it is spilled
+    - path: File holding the spilled prompt, or None
+    """
+
+    __slots__ = ("digest", "size", "_text", "path", "__weakref__")
+
+    def __init__(self, digest, size, text=None, path=None):
+        self.digest = digest
+        self.size = size
+        self._text = text
+        self.path = path
+
+    @property
+    def spilled(self):
+        return self._text is None
+
+    @property
+    def text(self):
+        """
+        The prompt, read back from the file store if it is spilled.
+        """
+        if self._text is not None:
+            return self._text
+        with open(self.path, encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        where = f"spilled to {self.path}" if self.spilled else "in memory"
+        return f"PromptRef({self.digest[:12]}, {self.size} bytes, {where})"
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class PromptStore:
+    """
+    Process-wide store interning prompts by content.
+
+    Identical prompts map to one PromptRef for as long as any session holds
+    it. Spilled prompts are written to spill_dir, or to a temporary
+    directory created on first use and removed at exit.
+    """
+
+    def __init__(self, spill_dir=None):
+        self.spill_dir = spill_dir
+        self._refs = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def _spill_path(self, digest):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="prompt_spill_")
+            atexit.register(shutil.rmtree, self.spill_dir, True)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return os.path.join(self.spill_dir, f"{digest}.txt")
+
+    def intern(self, prompt, spill=False):
+        """
+        Return the PromptRef of a prompt, creating it if no session holds it.
+
+        Parameters:
+        - prompt: The prompt text
+        - spill: Write a new entry to the file store instead of keeping it in memory
+
+        Returns:
+        - A PromptRef; an existing one keeps where it is stored
+        """
+        digest = hashlib.sha256(prompt.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            ref = self._refs.get(digest)
+            if ref is not None:
+                return ref
+            size = sys.getsizeof(prompt)
+            if spill:
+                path = self._spill_path(digest)
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    f.write(prompt)
+                ref = PromptRef(digest, size, path=path)
+                # Removes the file once the last session lets go of the prompt
+                weakref.finalize(ref, _remove, path)
+            else:
+                ref = PromptRef(digest, size, text=prompt)
+            self._refs[digest] = ref
+            return ref
+
+    def stats(self):
+        """
+        Return the number of interned prompts and their bytes in memory and on disk.
+        """
+        with self._lock:
+            refs = list(self._refs.values())
+        return {
+            "prompts": len(refs),
+            "memory_bytes": sum(ref.size for ref in refs if not ref.spilled),
+            "spilled_bytes": sum(ref.size for ref in refs if ref.spilled),
+        }
+
+class _Session:
+    __slots__ = ("last_seen", "state_bytes", "prompt", "close")
+
+    def __init__(self, last_seen):
+        self.last_seen = last_seen
+        self.state_bytes = 0
+        self.prompt = None
+        self.close = None
+
+def streamlit_session_exists(session_id):
+    """
+    Return False once the running Streamlit server no longer has a session.
+
+    Safe to call from any thread; always True outside a Streamlit server.
+    """
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return True
+    return Runtime.instance().is_active_session(session_id)
+
+def close_streamlit_session(session_id):
+    """
+    Close a session of the running Streamlit server and its websocket.
+
+    Safe to call from any thread; does nothing outside a Streamlit server,
+    or on a Streamlit whose internals it relies on have changed.
+    """
+    import asyncio
+
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return
+    runtime = Runtime.instance()
+
+    def close():
+        client = runtime.get_client(session_id)
+        runtime.close_session(session_id)
+        # Closing the websocket frees its buffers; the tab reconnects to a new session
+        websocket = getattr(client, "_websocket", None)
+        if websocket is not None:
+            asyncio.ensure_future(websocket.close())  # Starlette server
+        elif hasattr(client, "close"):
+            client.close()  # Tornado server
+
+    try:
+        # The runtime may only be used from its event loop, which only a
+        # private method exposes
+        runtime._get_async_objs().eventloop.call_soon_threadsafe(close)
+    except (AttributeError, RuntimeError):
+        pass
+
+class SessionManager:
+    """
+    Tracks the sessions of the UI, bounds their prompt memory and evicts idle ones.
+
+    Parameters:
+    - store: PromptStore the prompts are interned in
+    - max_session_bytes: Budget per session; a prompt that would exceed it is spilled
+    - ttl: Seconds a session may be idle before it is evicted (0: never)
+    - clock: Function returning the current time in seconds
+    - exists: Function telling whether a session is still open; sessions it
+      reports closed are forgotten by evict_idle
+    """
+
+    def __init__(self, store=None, max_session_bytes=DEFAULT_SESSION_MAX_BYTES, ttl=DEFAULT_SESSION_TTL,
+                 clock=time.monotonic, exists=None):
+        self.store = store if store is not None else PromptStore()
+        self.max_session_bytes = max_session_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.exists = exists
+        self.evictions = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, session_id, state=None, close=None):
+        """
+        Record activity of a session and measure its state.
+
+        Parameters:
+        - session_id: Id of the session
+        - state: Mapping of the session state to measure, if given
+        - close: Function closing the session, called on eviction
+        """
+        state_bytes = None
+        prompt = None
+        if state is not None:
+            state_bytes = 0
+            seen = set()
+            for key, value in state.items():
+                if isinstance(value, PromptRef):
+                    prompt = value
+                else:
+                    state_bytes += state_size(key, seen) + state_size(value, seen)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.clock())
+            session.last_seen = self.clock()
+            if state_bytes is not None:
+                session.state_bytes = state_bytes
+                session.prompt = (prompt.digest, prompt.size, prompt.spilled) if prompt is not None else None
+            if close is not None:
+                session.close = close
+
+    def intern_prompt(self, session_id, prompt):
+        """
+        Return the PromptRef a session should keep for a generated prompt.
+
+        The prompt is spilled when it would take the session's state, as
+        measured at its last touch, over max_session_bytes.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            state_bytes = session.state_bytes if session is not None else 0
+        spill = state_bytes + sys.getsizeof(prompt) > self.max_session_bytes
+        ref = self.store.intern(prompt, spill=spill)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.prompt = (ref.digest, ref.size, ref.spilled)
+        return ref
+
+    def forget(self, session_id):
+        """
+        Stop tracking a session.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def usage(self):
+        """
+        Return the memory usage of every tracked session, largest first.
+
+        Returns:
+        - A list of dicts with the session id, idle seconds, state bytes,
+          prompt bytes, whether the prompt is spilled and how many sessions
+          share it. Spilled prompts count 0 bytes; shared ones count fully
+          for each session.
+        """
+        now = self.clock()
+        with self._lock:
+            sessions = [(session_id, session.last_seen, session.state_bytes, session.prompt)
+                        for session_id, session in self._sessions.items()]
+        holders = {}
+        for *_, prompt in sessions:
+            if prompt is not None:
+                holders[prompt[0]] = holders.get(prompt[0], 0) + 1
+        usage = []
+        for session_id, last_seen, state_bytes, prompt in sessions:
+            digest, size, spilled = prompt if prompt is not None else (None, 0, False)
+            usage.append({
+                "session": session_id,
+                "idle_seconds": now - last_seen,
+                "state_bytes": state_bytes,
+                "prompt_bytes": 0 if spilled else size,
+                "prompt_spilled": spilled,
+                "prompt_shared_by": holders.get(digest, 0),
+            })
+        usage.sort(key=lambda entry: entry["state_bytes"] + entry["prompt_bytes"], reverse=True)
+        return usage
+
+    def evict_idle(self):
+        """
+        Close and forget the sessions idle for longer than the TTL, and
+        forget the sessions that no longer exist.
+
+        Returns:
+        - The ids of the evicted sessions
+        """
+        if self.exists is not None:
+            with self._lock:
+                session_ids = list(self._sessions)
+            for session_id in session_ids:
+                if not self.exists(session_id):
+                    self.forget(session_id)
+        if not self.ttl:
+            return []
+        deadline = self.clock() - self.ttl
+        with self._lock:
+            evicted = [(session_id, session.close) for session_id, session in self._sessions.items()
+                       if session.last_seen < deadline]
+            for session_id, _ in evicted:
+                del self._sessions[session_id]
+            self.evictions += len(evicted)
+        for session_id, close in evicted:
+            if close is not None:
+                close(session_id)
+        return [session_id for session_id, _ in evicted]
+
+    def start(self):
+        """
+        Start the background thread evicting idle sessions, if there is a TTL
+        or a way to tell which sessions still exist.
+        """
+        with self._lock:
+            if self._thread is not None or not (self.ttl or self.exists):
+                return
+            self._thread = threading.Thread(target=self._evict_loop, name="session-evictor", daemon=True)
+            self._thread.start()
+
+    def _evict_loop(self):
+        interval = max(1.0, min(self.ttl / 4, EVICTION_INTERVAL)) if self.ttl else EVICTION_INTERVAL
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def metric_lines(self):
+        """
+        Return the session gauges in the Prometheus text exposition format.
+        """
+        usage = self.usage()
+        store = self.store.stats()
+        lines = [
+            "# HELP prompt_generator_sessions Sessions tracked by the session manager.",
+            "# TYPE prompt_generator_sessions gauge",
+            f"prompt_generator_sessions {len(usage)}",
+            "# HELP prompt_generator_sessions_evicted_total Idle sessions evicted.",
+            "# TYPE prompt_generator_sessions_evicted_total counter",
+            f"prompt_generator_sessions_evicted_total {self.evictions}",
+            "# HELP prompt_generator_prompt_store_bytes Bytes of the interned prompts.",
+            "# TYPE prompt_generator_prompt_store_bytes gauge",
+            f'prompt_generator_prompt_store_bytes{{where="memory"}} {store["memory_bytes"]}',
+            f'prompt_generator_prompt_store_bytes{{where="disk"}} {store["spilled_bytes"]}',
+            "# HELP prompt_generator_session_bytes Bytes held by a session, as of its last run.",
+            "# TYPE prompt_generator_session_bytes gauge",
+        ]
+        for entry in usage:
+            session = entry["session"]
+            lines.append(f'prompt_generator_session_bytes{{session="{session}",kind="state"}} {entry["state_bytes"]}')
+            lines.append(f'prompt_generator_session_bytes{{session="{session}",kind="prompt"}} {entry["prompt_bytes"]}')
+        return lines
+
+_default_manager = None
+
+def get_default_manager():
+    """
+    Return the process-wide SessionManager configured from the environment,
+    starting its eviction thread on first use.
+    """
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = SessionManager(
+            PromptStore(os.environ.get(SPILL_DIR_ENV) or None),
+            max_session_bytes=int(os.environ.get(SESSION_MAX_BYTES_ENV) or DEFAULT_SESSION_MAX_BYTES),
+            ttl=float(os.environ.get(SESSION_TTL_ENV) or DEFAULT_SESSION_TTL),
+            exists=streamlit_session_exists,
+        )
+        _default_manager.start()
+    return _default_manager
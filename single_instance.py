@@ -0,0 +1,287 @@
+"""
+Single-instance control of the launcher.
+
+The first `run.py` holds an exclusive lock on a file in the cache directory
+for as long as it runs, and answers commands on a local IPC socket (TCP on
+127.0.0.1, on a port picked by the OS). The port and a random token are kept
+in a state file next to the lock that only the user can read. A later
+`run.py` that cannot take the lock sends its request to the running
+instance instead of starting a second server: open the browser, report the
+status or stop. The OS releases the lock when the process exits, even if it
+crashes. A state file is only read while the lock is held, and one left by a
+crashed instance (its process is gone or its port refuses connections) is
+read again until the instance holding the lock has replaced it.
+
+Commands are one JSON object per line, {"token": ..., "command": ...}, and
+are answered with one JSON object per line.
+"""
+import json
+import os
+import secrets
+import socket
+import struct
+import sys
+import threading
+import time
+
+# Environment variable overriding the directory of the lock and state files
+INSTANCE_DIR_ENV = "PROMPT_INSTANCE_DIR"
+DEFAULT_INSTANCE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "prompt_generator")
+
+LOCK_FILE = "instance.lock"
+STATE_FILE = "instance.json"
+
+# Seconds a client waits for a starting instance to write its state file
+STATE_WAIT = 5.0
+STATE_POLL = 0.02
+
+# struct flock as passed to F_GETLK, and the index of its l_type field: Linux
+# puts l_type and l_whence first, macOS and the BSDs last. Zero for every
+# other field means the whole file.
+_FLOCK_FORMAT, _FLOCK_TYPE = ("hhqqi", 0) if sys.platform.startswith("linux") else ("qqihh", 3)
+
+class InstanceError(Exception):
+    """
+    Raised when the running instance cannot be reached or refuses a command.
+    """
+
+def instance_dir():
+    """
+    Return the directory of the lock and state files.
+    """
+    return os.environ.get(INSTANCE_DIR_ENV) or DEFAULT_INSTANCE_DIR
+
+class InstanceLock:
+    """
+    Exclusive, non-blocking lock on a file, held until released or the process exits.
+
+    On POSIX this is a fcntl record lock, so other processes can test it
+    without taking it. Record locks belong to the process: closing any
+    descriptor of the file releases them, so a process holding the lock
+    must not probe it through a second InstanceLock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """
+        Take the lock. Returns False if another process holds it.
+        """
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.lockf(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def is_held_elsewhere(self):
+        """
+        Check whether another process holds the lock.
+
+        On POSIX the lock is tested with F_GETLK and never taken, so a
+        launch that acquires it at the same moment cannot fail because of
+        the check. Windows has no such test; there the lock is taken and
+        released again.
+        """
+        if self._file is not None:
+            return False
+        if os.name == "nt":
+            if not self.acquire():
+                return True
+            self.release()
+            return False
+        import fcntl
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        fields = [0] * 5
+        fields[_FLOCK_TYPE] = fcntl.F_WRLCK
+        try:
+            # Answered with the conflicting lock, or with l_type set to F_UNLCK
+            answer = fcntl.fcntl(fd, fcntl.F_GETLK, struct.pack(_FLOCK_FORMAT, *fields))
+        finally:
+            os.close(fd)
+        return struct.unpack(_FLOCK_FORMAT, answer)[_FLOCK_TYPE] != fcntl.F_UNLCK
+
+class InstanceServer:
+    """
+    Answers the commands of later launches on a local socket.
+
+    Parameters:
+    - handlers: Dict mapping command names to functions returning a
+      JSON-serializable dict; they run on the server's thread
+    - directory: Directory of the state file (default: instance_dir())
+    """
+
+    def __init__(self, handlers, directory=None):
+        self.handlers = handlers
+        self.state_path = os.path.join(directory or instance_dir(), STATE_FILE)
+        self.token = secrets.token_hex(16)
+        self._socket = None
+        self._thread = None
+
+    def start(self):
+        """
+        Listen on a free local port and write the state file.
+        """
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(8)
+        state = {"pid": os.getpid(), "port": self._socket.getsockname()[1], "token": self.token,
+                 "started": time.time()}
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = f"{self.state_path}.{os.getpid()}"
+        # Created readable by the user only, then renamed so readers never see a partial file
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+        self._thread = threading.Thread(target=self._serve, name="instance-ipc", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Stop answering commands and remove the state file.
+        """
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except OSError:
+                return  # Closed
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection):
+        with connection, connection.makefile("rwb") as stream:
+            try:
+                request = json.loads(stream.readline())
+                if not secrets.compare_digest(str(request.get("token", "")), self.token):
+                    response = {"ok": False, "error": "invalid token"}
+                elif request.get("command") not in self.handlers:
+                    response = {"ok": False, "error": f"unknown command {request.get('command')!r}"}
+                else:
+                    response = {"ok": True, **self.handlers[request["command"]]()}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            try:
+                stream.write(json.dumps(response).encode("utf-8") + b"\n")
+                stream.flush()
+            except OSError:
+                pass
+
+def _read_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) and {"pid", "port", "token"} <= state.keys() else None
+
+def _process_alive(pid):
+    if os.name == "nt":
+        return True  # A refused connection tells instead
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _exchange(state, command, timeout):
+    with socket.create_connection(("127.0.0.1", state["port"]), timeout=timeout) as connection:
+        connection.sendall(json.dumps({"token": state["token"], "command": command}).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as stream:
+            return stream.readline()
+
+def send_command(command, timeout=10.0, directory=None):
+    """
+    Send a command to the running instance.
+
+    Parameters:
+    - command: Command name, e.g. "open", "status" or "stop"
+    - timeout: Seconds to wait for the answer
+    - directory: Directory of the lock and state files (default: instance_dir())
+
+    Returns:
+    - The answer as a dict, or None if no instance is running
+
+    Raises:
+    - InstanceError if the instance does not answer or refuses the command
+    """
+    directory = directory or instance_dir()
+    lock = InstanceLock(os.path.join(directory, LOCK_FILE))
+    deadline = time.monotonic() + STATE_WAIT
+    while True:
+        if not lock.is_held_elsewhere():
+            return None
+        # An instance that just took the lock may not have replaced the state
+        # file yet: it is missing, or left by a crashed instance
+        state = _read_state(os.path.join(directory, STATE_FILE))
+        if state is not None and _process_alive(state["pid"]):
+            try:
+                line = _exchange(state, command, timeout)
+                break
+            except ConnectionRefusedError:
+                pass
+            except OSError as e:
+                raise InstanceError(f"cannot reach the running instance (pid {state['pid']}): {e}") from e
+        if time.monotonic() >= deadline:
+            raise InstanceError("the running instance has not published its control socket")
+        time.sleep(STATE_POLL)
+    if not line:
+        raise InstanceError("the running instance closed the connection")
+    response = json.loads(line)
+    if not response.pop("ok", False):
+        raise InstanceError(response.get("error", "command failed"))
+    return response
+
+def wait_until_stopped(timeout=15.0, directory=None):
+    """
+    Wait until no process holds the instance lock.
+
+    Returns:
+    - True if the instance exited within the timeout
+    """
+    lock = InstanceLock(os.path.join(directory or instance_dir(), LOCK_FILE))
+    deadline = time.monotonic() + timeout
+    while lock.is_held_elsewhere():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True